@@ -7,38 +7,346 @@ SQLite 数据库管理模块
 import sqlite3
 import json
 import os
-from typing import List, Dict, Any, Optional
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from threading import Lock
 
+try:
+    import orjson  # 可选依赖：安装后用于加速批量写入时的 JSON 序列化
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard  # 可选依赖：安装后可使用 zstd 压缩 raw_data，否则只能使用标准库 zlib
+except ImportError:
+    zstandard = None
+
+
+# 媒体标识符提取规则
+_PHOTO_ORIGINAL_PATTERN = re.compile(r"media/([A-Za-z0-9_-]+)\?format=")
+_PHOTO_LEGACY_PATTERN = re.compile(r"/media/([A-Za-z0-9_-]+)\.")
+_VIDEO_PATTERN = re.compile(r"vid/[a-zA-Z0-9_/-]+/([A-Za-z0-9_-]+)\.mp4")
+
+# 本地媒体索引收录的文件扩展名
+MEDIA_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.webm', '.mov'}
+
+# raw_data 压缩：压缩后的值以 BLOB 存储，格式为 编码标识(1 字节) + 字典 id(4 字节，0 表示不使用字典) + 压缩数据；
+# 未压缩的值仍为 JSON 文本，两种格式可以在同一个库中共存
+RAW_CODECS = {'zlib': b'z', 'zstd': b's'}
+_RAW_HEADER = struct.Struct('>cI')
+
+# JSON 字符串片段（连同其后的冒号或逗号），用于挑选 zlib 预置字典的内容
+_JSON_FRAGMENT_PATTERN = re.compile(r'"(?:[^"\\]|\\.){0,200}"[:,]?')
+
+
+def dumps_json(obj: Any) -> str:
+    """
+    序列化为 JSON 字符串（安装了 orjson 时使用 orjson，否则使用标准库）
+    
+    Args:
+        obj: 要序列化的对象
+        
+    Returns:
+        JSON 字符串（非 ASCII 字符不转义）
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:
+            # orjson 不支持的数据（如超过 64 位的整数、非字符串键）回退到标准库
+            pass
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def build_zlib_dictionary(samples: List[bytes], size: int = 32768) -> bytes:
+    """
+    用样本组成 zlib 预置字典（zlib 本身没有字典训练功能）
+    
+    前半部分是出现在多数样本中的高频片段（键名、URL 前缀等），按价值从低到高排列；
+    后半部分直接拼接若干条完整样本，提供整条推文的结构。zlib 引用距离越近编码越短，价值高的内容放在字典末尾
+    
+    Args:
+        samples: 样本（UTF-8 编码的 JSON）
+        size: 字典大小上限（zlib 的窗口为 32KB，更大没有意义）
+        
+    Returns:
+        字典内容
+    """
+    counter = Counter()
+    for sample in samples:
+        counter.update(set(_JSON_FRAGMENT_PATTERN.findall(sample.decode('utf-8', errors='ignore'))))
+    
+    # 只保留至少出现在 1/10 样本中的片段，价值 = 出现次数 * 长度
+    min_count = max(2, len(samples) // 10)
+    fragments = sorted(
+        ((count * len(fragment), fragment.encode('utf-8')) for fragment, count in counter.items() if count >= min_count),
+        reverse=True
+    )
+    chosen = []
+    total = 0
+    for _, fragment in fragments:
+        if total + len(fragment) <= size // 2:
+            chosen.append(fragment)
+            total += len(fragment)
+    chosen.reverse()
+    
+    for sample in samples:
+        if total >= size:
+            break
+        chosen.append(sample)
+        total += len(sample)
+    return b''.join(chosen)[-size:]
+
+
+def parse_twitter_date(date_str: str) -> int:
+    """
+    解析日期字符串并转换为毫秒时间戳
+    
+    Args:
+        date_str: 日期字符串，支持以下格式：
+            - "2023-06-20 21:20:39 +08:00" （数据库存储格式）
+            - "Sun Jun 09 21:43:26 +0000 2024" （Twitter 原始格式）
+            
+    Returns:
+        毫秒时间戳，解析失败返回 0
+    """
+    if not date_str:
+        return 0
+    
+    # 尝试多种日期格式
+    formats = [
+        "%Y-%m-%d %H:%M:%S %z",      # 数据库格式: "2023-06-20 21:20:39 +08:00"
+        "%a %b %d %H:%M:%S %z %Y",   # Twitter 格式: "Sun Jun 09 21:43:26 +0000 2024"
+    ]
+    
+    for fmt in formats:
+        try:
+            dt = datetime.strptime(date_str, fmt)
+            return int(dt.timestamp() * 1000)
+        except ValueError:
+            continue
+    
+    return 0
+
+
+def extract_user_id(data: Dict[str, Any]) -> str:
+    """
+    获取推文作者的 user_id（没有 user_id 字段时从 metadata 中获取）
+    
+    Args:
+        data: 推文数据字典
+        
+    Returns:
+        user_id，无法获取时返回空字符串
+    """
+    user_id = data.get('user_id', '')
+    if not user_id:
+        metadata = data.get('metadata') or {}
+        user_result = metadata.get('user_results', {}).get('result', {})
+        user_id = user_result.get('rest_id', '')
+    return user_id or ''
+
+
+def extract_media(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    从推文数据中提取媒体信息（包括引用推文中的媒体）
+    
+    Args:
+        data: 推文数据字典
+        
+    Returns:
+        媒体列表，每项包含 identifier, type, url, best_bitrate, from_quote；
+        无法提取标识符的媒体 identifier 为空字符串
+    """
+    media_rows = []
+    
+    # 主推文的媒体
+    for media in data.get('media', []) or []:
+        media_type = media.get('type')
+        url = media.get('original') or ''
+        if media_type == 'photo':
+            match = _PHOTO_ORIGINAL_PATTERN.search(url)
+        elif media_type == 'video':
+            match = _VIDEO_PATTERN.search(url)
+        else:
+            continue
+        media_rows.append({
+            'identifier': match.group(1) if match else '',
+            'type': media_type,
+            'url': url,
+            'best_bitrate': None,
+            'from_quote': 0
+        })
+    
+    # 引用推文的媒体（优先使用 extended_entities，没有则使用 entities）
+    metadata = data.get('metadata') or {}
+    quoted_result = metadata.get('quoted_status_result', {}).get('result', {})
+    legacy = quoted_result.get('legacy', {}) if quoted_result else {}
+    entities = legacy.get('extended_entities', legacy.get('entities', {})) if legacy else {}
+    
+    for media in entities.get('media', []):
+        media_type = media.get('type')
+        if media_type == 'photo':
+            media_url = media.get('media_url_https', '')
+            if not media_url:
+                continue
+            match = _PHOTO_LEGACY_PATTERN.search(media_url)
+            media_rows.append({
+                'identifier': match.group(1) if match else '',
+                'type': 'photo',
+                'url': f"{media_url}?format=jpg&name=orig",
+                'best_bitrate': None,
+                'from_quote': 1
+            })
+        elif media_type == 'video':
+            # 选择比特率最高的 mp4
+            variants = media.get('video_info', {}).get('variants', [])
+            mp4_variants = [v for v in variants if v.get('content_type') == 'video/mp4']
+            if not mp4_variants:
+                continue
+            best_variant = max(mp4_variants, key=lambda x: x.get('bitrate', 0))
+            url = best_variant.get('url', '')
+            match = _VIDEO_PATTERN.search(url)
+            media_rows.append({
+                'identifier': match.group(1) if match else '',
+                'type': 'video',
+                'url': url,
+                'best_bitrate': best_variant.get('bitrate'),
+                'from_quote': 1
+            })
+    
+    return media_rows
+
 
 class TweetDatabase:
-    """推文数据库管理类"""
+    """
+    推文数据库管理类
+    
+    数据库以 WAL 模式打开：所有写操作经由唯一的写连接串行执行（受 _lock 保护），
+    读操作使用每个线程独立的只读连接，不需要加锁，也不会被写事务阻塞。
+    """
     
-    def __init__(self, db_path: str):
+    # 全文索引支持的分词器：trigram 按字符三元组切分，适用于中日文等无空格分词的文本，
+    # 并与 LIKE '%kw%' 的子串匹配语义一致；unicode61 按单词切分，索引更小
+    FTS_TOKENIZERS = ('trigram', 'unicode61')
+    
+    # tweets 表中可供 iter_rows 投影读取的列
+    COLUMNS = ('doc_id', 'id', 'created_at', 'full_text', 'name', 'screen_name',
+               'views_count', 'url', 'media', 'raw_data', 'user_id', 'created_at_ts')
+    
+    # 列表排序方式 -> (排序键列, 方向)；排序键以 doc_id 结尾，保证顺序唯一，可用于游标分页
+    SORT_ORDERS = {
+        'added': (('doc_id',), 'DESC'),  # 按加入数据库的顺序，最新加入的在前
+        'date_desc': (('created_at_ts', 'doc_id'), 'DESC'),  # 按发推时间，最新的在前
+        'date_asc': (('created_at_ts', 'doc_id'), 'ASC'),  # 按发推时间，最早的在前
+    }
+    
+    # 训练压缩字典所需的最少样本数，样本不足时不使用字典
+    MIN_DICT_SAMPLES = 200
+    
+    def __init__(self, db_path: str, fts_tokenizer: Optional[str] = 'trigram', compression: Optional[str] = None):
         """
         初始化数据库连接
         
         Args:
             db_path: 数据库文件路径
+            fts_tokenizer: 全文索引分词器（trigram 或 unicode61），为 None 时不建立全文索引
+            compression: 新写入的 raw_data 的压缩方式（zlib 或 zstd，zstd 需要安装 zstandard，
+                         未安装时退回 zlib），为 None 时以 JSON 文本存储；已有记录由 migrate_raw_data 转换
         """
         self.db_path = db_path
-        self._lock = Lock()
-        self._conn = None
-        self._init_db()
+        self.fts_tokenizer = None  # 实际生效的分词器，由 _init_fts 设置
+        self._lock = Lock()  # 写锁
+        self._conn = None  # 写连接
+        self._local = threading.local()  # 当前线程的读连接
+        self._read_pool = {}  # 线程 -> 读连接
+        self._pool_lock = Lock()
+        self._generation = 0  # 每次写入提交后递增，用于判断缓存是否过期
+        self._remove_generation = 0  # 每次删除推文记录后递增
+        self._count_cache = {}  # (WHERE 子句, 参数) -> (generation, 总数)
+        self._deleted_db = None  # 附加到读连接上的删除库
+        self.compression = None  # 实际生效的压缩方式，由 _init_compression 设置
+        self._dicts = {}  # dict_id -> (编码, 字典内容)
+        self._zstd_dicts = {}  # dict_id -> zstandard.ZstdCompressionDict
+        self._dict_id = 0  # 新写入的记录使用的字典
+        self._init_db(fts_tokenizer, compression)
+    
+    def _open_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """打开一个新的数据库连接"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if read_only:
+            conn.execute('PRAGMA query_only = ON')
+        return conn
     
     def _get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接（线程安全）"""
+        """获取写连接（调用方需持有 _lock）"""
         if self._conn is None:
-            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self._conn.row_factory = sqlite3.Row
+            self._conn = self._open_connection()
         return self._conn
     
-    def _init_db(self):
+    def _get_read_connection(self) -> sqlite3.Connection:
+        """获取当前线程的只读连接（不存在则创建）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection(read_only=True)
+            with self._pool_lock:
+                # 清理已退出线程遗留的连接（werkzeug 会为每个请求创建新线程）
+                for thread in [t for t in self._read_pool if not t.is_alive()]:
+                    self._read_pool.pop(thread).close()
+                self._read_pool[threading.current_thread()] = conn
+            self._local.conn = conn
+        
+        # 同步删除库的附加状态
+        deleted_path = self._deleted_db.db_path if self._deleted_db else None
+        attached_path = getattr(self._local, 'attached_path', None)
+        if attached_path != deleted_path:
+            if attached_path:
+                conn.execute('DETACH DATABASE deleted')
+            if deleted_path:
+                conn.execute('ATTACH DATABASE ? AS deleted', (deleted_path,))
+            self._local.attached_path = deleted_path
+        return conn
+    
+    def attach_deleted_db(self, deleted_db: Optional['TweetDatabase']):
+        """
+        将删除库附加到读连接（ATTACH 为 deleted），之后查询可通过 exclude_deleted
+        在 SQL 中以索引反连接排除已删除的推文，无需把删除库的全部 id 读入内存
+        
+        Args:
+            deleted_db: 删除库实例，传入 None 表示取消附加
+        """
+        self._deleted_db = deleted_db
+    
+    @property
+    def data_version(self) -> int:
+        """数据版本号：每次写入（插入、更新、删除、媒体索引变化）提交后递增，可用于判断缓存是否过期"""
+        return self._generation
+    
+    @property
+    def remove_version(self) -> int:
+        """删除版本号：每次删除推文记录后递增；两次读取之间未变化时，新增的记录可以通过 get_ids_after 增量获取"""
+        return self._remove_generation
+    
+    def _init_db(self, fts_tokenizer: Optional[str] = None, compression: Optional[str] = None):
         """初始化数据库表结构"""
         with self._lock:
             conn = self._get_connection()
             cursor = conn.cursor()
             
+            # 新建的数据库使用增量自动清理，空闲页可以由 incremental_vacuum 分批回收（WAL 模式下已有数据库无法切换）
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            
+            # WAL 模式下读写互不阻塞，NORMAL 同步级别在 WAL 下仍能保证一致性
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+            
             # 创建推文表
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS tweets (
@@ -55,10 +363,498 @@ class TweetDatabase:
                 )
             ''')
             
+            # 作者 user_id 列（旧数据库没有该列时补充，由用户表的回填填充）
+            cursor.execute('PRAGMA table_info(tweets)')
+            tweet_columns = {row['name'] for row in cursor.fetchall()}
+            if 'user_id' not in tweet_columns:
+                cursor.execute('ALTER TABLE tweets ADD COLUMN user_id TEXT')
+            
+            # 发推时间的毫秒时间戳（插入时解析一次，解析失败为 0），用于按日期排序和范围筛选
+            if 'created_at_ts' not in tweet_columns:
+                cursor.execute('ALTER TABLE tweets ADD COLUMN created_at_ts INTEGER NOT NULL DEFAULT 0')
+                conn.create_function('parse_twitter_date', 1, parse_twitter_date, deterministic=True)
+                cursor.execute('UPDATE tweets SET created_at_ts = parse_twitter_date(created_at)')
+            
             # 创建索引以提升查询性能
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweets_id ON tweets(id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweets_user_id ON tweets(user_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweets_created_at_ts ON tweets(created_at_ts)')
+            
+            # 媒体表：插入时从推文中提取，避免每次使用都重新解析 raw_data
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tweet_media'")
+            media_table_exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tweet_media (
+                    tweet_doc_id INTEGER NOT NULL,
+                    identifier TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    url TEXT,
+                    best_bitrate INTEGER,
+                    from_quote INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweet_media_doc_id ON tweet_media(tweet_doc_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tweet_media_identifier ON tweet_media(identifier)')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS tweet_media_ad AFTER DELETE ON tweets BEGIN
+                    DELETE FROM tweet_media WHERE tweet_doc_id = old.doc_id;
+                END
+            ''')
+            if not media_table_exists:
+                self._backfill_media(conn)
+            
+            # 用户表：插入推文时更新（推文数；昵称、头像和最后出现时间以发推时间最新的推文为准），删除推文时由触发器减少推文数
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'")
+            users_table_exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    screen_name TEXT,
+                    profile_image_url TEXT,
+                    tweet_count INTEGER NOT NULL DEFAULT 0,
+                    last_seen INTEGER
+                )
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_ad AFTER DELETE ON tweets
+                WHEN old.user_id IS NOT NULL AND old.user_id != '' BEGIN
+                    UPDATE users SET tweet_count = tweet_count - 1 WHERE user_id = old.user_id;
+                    DELETE FROM users WHERE user_id = old.user_id AND tweet_count <= 0;
+                END
+            ''')
+            if not users_table_exists:
+                self._backfill_users(conn)
+            
+            # 本地媒体文件索引：记录下载目录中的媒体文件及各目录的 mtime，
+            # 重新扫描时跳过 mtime 未变化的目录（见 scan_media_files）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS media_dirs (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT,
+                    mtime INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_dirs_parent ON media_dirs(parent)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS media_files (
+                    path TEXT PRIMARY KEY,
+                    dir TEXT NOT NULL,
+                    identifier TEXT NOT NULL,
+                    size INTEGER,
+                    mtime INTEGER
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_files_identifier ON media_files(identifier)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_files_dir ON media_files(dir)')
+            
+            # raw_data 压缩字典（以库中推文为样本训练，见 train_compression_dict）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS compression_dicts (
+                    dict_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    codec TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    created_at INTEGER
+                )
+            ''')
+            self._init_compression(cursor, compression)
+            
+            # 全文索引
+            if fts_tokenizer:
+                self.fts_tokenizer = self._init_fts(cursor, fts_tokenizer)
+            
+            conn.commit()
+    
+    def _backfill_media(self, conn: sqlite3.Connection):
+        """为已有数据库回填媒体表（仅在媒体表首次创建时执行一次）"""
+        read_cursor = conn.cursor()
+        write_cursor = conn.cursor()
+        read_cursor.execute('SELECT doc_id, raw_data FROM tweets')
+        while True:
+            rows = read_cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                data = self._decode_raw(row['raw_data'])
+                self._write_media(write_cursor, row['doc_id'], data)
+    
+    def _write_media(self, cursor: sqlite3.Cursor, doc_id: int, data: Dict[str, Any]):
+        """写入一条推文的媒体记录（调用方需持有 _lock）"""
+        media_rows = extract_media(data)
+        if media_rows:
+            cursor.executemany('''
+                INSERT INTO tweet_media (tweet_doc_id, identifier, type, url, best_bitrate, from_quote)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (doc_id, m['identifier'], m['type'], m['url'], m['best_bitrate'], m['from_quote'])
+                for m in media_rows
+            ])
+    
+    def _backfill_users(self, conn: sqlite3.Connection):
+        """为已有数据库回填 tweets.user_id 列和用户表（仅在用户表首次创建时执行一次）"""
+        read_cursor = conn.cursor()
+        write_cursor = conn.cursor()
+        read_cursor.execute('SELECT doc_id, raw_data, created_at_ts FROM tweets ORDER BY doc_id')
+        while True:
+            rows = read_cursor.fetchmany(1000)
+            if not rows:
+                break
+            data_list = [self._decode_raw(row['raw_data']) for row in rows]
+            write_cursor.executemany(
+                'UPDATE tweets SET user_id = ? WHERE doc_id = ?',
+                [(extract_user_id(data) or None, row['doc_id']) for row, data in zip(rows, data_list)]
+            )
+            self._write_users(write_cursor, data_list, [row['created_at_ts'] for row in rows])
+    
+    def _init_compression(self, cursor: sqlite3.Cursor, compression: Optional[str]):
+        """加载压缩字典，并确定新写入的记录使用的压缩方式和字典"""
+        self._load_dicts(cursor)
+        if not compression:
+            return
+        if compression not in RAW_CODECS:
+            raise ValueError(f'无效的压缩方式: {compression}')
+        if compression == 'zstd' and zstandard is None:
+            print('未安装 zstandard，raw_data 改用 zlib 压缩')
+            compression = 'zlib'
+        self.compression = compression
+        self._dict_id = max((dict_id for dict_id, (codec, _) in self._dicts.items() if codec == compression), default=0)
+    
+    def _load_dicts(self, cursor: sqlite3.Cursor):
+        """从 compression_dicts 表加载压缩字典"""
+        cursor.execute('SELECT dict_id, codec, data FROM compression_dicts')
+        for row in cursor.fetchall():
+            self._dicts[row['dict_id']] = (row['codec'], bytes(row['data']))
+    
+    def _get_dict(self, dict_id: int) -> bytes:
+        """获取压缩字典内容（dict_id 为 0 时返回空字典）"""
+        if not dict_id:
+            return b''
+        if dict_id not in self._dicts:
+            # 可能是其他实例训练的新字典
+            self._load_dicts(self._get_read_connection().cursor())
+        return self._dicts[dict_id][1]
+    
+    def _get_zstd_dict(self, dict_id: int):
+        """获取 zstd 字典对象（为 None 表示不使用字典）"""
+        if not dict_id:
+            return None
+        if dict_id not in self._zstd_dicts:
+            self._zstd_dicts[dict_id] = zstandard.ZstdCompressionDict(self._get_dict(dict_id))
+        return self._zstd_dicts[dict_id]
+    
+    def _encode_raw(self, text) -> Any:
+        """
+        将 raw_data 的 JSON 文本编码为当前的存储格式
+        
+        Args:
+            text: JSON 文本（str 或 UTF-8 编码的 bytes）
+            
+        Returns:
+            未启用压缩时为 JSON 文本，否则为压缩后的 BLOB
+        """
+        if not self.compression:
+            return text.decode('utf-8') if isinstance(text, bytes) else text
+        if isinstance(text, str):
+            text = text.encode('utf-8')
+        
+        if self.compression == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=3, dict_data=self._get_zstd_dict(self._dict_id))
+            payload = compressor.compress(text)
+        else:
+            # 原始 deflate 流（wbits 为负数），省去每行 6 字节的 zlib 头和校验
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15, zdict=self._get_dict(self._dict_id))
+            payload = compressor.compress(text) + compressor.flush()
+        return _RAW_HEADER.pack(RAW_CODECS[self.compression], self._dict_id) + payload
+    
+    def _raw_bytes(self, value) -> bytes:
+        """读取 raw_data 列的值，返回 UTF-8 编码的 JSON（自动识别未压缩的文本和压缩后的 BLOB）"""
+        if not value:
+            return b'{}'
+        if isinstance(value, str):
+            return value.encode('utf-8')
+        
+        tag, dict_id = _RAW_HEADER.unpack_from(value)
+        payload = value[_RAW_HEADER.size:]
+        if tag == RAW_CODECS['zstd']:
+            if zstandard is None:
+                raise RuntimeError('该数据库的 raw_data 使用 zstd 压缩，需要安装 zstandard')
+            return zstandard.ZstdDecompressor(dict_data=self._get_zstd_dict(dict_id)).decompress(payload)
+        return zlib.decompressobj(-15, zdict=self._get_dict(dict_id)).decompress(payload)
+    
+    def _decode_raw(self, value) -> Dict[str, Any]:
+        """解码 raw_data 列的值（自动识别未压缩的文本和压缩后的 BLOB）"""
+        if not value:
+            return {}
+        if isinstance(value, str):
+            return json.loads(value)
+        return json.loads(self._raw_bytes(value))
+    
+    def train_compression_dict(self, sample_size: int = 2000) -> int:
+        """
+        以最近加入的推文为样本训练压缩字典，之后写入的记录使用新字典压缩
+        （已有记录需要通过 migrate_raw_data 重新压缩）
+        
+        Args:
+            sample_size: 样本数
             
+        Returns:
+            新字典的 dict_id，未启用压缩或样本不足时返回 0
+        """
+        if not self.compression:
+            return 0
+        cursor = self._get_read_connection().cursor()
+        cursor.execute('SELECT raw_data FROM tweets ORDER BY doc_id DESC LIMIT ?', (sample_size,))
+        samples = [self._raw_bytes(row['raw_data']) for row in cursor.fetchall()]
+        if len(samples) < self.MIN_DICT_SAMPLES:
+            return 0
+        
+        if self.compression == 'zstd':
+            data = zstandard.train_dictionary(112640, samples).as_bytes()
+        else:
+            data = build_zlib_dictionary(samples)
+        
+        with self._lock:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                'INSERT INTO compression_dicts (codec, data, created_at) VALUES (?, ?, ?)',
+                (self.compression, data, int(time.time()))
+            )
             conn.commit()
+            self._dicts[cursor.lastrowid] = (self.compression, data)
+            self._dict_id = cursor.lastrowid
+            return self._dict_id
+    
+    def _raw_format_mismatch(self) -> Tuple[str, tuple]:
+        """返回筛选 raw_data 不是当前存储格式的记录的 WHERE 子句及参数"""
+        if not self.compression:
+            return "typeof(raw_data) = 'blob'", ()
+        header = _RAW_HEADER.pack(RAW_CODECS[self.compression], self._dict_id)
+        return "(typeof(raw_data) = 'text' OR substr(raw_data, 1, ?) != ?)", (len(header), header)
+    
+    def migrate_raw_data(self, batch_size: int = 500, progress_callback=None, should_stop=None) -> int:
+        """
+        将已有记录的 raw_data 转换为当前的存储格式：启用压缩时用最新的字典重新压缩
+        （还没有字典时先训练），未启用压缩时还原为 JSON 文本。
+        分批提交，每批只短暂持有写锁，可以在后台线程中运行；中途停止后再次调用会继续转换剩余的记录。
+        转换完成后以 incremental_vacuum 分批回收空闲页；记录变小留下的零散空间需要由用户主动执行 vacuum 回收
+        
+        Args:
+            batch_size: 每批转换的记录数
+            progress_callback: 进度回调函数 (已转换数, 总数)
+            should_stop: 返回 True 时停止转换
+            
+        Returns:
+            转换的记录数
+        """
+        if self.compression and not self._dict_id:
+            self.train_compression_dict()
+        
+        where, params = self._raw_format_mismatch()
+        cursor = self._get_read_connection().cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM tweets WHERE {where}', params)
+        total = cursor.fetchone()[0]
+        
+        converted = 0
+        last_doc_id = 0
+        while converted < total:
+            if should_stop and should_stop():
+                return converted
+            with self._lock:
+                conn = self._get_connection()
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'SELECT doc_id, raw_data FROM tweets WHERE doc_id > ? AND {where} ORDER BY doc_id LIMIT ?',
+                    (last_doc_id, *params, batch_size)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                # raw_data 的内容不变，不需要递增 _generation
+                cursor.executemany(
+                    'UPDATE tweets SET raw_data = ? WHERE doc_id = ?',
+                    [(self._encode_raw(self._raw_bytes(row['raw_data'])), row['doc_id']) for row in rows]
+                )
+                conn.commit()
+            last_doc_id = rows[-1]['doc_id']
+            converted += len(rows)
+            if progress_callback:
+                progress_callback(converted, total)
+        
+        if converted:
+            self.incremental_vacuum(should_stop=should_stop)
+        return converted
+    
+    def incremental_vacuum(self, pages_per_step: int = 500, should_stop=None) -> int:
+        """
+        分批回收空闲页并缩小数据库文件，每批只短暂持有写锁（仅对增量自动清理模式的数据库有效）
+        
+        Args:
+            pages_per_step: 每批回收的页数
+            should_stop: 返回 True 时停止回收
+            
+        Returns:
+            回收的页数
+        """
+        cursor = self._get_read_connection().cursor()
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != 2:  # 2 = INCREMENTAL
+            return 0
+        
+        freed = 0
+        while not (should_stop and should_stop()):
+            with self._lock:
+                conn = self._get_connection()
+                free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if not free_pages:
+                    break
+                # execute 只执行一步（回收一页），executescript 会执行到结束
+                conn.executescript(f'PRAGMA incremental_vacuum({pages_per_step})')
+                freed += free_pages - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return freed
+    
+    def vacuum(self):
+        """
+        执行完整的 VACUUM 重建数据库文件，回收记录变小（如转换 raw_data 后）留下的零散空间
+        
+        重建期间一直持有写锁，数据量大时所有写入都会等待较长时间，只应在用户主动要求、程序空闲时调用
+        """
+        with self._lock:
+            self._get_connection().execute('VACUUM')
+    
+    def _write_users(self, cursor: sqlite3.Cursor, data_list: List[Dict[str, Any]], timestamps: List[int]):
+        """
+        按推文更新用户表（调用方需持有 _lock）
+        
+        每条推文使对应用户的推文数加一；last_seen 为该用户最新推文的发推时间（毫秒时间戳），
+        昵称、用户名和头像只由发推时间不早于 last_seen 的推文覆盖（头像为空时保留原值），
+        因此先导入新数据、后导入旧数据时不会回退到旧头像。
+        
+        Args:
+            cursor: 数据库游标
+            data_list: 推文数据字典列表
+            timestamps: 与 data_list 一一对应的 created_at_ts
+        """
+        rows = []
+        for data, created_at_ts in zip(data_list, timestamps):
+            user_id = extract_user_id(data)
+            if user_id:
+                rows.append((user_id, data.get('name'), data.get('screen_name'),
+                             data.get('profile_image_url') or '', created_at_ts))
+        if rows:
+            cursor.executemany('''
+                INSERT INTO users (user_id, name, screen_name, profile_image_url, tweet_count, last_seen)
+                VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    name = CASE WHEN excluded.last_seen >= COALESCE(users.last_seen, 0)
+                        THEN COALESCE(excluded.name, users.name) ELSE users.name END,
+                    screen_name = CASE WHEN excluded.last_seen >= COALESCE(users.last_seen, 0)
+                        THEN COALESCE(excluded.screen_name, users.screen_name) ELSE users.screen_name END,
+                    profile_image_url = CASE WHEN excluded.last_seen >= COALESCE(users.last_seen, 0)
+                        AND excluded.profile_image_url != ''
+                        THEN excluded.profile_image_url ELSE users.profile_image_url END,
+                    tweet_count = users.tweet_count + 1,
+                    last_seen = MAX(excluded.last_seen, COALESCE(users.last_seen, 0))
+            ''', rows)
+    
+    def _init_fts(self, cursor: sqlite3.Cursor, tokenizer: str) -> Optional[str]:
+        """
+        创建 FTS5 全文索引（name、screen_name、full_text），由触发器与 tweets 表保持同步
+        
+        索引首次创建（或分词器变更）时会对已有数据做一次回填。
+        
+        Args:
+            cursor: 写连接的游标
+            tokenizer: 期望使用的分词器
+            
+        Returns:
+            实际生效的分词器，FTS5 不可用时返回 None
+        """
+        if tokenizer not in self.FTS_TOKENIZERS:
+            tokenizer = self.FTS_TOKENIZERS[0]
+        
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tweets_fts'")
+        row = cursor.fetchone()
+        if row and f"tokenize='{tokenizer}'" in row[0]:
+            return tokenizer
+        
+        # 分词器变更，删除旧索引后重建
+        if row:
+            for trigger in ('tweets_fts_ai', 'tweets_fts_ad', 'tweets_fts_au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute('DROP TABLE tweets_fts')
+        
+        # 旧版 SQLite（< 3.34）不支持 trigram，退回 unicode61
+        candidates = [tokenizer] + [tok for tok in self.FTS_TOKENIZERS if tok != tokenizer]
+        for candidate in candidates:
+            try:
+                cursor.execute(f'''
+                    CREATE VIRTUAL TABLE tweets_fts USING fts5(
+                        name, screen_name, full_text,
+                        content='tweets', content_rowid='doc_id',
+                        tokenize='{candidate}'
+                    )
+                ''')
+                break
+            except sqlite3.OperationalError:
+                continue
+        else:
+            # 当前 SQLite 未编译 FTS5，搜索回退到 LIKE
+            return None
+        
+        cursor.execute('''
+            CREATE TRIGGER tweets_fts_ai AFTER INSERT ON tweets BEGIN
+                INSERT INTO tweets_fts(rowid, name, screen_name, full_text)
+                VALUES (new.doc_id, new.name, new.screen_name, new.full_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER tweets_fts_ad AFTER DELETE ON tweets BEGIN
+                INSERT INTO tweets_fts(tweets_fts, rowid, name, screen_name, full_text)
+                VALUES ('delete', old.doc_id, old.name, old.screen_name, old.full_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER tweets_fts_au AFTER UPDATE OF name, screen_name, full_text ON tweets BEGIN
+                INSERT INTO tweets_fts(tweets_fts, rowid, name, screen_name, full_text)
+                VALUES ('delete', old.doc_id, old.name, old.screen_name, old.full_text);
+                INSERT INTO tweets_fts(rowid, name, screen_name, full_text)
+                VALUES (new.doc_id, new.name, new.screen_name, new.full_text);
+            END
+        ''')
+        
+        # 回填已有数据
+        cursor.execute("INSERT INTO tweets_fts(tweets_fts) VALUES ('rebuild')")
+        return candidate
+    
+    def _build_fts_query(self, keyword: str, columns: List[str]) -> Optional[str]:
+        """
+        构建 FTS5 MATCH 查询表达式
+        
+        Args:
+            keyword: 搜索关键词
+            columns: 要搜索的列
+            
+        Returns:
+            MATCH 表达式；全文索引不可用或关键词无法走索引时返回 None（调用方回退到 LIKE）
+        """
+        if not self.fts_tokenizer:
+            return None
+        
+        column_filter = '{' + ' '.join(columns) + '}'
+        
+        if self.fts_tokenizer == 'trigram':
+            # trigram 的短语查询即子串匹配，但少于 3 个字符的关键词无法命中索引
+            if len(keyword) < 3:
+                return None
+            phrase = keyword.replace('"', '""')
+            return f'{column_filter} : "{phrase}"'
+        
+        # unicode61：每个词按前缀匹配，多个词之间为 AND
+        terms = [term.replace('"', '""') for term in keyword.split()]
+        if not terms:
+            return None
+        return f'{column_filter} : (' + ' AND '.join(f'"{term}"*' for term in terms) + ')'
     
     def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
         """将数据库行转换为字典格式（兼容 TinyDB 格式）"""
@@ -66,26 +862,65 @@ class TweetDatabase:
             return None
         
         # 从 raw_data 恢复完整数据
-        raw_data = json.loads(row['raw_data']) if row['raw_data'] else {}
+        raw_data = self._decode_raw(row['raw_data'])
         
         # 添加 doc_id（兼容 TinyDB）
         raw_data['doc_id'] = row['doc_id']
         
+        # 附带数据库中已解析的发推时间（下划线开头，写回数据库前会被清理）
+        if 'created_at_ts' in row.keys():
+            raw_data['_created_at_ts'] = row['created_at_ts']
+        
         return raw_data
     
     def all(self) -> List[Dict[str, Any]]:
         """
-        获取所有记录
+        获取所有记录（会把整个数据库读入内存，遍历大量记录时请使用 iter_rows）
         
         Returns:
             所有推文记录的列表
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM tweets ORDER BY doc_id ASC')
-            rows = cursor.fetchall()
-            return [self._row_to_dict(row) for row in rows]
+        return list(self.iter_rows())
+    
+    def iter_rows(self, columns: List[str] = None, batch_size: int = 1000,
+                  order: str = 'ASC') -> Iterator[Dict[str, Any]]:
+        """
+        流式遍历记录（以 fetchmany 分批读取，内存占用与记录总数无关）
+        
+        Args:
+            columns: 要读取的列（见 COLUMNS），结果为 列名 -> 值 的字典并附带 doc_id，
+                     只有包含 raw_data 时才会解码 JSON；为 None 时返回完整记录（与 all() 相同）
+            batch_size: 每批读取的行数
+            order: 按 doc_id 排序的方向（ASC 或 DESC）
+            
+        Yields:
+            记录字典
+        """
+        if order not in ('ASC', 'DESC'):
+            raise ValueError(f'无效的排序方向: {order}')
+        if columns is not None:
+            invalid = [column for column in columns if column not in self.COLUMNS]
+            if invalid:
+                raise ValueError(f'无效的列名: {invalid}')
+            selected = ', '.join(['doc_id'] + [column for column in columns if column != 'doc_id'])
+        else:
+            selected = 'doc_id, raw_data'
+        
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {selected} FROM tweets ORDER BY doc_id {order}')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if columns is None:
+                    yield self._row_to_dict(row)
+                    continue
+                record = dict(row)
+                if 'raw_data' in record:
+                    record['raw_data'] = self._decode_raw(record['raw_data'])
+                yield record
     
     def get_all_ids(self) -> set:
         """
@@ -94,11 +929,52 @@ class TweetDatabase:
         Returns:
             所有推文 id 的集合
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT id FROM tweets')
-            return {row[0] for row in cursor.fetchall()}
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM tweets')
+        return {row[0] for row in cursor.fetchall()}
+    
+    def get_ids_after(self, doc_id: int = 0) -> Tuple[set, int]:
+        """
+        获取 doc_id 大于给定值的记录 id（doc_id 自增且不会复用，可用于增量同步新增的记录）
+        
+        Args:
+            doc_id: 上次同步到的最大 doc_id，传入 0 获取全部记录
+            
+        Returns:
+            (id 集合, 本次同步到的最大 doc_id)
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT doc_id, id FROM tweets WHERE doc_id > ?', (doc_id,))
+        ids = set()
+        for row_doc_id, tweet_id in cursor.fetchall():
+            ids.add(tweet_id)
+            if row_doc_id > doc_id:
+                doc_id = row_doc_id
+        return ids, doc_id
+    
+    def get_existing_ids(self, ids: List[str]) -> set:
+        """
+        获取给定 id 中已存在于数据库的部分（按批查询，不需要读出全部 id）
+        
+        Args:
+            ids: 推文 id 列表
+            
+        Returns:
+            已存在的推文 id 集合
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        ids = list(ids)
+        existing = set()
+        # 分批查询，避免超出 SQLite 参数数量限制
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT id FROM tweets WHERE id IN ({placeholders})', chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
     
     def insert(self, data: Dict[str, Any]) -> int:
         """
@@ -113,11 +989,13 @@ class TweetDatabase:
         with self._lock:
             conn = self._get_connection()
             cursor = conn.cursor()
+            created_at_ts = parse_twitter_date(data.get('created_at'))
             
             try:
                 cursor.execute('''
-                    INSERT INTO tweets (id, created_at, full_text, name, screen_name, views_count, url, media, raw_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    INSERT INTO tweets (id, created_at, full_text, name, screen_name, views_count, url, media, raw_data,
+                                        user_id, created_at_ts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     data.get('id'),
                     data.get('created_at'),
@@ -127,17 +1005,23 @@ class TweetDatabase:
                     data.get('views_count'),
                     data.get('url'),
                     json.dumps(data.get('media', []), ensure_ascii=False),
-                    json.dumps(data, ensure_ascii=False)
+                    self._encode_raw(json.dumps(data, ensure_ascii=False)),
+                    extract_user_id(data) or None,
+                    created_at_ts
                 ))
+                doc_id = cursor.lastrowid
+                self._write_media(cursor, doc_id, data)
+                self._write_users(cursor, [data], [created_at_ts])
                 conn.commit()
-                return cursor.lastrowid
+                self._generation += 1
+                return doc_id
             except sqlite3.IntegrityError:
                 # id 重复，跳过
                 return -1
     
     def insert_multiple(self, data_list: List[Dict[str, Any]]) -> int:
         """
-        批量插入记录
+        批量插入记录（id 重复的记录会被跳过）
         
         Args:
             data_list: 推文数据字典列表
@@ -145,37 +1029,74 @@ class TweetDatabase:
         Returns:
             成功插入的记录数
         """
+        return self.bulk_insert(data_list)[0]
+    
+    def bulk_insert(self, data_list: List[Dict[str, Any]], chunk_size: int = 1000) -> Tuple[int, int]:
+        """
+        批量写入记录：按块序列化后以 executemany 写入，id 冲突（或缺少 id）的记录
+        由 INSERT OR IGNORE 在 SQL 中跳过，整批在同一个事务中提交
+        
+        Args:
+            data_list: 推文数据字典列表
+            chunk_size: 每块序列化并写入的记录数
+            
+        Returns:
+            (插入数, 跳过数)
+        """
         if not data_list:
-            return 0
+            return 0, 0
         
         with self._lock:
             conn = self._get_connection()
             cursor = conn.cursor()
             inserted_count = 0
             
-            for data in data_list:
-                try:
-                    cursor.execute('''
-                        INSERT INTO tweets (id, created_at, full_text, name, screen_name, views_count, url, media, raw_data)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        data.get('id'),
-                        data.get('created_at'),
-                        data.get('full_text'),
-                        data.get('name'),
-                        data.get('screen_name'),
-                        data.get('views_count'),
-                        data.get('url'),
-                        json.dumps(data.get('media', []), ensure_ascii=False),
-                        json.dumps(data, ensure_ascii=False)
-                    ))
-                    inserted_count += 1
-                except sqlite3.IntegrityError:
-                    # id 重复，跳过
-                    continue
+            for i in range(0, len(data_list), chunk_size):
+                chunk = data_list[i:i + chunk_size]
+                
+                # AUTOINCREMENT 保证新行的 doc_id 大于已有的最大值，借此找出本块实际插入的行
+                cursor.execute('SELECT COALESCE(MAX(doc_id), 0) FROM tweets')
+                last_doc_id = cursor.fetchone()[0]
+                
+                # id 列为 TEXT，部分导出工具给出整数 id；统一转成字符串，与下面查询回来的 id 一致
+                chunk_ids = [None if data.get('id') is None else str(data.get('id')) for data in chunk]
+                
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO tweets (id, created_at, full_text, name, screen_name, views_count, url, media,
+                                                  raw_data, user_id, created_at_ts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(
+                    tweet_id,
+                    data.get('created_at'),
+                    data.get('full_text'),
+                    data.get('name'),
+                    data.get('screen_name'),
+                    data.get('views_count'),
+                    data.get('url'),
+                    dumps_json(data.get('media', [])),
+                    self._encode_raw(dumps_json(data)),
+                    extract_user_id(data) or None,
+                    parse_twitter_date(data.get('created_at'))
+                ) for tweet_id, data in zip(chunk_ids, chunk)])
+                
+                # total_changes 会计入触发器的写入，因此直接查询本块新插入的行
+                cursor.execute('SELECT doc_id, id, created_at_ts FROM tweets WHERE doc_id > ? ORDER BY doc_id',
+                               (last_doc_id,))
+                inserted_rows = cursor.fetchall()
+                if inserted_rows:
+                    inserted_count += len(inserted_rows)
+                    # 块内 id 重复时以第一条为准（与 INSERT OR IGNORE 保留的行一致）
+                    data_by_id = {}
+                    for tweet_id, data in zip(chunk_ids, chunk):
+                        data_by_id.setdefault(tweet_id, data)
+                    for doc_id, tweet_id, _ in inserted_rows:
+                        self._write_media(cursor, doc_id, data_by_id[tweet_id])
+                    self._write_users(cursor, [data_by_id[tweet_id] for _, tweet_id, _ in inserted_rows],
+                                      [created_at_ts for _, _, created_at_ts in inserted_rows])
             
             conn.commit()
-            return inserted_count
+            self._generation += 1
+            return inserted_count, len(data_list) - inserted_count
     
     def remove(self, doc_ids: List[int] = None, tweet_id: str = None) -> int:
         """
@@ -201,6 +1122,9 @@ class TweetDatabase:
                 return 0
             
             conn.commit()
+            self._generation += 1
+            if cursor.rowcount:
+                self._remove_generation += 1
             return cursor.rowcount
     
     def get_by_id(self, tweet_id: str) -> Optional[Dict[str, Any]]:
@@ -213,12 +1137,11 @@ class TweetDatabase:
         Returns:
             推文数据字典，如果不存在返回 None
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM tweets WHERE id = ?', (tweet_id,))
-            row = cursor.fetchone()
-            return self._row_to_dict(row)
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM tweets WHERE id = ?', (tweet_id,))
+        row = cursor.fetchone()
+        return self._row_to_dict(row)
     
     def get_by_doc_id(self, doc_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -230,12 +1153,34 @@ class TweetDatabase:
         Returns:
             推文数据字典，如果不存在返回 None
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM tweets WHERE doc_id = ?', (doc_id,))
-            row = cursor.fetchone()
-            return self._row_to_dict(row)
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM tweets WHERE doc_id = ?', (doc_id,))
+        row = cursor.fetchone()
+        return self._row_to_dict(row)
+    
+    def get_by_doc_ids(self, doc_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        通过 doc_id 批量获取记录
+        
+        Args:
+            doc_ids: 文档 id 列表
+            
+        Returns:
+            推文数据字典列表（按传入顺序，不存在的 doc_id 被忽略）
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        doc_ids = list(doc_ids)
+        records = {}
+        # 分批查询，避免超出 SQLite 参数数量限制
+        for i in range(0, len(doc_ids), 500):
+            chunk = doc_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT doc_id, raw_data FROM tweets WHERE doc_id IN ({placeholders})', chunk)
+            for row in cursor.fetchall():
+                records[row['doc_id']] = self._row_to_dict(row)
+        return [records[doc_id] for doc_id in doc_ids if doc_id in records]
     
     def count(self) -> int:
         """
@@ -244,66 +1189,158 @@ class TweetDatabase:
         Returns:
             记录总数
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM tweets')
-            return cursor.fetchone()[0]
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM tweets')
+        return cursor.fetchone()[0]
     
-    def get_tweet_position(self, tweet_id: str, exclude_ids: set = None) -> int:
+    def get_tweet_position(self, tweet_id: str, exclude_ids: set = None, exclude_deleted: bool = False) -> int:
         """
         获取推文在所有推文中的位置（按doc_id倒序排列）
         
         Args:
             tweet_id: 推文 id
             exclude_ids: 要排除的推文id集合
+            exclude_deleted: 是否排除附加的删除库中的推文（见 attach_deleted_db）
             
         Returns:
             推文位置（从1开始），如果不存在返回 -1
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # 首先获取该推文的 doc_id
-            cursor.execute('SELECT doc_id FROM tweets WHERE id = ?', (tweet_id,))
-            row = cursor.fetchone()
-            if not row:
-                return -1
-            
-            target_doc_id = row[0]
-            
-            # 构建排除条件
-            conditions = []
-            params = []
-            
-            if exclude_ids:
-                placeholders = ','.join('?' * len(exclude_ids))
-                conditions.append(f'id NOT IN ({placeholders})')
-                params.extend(list(exclude_ids))
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        
+        # 首先获取该推文的 doc_id
+        cursor.execute('SELECT doc_id FROM tweets WHERE id = ?', (tweet_id,))
+        row = cursor.fetchone()
+        if not row:
+            return -1
+        
+        target_doc_id = row[0]
+        
+        # 构建排除条件
+        conditions, params = self._build_conditions(exclude_ids, exclude_deleted=exclude_deleted)
+        
+        # 排名 = 所有 doc_id 大于目标的记录数 + 1（因为是倒序排列）
+        conditions.append('doc_id > ?')
+        params.append(target_doc_id)
+        query = f'SELECT COUNT(*) FROM tweets WHERE {" AND ".join(conditions)}'
+        cursor.execute(query, params)
+        position = cursor.fetchone()[0] + 1
+        
+        return position
+    
+    def _build_conditions(self, exclude_ids: set = None, search_keyword: str = None,
+                          search_in_name: bool = True, search_in_screen_name: bool = True,
+                          search_in_text: bool = True, exclude_deleted: bool = False,
+                          has_undownloaded_media: bool = False, date_from: int = None,
+                          date_to: int = None) -> tuple:
+        """
+        构建列表查询的筛选条件
+        
+        Returns:
+            (条件列表, 参数列表)
+        """
+        conditions = []
+        params = []
+        
+        # 排除已删除的推文
+        if exclude_ids:
+            placeholders = ','.join('?' * len(exclude_ids))
+            conditions.append(f'id NOT IN ({placeholders})')
+            params.extend(list(exclude_ids))
+        
+        if exclude_deleted and self._deleted_db:
+            # 反连接走删除库 id 列上的唯一索引
+            conditions.append('NOT EXISTS (SELECT 1 FROM deleted.tweets d WHERE d.id = tweets.id)')
+        
+        if has_undownloaded_media:
+            # 推文（含引用推文）的媒体中存在本地媒体索引里找不到的标识符；
+            # 两层子查询分别走 tweet_media(tweet_doc_id) 与 media_files(identifier) 索引，
+            # 按 doc_id 顺序分页时只需检查到凑满一页为止
+            conditions.append('''EXISTS (
+                SELECT 1 FROM tweet_media m
+                WHERE m.tweet_doc_id = tweets.doc_id AND m.identifier != ''
+                  AND NOT EXISTS (SELECT 1 FROM media_files f WHERE f.identifier = m.identifier)
+            )''')
+        
+        # 发推时间范围（毫秒时间戳，闭区间），走 created_at_ts 索引
+        if date_from is not None:
+            conditions.append('created_at_ts >= ?')
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append('created_at_ts <= ?')
+            params.append(date_to)
+        
+        # 搜索条件
+        if search_keyword:
+            columns = [column for column, enabled in (
+                ('name', search_in_name),
+                ('screen_name', search_in_screen_name),
+                ('full_text', search_in_text),
+            ) if enabled]
             
-            # 计算有多少条记录的 doc_id 大于目标推文（因为是倒序排列）
-            where_clause = ''
-            if conditions:
-                where_clause = 'WHERE ' + ' AND '.join(conditions)
+            fts_query = self._build_fts_query(search_keyword, columns) if columns else None
+            if fts_query:
+                # 通过全文索引查找匹配的 doc_id，代价与匹配数成正比
+                conditions.append('doc_id IN (SELECT rowid FROM tweets_fts WHERE tweets_fts MATCH ?)')
+                params.append(fts_query)
+            elif columns:
+                search_pattern = f'%{search_keyword}%'
+                conditions.append('(' + ' OR '.join(f'{column} LIKE ?' for column in columns) + ')')
+                params.extend([search_pattern] * len(columns))
+        
+        return conditions, params
+    
+    def _count_where(self, cursor: sqlite3.Cursor, conditions: List[str], params: list) -> int:
+        """
+        统计满足条件的记录数（按条件缓存，数据写入后自动失效）
+        
+        Args:
+            cursor: 读连接的游标
+            conditions: 条件列表
+            params: 参数列表
             
-            # 排名 = 所有 doc_id 大于目标的记录数 + 1
-            query = f'''
-                SELECT COUNT(*) FROM tweets 
-                {where_clause}
-                {'AND' if conditions else 'WHERE'} doc_id > ?
-            '''
-            params.append(target_doc_id)
-            cursor.execute(query, params)
-            position = cursor.fetchone()[0] + 1
+        Returns:
+            记录数
+        """
+        where_clause = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        key = (where_clause, tuple(params))
+        # 删除库的写入同样会影响排除后的总数
+        generation = (self._generation, self._deleted_db._generation if self._deleted_db else 0)
+        
+        cached = self._count_cache.get(key)
+        if cached and cached[0] == generation:
+            return cached[1]
+        
+        cursor.execute(f'SELECT COUNT(*) FROM tweets {where_clause}', params)
+        total = cursor.fetchone()[0]
+        
+        # 限制缓存大小，避免不同搜索词无限累积
+        if len(self._count_cache) >= 256:
+            self._count_cache.clear()
+        self._count_cache[key] = (generation, total)
+        return total
+    
+    def _order_by(self, sort: str) -> str:
+        """
+        获取排序方式对应的 ORDER BY 子句
+        
+        Args:
+            sort: 排序方式（见 SORT_ORDERS）
             
-            return position
+        Returns:
+            ORDER BY 子句（不含 ORDER BY 关键字）
+        """
+        key_columns, direction = self.SORT_ORDERS[sort]
+        return ', '.join(f'{column} {direction}' for column in key_columns)
     
     def get_paginated(self, page: int = 1, per_page: int = 10, exclude_ids: set = None,
                        search_keyword: str = None, search_in_name: bool = True,
-                       search_in_screen_name: bool = True, search_in_text: bool = True) -> tuple:
+                       search_in_screen_name: bool = True, search_in_text: bool = True,
+                       exclude_deleted: bool = False, has_undownloaded_media: bool = False,
+                       date_from: int = None, date_to: int = None, sort: str = 'added') -> tuple:
         """
-        分页获取记录（按doc_id倒序，即最新的在前）
+        分页获取记录（默认按doc_id倒序，即最新的在前）
         
         Args:
             page: 页码（从1开始）
@@ -313,63 +1350,138 @@ class TweetDatabase:
             search_in_name: 是否搜索作者昵称
             search_in_screen_name: 是否搜索作者ID
             search_in_text: 是否搜索正文
+            exclude_deleted: 是否排除附加的删除库中的推文（见 attach_deleted_db）
+            has_undownloaded_media: 是否只返回包含未下载媒体的推文（见 scan_media_files）
+            date_from: 发推时间下限（毫秒时间戳，包含）
+            date_to: 发推时间上限（毫秒时间戳，包含）
+            sort: 排序方式（见 SORT_ORDERS）
             
         Returns:
             (记录列表, 总数)
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # 构建基础条件和参数
-            conditions = []
-            params = []
-            
-            # 排除已删除的推文
-            if exclude_ids:
-                placeholders = ','.join('?' * len(exclude_ids))
-                conditions.append(f'id NOT IN ({placeholders})')
-                params.extend(list(exclude_ids))
-            
-            # 搜索条件
-            if search_keyword:
-                search_conditions = []
-                search_pattern = f'%{search_keyword}%'
-                if search_in_name:
-                    search_conditions.append('name LIKE ?')
-                    params.append(search_pattern)
-                if search_in_screen_name:
-                    search_conditions.append('screen_name LIKE ?')
-                    params.append(search_pattern)
-                if search_in_text:
-                    search_conditions.append('full_text LIKE ?')
-                    params.append(search_pattern)
-                
-                if search_conditions:
-                    conditions.append(f'({" OR ".join(search_conditions)})')
-            
-            # 构建 WHERE 子句
-            where_clause = ''
-            if conditions:
-                where_clause = 'WHERE ' + ' AND '.join(conditions)
-            
-            # 查询总数
-            count_query = f'SELECT COUNT(*) FROM tweets {where_clause}'
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()[0]
-            
-            # 分页查询
-            offset = (page - 1) * per_page
-            query = f'''
-                SELECT * FROM tweets 
-                {where_clause}
-                ORDER BY doc_id DESC 
-                LIMIT ? OFFSET ?
-            '''
-            cursor.execute(query, params + [per_page, offset])
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        
+        conditions, params = self._build_conditions(
+            exclude_ids, search_keyword, search_in_name, search_in_screen_name, search_in_text,
+            exclude_deleted, has_undownloaded_media, date_from, date_to
+        )
+        
+        # 查询总数
+        total = self._count_where(cursor, conditions, params)
+        
+        # 构建 WHERE 子句
+        where_clause = ''
+        if conditions:
+            where_clause = 'WHERE ' + ' AND '.join(conditions)
+        
+        # 分页查询
+        offset = (page - 1) * per_page
+        query = f'''
+            SELECT * FROM tweets 
+            {where_clause}
+            ORDER BY {self._order_by(sort)}
+            LIMIT ? OFFSET ?
+        '''
+        cursor.execute(query, params + [per_page, offset])
+        
+        rows = cursor.fetchall()
+        return [self._row_to_dict(row) for row in rows], total
+    
+    def get_page_by_cursor(self, per_page: int = 10, before_doc_id: int = None, after_doc_id: int = None,
+                           exclude_ids: set = None, search_keyword: str = None,
+                           search_in_name: bool = True, search_in_screen_name: bool = True,
+                           search_in_text: bool = True, exclude_deleted: bool = False,
+                           has_undownloaded_media: bool = False, with_total: bool = False,
+                           date_from: int = None, date_to: int = None, sort: str = 'added',
+                           cursor_ts: int = None) -> tuple:
+        """
+        基于游标（排序键定位）的分页查询，默认按 doc_id 倒序返回
+        
+        直接在排序键的索引上定位起点，翻页代价与页码无关。before_doc_id 和 after_doc_id 都不传时返回第一页。
+        
+        Args:
+            per_page: 每页数量
+            before_doc_id: 返回排在该记录之后的记录（向后翻页；默认排序下即更旧）
+            after_doc_id: 返回排在该记录之前的记录（向前翻页；默认排序下即更新）
+            exclude_ids: 要排除的推文id集合
+            search_keyword: 搜索关键词
+            search_in_name: 是否搜索作者昵称
+            search_in_screen_name: 是否搜索作者ID
+            search_in_text: 是否搜索正文
+            exclude_deleted: 是否排除附加的删除库中的推文（见 attach_deleted_db）
+            has_undownloaded_media: 是否只返回包含未下载媒体的推文（见 scan_media_files）
+            with_total: 是否同时返回总数
+            date_from: 发推时间下限（毫秒时间戳，包含）
+            date_to: 发推时间上限（毫秒时间戳，包含）
+            sort: 排序方式（见 SORT_ORDERS）
+            cursor_ts: 游标记录的 created_at_ts（按发推时间排序时必须提供）
             
-            rows = cursor.fetchall()
-            return [self._row_to_dict(row) for row in rows], total
+        Returns:
+            (记录列表, 后面是否还有记录, 前面是否还有记录, 总数或 None)
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        
+        conditions, params = self._build_conditions(
+            exclude_ids, search_keyword, search_in_name, search_in_screen_name, search_in_text,
+            exclude_deleted, has_undownloaded_media, date_from, date_to
+        )
+        
+        total = self._count_where(cursor, conditions, params) if with_total else None
+        
+        key_columns, direction = self.SORT_ORDERS[sort]
+        reverse_direction = 'ASC' if direction == 'DESC' else 'DESC'
+        
+        def seek(doc_id: int, ts: int, forward: bool) -> tuple:
+            """定位条件：forward 为 True 时取排在游标之后的记录，否则取之前的"""
+            values = [ts, doc_id] if len(key_columns) == 2 else [doc_id]
+            operator = '<' if (direction == 'DESC') == forward else '>'
+            return f'({", ".join(key_columns)}) {operator} ({", ".join("?" * len(values))})', values
+        
+        if after_doc_id is not None:
+            seek_condition, seek_params = seek(after_doc_id, cursor_ts, forward=False)
+            order = reverse_direction
+        elif before_doc_id is not None:
+            seek_condition, seek_params = seek(before_doc_id, cursor_ts, forward=True)
+            order = direction
+        else:
+            seek_condition, seek_params, order = None, [], direction
+        
+        page_conditions = conditions + ([seek_condition] if seek_condition else [])
+        page_params = params + seek_params
+        where_clause = ('WHERE ' + ' AND '.join(page_conditions)) if page_conditions else ''
+        order_by = ', '.join(f'{column} {order}' for column in key_columns)
+        
+        # 多取一条用于判断该方向上是否还有记录
+        cursor.execute(
+            f'SELECT * FROM tweets {where_clause} ORDER BY {order_by} LIMIT ?',
+            page_params + [per_page + 1]
+        )
+        rows = cursor.fetchall()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if order != direction:
+            rows.reverse()
+        
+        if not rows:
+            return [], False, False, total
+        
+        def exists_beyond(row: sqlite3.Row, forward: bool) -> bool:
+            ts = row['created_at_ts'] if len(key_columns) == 2 else None
+            condition, values = seek(row['doc_id'], ts, forward)
+            exists_where = ' AND '.join(conditions + [condition])
+            cursor.execute(f'SELECT 1 FROM tweets WHERE {exists_where} LIMIT 1', params + values)
+            return cursor.fetchone() is not None
+        
+        if after_doc_id is not None:
+            has_newer = has_more
+            has_older = exists_beyond(rows[-1], forward=True)
+        else:
+            has_older = has_more
+            has_newer = before_doc_id is not None and exists_beyond(rows[0], forward=False)
+        
+        return [self._row_to_dict(row) for row in rows], has_older, has_newer, total
     
     def exists(self, tweet_id: str) -> bool:
         """
@@ -381,11 +1493,238 @@ class TweetDatabase:
         Returns:
             是否存在
         """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM tweets WHERE id = ? LIMIT 1', (tweet_id,))
+        return cursor.fetchone() is not None
+    
+    def get_media(self, doc_ids: List[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        获取推文的媒体记录
+        
+        Args:
+            doc_ids: doc_id 列表，为 None 时返回所有推文的媒体
+            
+        Returns:
+            doc_id -> 媒体列表（按提取顺序，主推文媒体在前），每项的 path 为本地文件路径或 None
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        # path 为本地已下载文件的路径（来自 media_files 索引），未下载时为 None
+        columns = '''m.tweet_doc_id, m.identifier, m.type, m.url, m.best_bitrate, m.from_quote,
+            (SELECT f.path FROM media_files f WHERE f.identifier = m.identifier
+             ORDER BY f.path LIMIT 1) AS path'''
+        
+        rows = []
+        if doc_ids is None:
+            cursor.execute(f'SELECT {columns} FROM tweet_media m ORDER BY m.tweet_doc_id, m.rowid')
+            rows = cursor.fetchall()
+        else:
+            # 分批查询，避免超出 SQLite 参数数量限制
+            doc_ids = list(doc_ids)
+            for i in range(0, len(doc_ids), 500):
+                chunk = doc_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(
+                    f'SELECT {columns} FROM tweet_media m WHERE m.tweet_doc_id IN ({placeholders}) '
+                    f'ORDER BY m.tweet_doc_id, m.rowid',
+                    chunk
+                )
+                rows.extend(cursor.fetchall())
+        
+        media_map = {}
+        for row in rows:
+            media = dict(row)
+            media_map.setdefault(media.pop('tweet_doc_id'), []).append(media)
+        return media_map
+    
+    def get_media_identifiers(self) -> set:
+        """
+        获取所有媒体标识符集合（不含无法提取标识符的媒体）
+        
+        Returns:
+            媒体标识符集合
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT identifier FROM tweet_media WHERE identifier != ''")
+        return {row[0] for row in cursor.fetchall()}
+    
+    def get_users(self, user_ids: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取用户信息（来自用户表，按推文数从多到少排列）
+        
+        Args:
+            user_ids: user_id 列表，为 None 时返回所有用户
+            
+        Returns:
+            用户列表，每项包含 user_id, name, screen_name, profile_image_url, tweet_count, last_seen
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        columns = 'user_id, name, screen_name, profile_image_url, tweet_count, last_seen'
+        
+        rows = []
+        if user_ids is None:
+            cursor.execute(f'SELECT {columns} FROM users ORDER BY tweet_count DESC, user_id')
+            rows = cursor.fetchall()
+        else:
+            # 分批查询，避免超出 SQLite 参数数量限制
+            user_ids = list(user_ids)
+            for i in range(0, len(user_ids), 500):
+                chunk = user_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'SELECT {columns} FROM users WHERE user_id IN ({placeholders})', chunk)
+                rows.extend(cursor.fetchall())
+            rows.sort(key=lambda row: (-row['tweet_count'], row['user_id']))
+        return [dict(row) for row in rows]
+    
+    def scan_media_files(self, root: str) -> int:
+        """
+        增量扫描下载目录，更新本地媒体文件索引
+        
+        目录的 mtime 只在其中的条目增删或改名时变化，因此 mtime 未变化的目录不再列举，
+        直接沿用索引中记录的文件与子目录，只有新增或发生变化的目录才会被重新读取。
+        不在本次扫描范围内的目录（已删除或根目录已更换）会从索引中移除。
+        
+        Args:
+            root: 下载根目录
+            
+        Returns:
+            重新读取或移除的目录数量
+        """
+        root = os.path.abspath(root) if root else ''
+        
+        # 读取索引中的目录信息
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT path, parent, mtime FROM media_dirs')
+        known_mtimes = {}
+        children = {}
+        for row in cursor.fetchall():
+            known_mtimes[row['path']] = row['mtime']
+            children.setdefault(row['parent'], []).append(row['path'])
+        
+        # 遍历目录树（文件系统 I/O 在写锁之外进行）
+        seen_dirs = set()
+        changed_dirs = []  # (目录, 父目录, mtime, 文件列表)
+        stack = [(root, None)] if root and os.path.isdir(root) else []
+        while stack:
+            dir_path, parent = stack.pop()
+            try:
+                mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+            seen_dirs.add(dir_path)
+            
+            if known_mtimes.get(dir_path) == mtime:
+                # 目录未变化：文件列表沿用索引，只需继续检查已知的子目录
+                stack.extend((child, dir_path) for child in children.get(dir_path, []))
+                continue
+            
+            files = []
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, dir_path))
+                        elif entry.is_file():
+                            stem, ext = os.path.splitext(entry.name)
+                            if ext.lower() in MEDIA_EXTENSIONS:
+                                stat = entry.stat()
+                                files.append((entry.path, dir_path, stem, stat.st_size, stat.st_mtime_ns))
+            except OSError as e:
+                print(f"扫描媒体目录失败: {dir_path}, 错误: {e}")
+                continue
+            changed_dirs.append((dir_path, parent, mtime, files))
+        
+        removed_dirs = [path for path in known_mtimes if path not in seen_dirs]
+        if not changed_dirs and not removed_dirs:
+            return 0
+        
         with self._lock:
             conn = self._get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT 1 FROM tweets WHERE id = ? LIMIT 1', (tweet_id,))
-            return cursor.fetchone() is not None
+            
+            cursor.executemany('DELETE FROM media_files WHERE dir = ?', [(path,) for path in removed_dirs])
+            cursor.executemany('DELETE FROM media_dirs WHERE path = ?', [(path,) for path in removed_dirs])
+            for dir_path, parent, mtime, files in changed_dirs:
+                cursor.execute('DELETE FROM media_files WHERE dir = ?', (dir_path,))
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO media_files (path, dir, identifier, size, mtime)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', files)
+                cursor.execute(
+                    'INSERT OR REPLACE INTO media_dirs (path, parent, mtime) VALUES (?, ?, ?)',
+                    (dir_path, parent, mtime)
+                )
+            
+            conn.commit()
+            self._generation += 1
+        
+        return len(changed_dirs) + len(removed_dirs)
+    
+    def remove_media_files(self, paths: List[str]):
+        """
+        从本地媒体索引中移除文件（删除媒体文件后调用）
+        
+        Args:
+            paths: 文件完整路径列表
+        """
+        with self._lock:
+            conn = self._get_connection()
+            conn.executemany('DELETE FROM media_files WHERE path = ?', [(path,) for path in paths])
+            conn.commit()
+            self._generation += 1
+    
+    def find_media_file(self, identifier: str) -> Optional[str]:
+        """
+        按标识符（文件名去除扩展名）查找本地媒体文件
+        
+        Args:
+            identifier: 媒体标识符
+            
+        Returns:
+            文件完整路径，未找到返回 None
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT path FROM media_files WHERE identifier = ? ORDER BY path LIMIT 1',
+            (identifier,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def get_media_file_identifiers(self) -> set:
+        """
+        获取本地已下载媒体文件的标识符集合
+        
+        Returns:
+            标识符集合
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT DISTINCT identifier FROM media_files')
+        return {row[0] for row in cursor.fetchall()}
+    
+    def has_undownloaded_media(self) -> bool:
+        """
+        检查是否存在本地尚未下载的媒体（按标识符精确匹配）
+        
+        Returns:
+            是否存在未下载的媒体
+        """
+        conn = self._get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT EXISTS (
+                SELECT 1 FROM tweet_media m
+                WHERE m.identifier != ''
+                  AND NOT EXISTS (SELECT 1 FROM media_files f WHERE f.identifier = m.identifier)
+            )
+        ''')
+        return bool(cursor.fetchone()[0])
     
     def update(self, tweet_id: str, data: Dict[str, Any]) -> bool:
         """
@@ -403,6 +1742,14 @@ class TweetDatabase:
             cursor = conn.cursor()
             
             try:
+                cursor.execute('SELECT doc_id, user_id FROM tweets WHERE id = ?', (tweet_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                doc_id, old_user_id = row
+                user_id = extract_user_id(data) or None
+                created_at_ts = parse_twitter_date(data.get('created_at'))
+                
                 cursor.execute('''
                     UPDATE tweets SET 
                         created_at = ?,
@@ -412,8 +1759,10 @@ class TweetDatabase:
                         views_count = ?,
                         url = ?,
                         media = ?,
-                        raw_data = ?
-                    WHERE id = ?
+                        raw_data = ?,
+                        user_id = ?,
+                        created_at_ts = ?
+                    WHERE doc_id = ?
                 ''', (
                     data.get('created_at'),
                     data.get('full_text'),
@@ -422,17 +1771,59 @@ class TweetDatabase:
                     data.get('views_count'),
                     data.get('url'),
                     json.dumps(data.get('media', []), ensure_ascii=False),
-                    json.dumps(data, ensure_ascii=False),
-                    tweet_id
+                    self._encode_raw(json.dumps(data, ensure_ascii=False)),
+                    user_id,
+                    created_at_ts,
+                    doc_id
                 ))
+                
+                # 重建该推文的媒体记录
+                cursor.execute('DELETE FROM tweet_media WHERE tweet_doc_id = ?', (doc_id,))
+                self._write_media(cursor, doc_id, data)
+                
+                # 更新用户表：推文数先从原作者减一，再由 _write_users 计入新作者（作者未变时抵消）；
+                # 资料是否覆盖同样按发推时间判断，编辑旧推文不会覆盖更新的头像
+                if old_user_id:
+                    cursor.execute('UPDATE users SET tweet_count = tweet_count - 1 WHERE user_id = ?', (old_user_id,))
+                    if old_user_id != user_id:
+                        cursor.execute('DELETE FROM users WHERE user_id = ? AND tweet_count <= 0', (old_user_id,))
+                self._write_users(cursor, [data], [created_at_ts])
+                
                 conn.commit()
-                return cursor.rowcount > 0
+                self._generation += 1
+                return True
             except Exception as e:
+                conn.rollback()
                 print(f"更新推文失败: {e}")
                 return False
     
+    def backup(self, dest_path: str):
+        """
+        通过 SQLite 在线备份接口把数据库完整复制到 dest_path（用于创建还原点）
+        
+        备份期间持有写锁，其他线程的写入会等待备份完成，得到的是某一时刻的一致快照（包括尚在 WAL 日志中的事务）
+        
+        Args:
+            dest_path: 目标文件路径（已存在时会被覆盖）
+        """
+        with self._lock:
+            conn = self._get_connection()
+            dest = sqlite3.connect(dest_path)
+            try:
+                conn.backup(dest)
+                # 快照改为普通日志模式，使其是单个独立的文件
+                dest.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                dest.close()
+    
     def close(self):
-        """关闭数据库连接"""
+        """关闭数据库连接（包括所有线程的读连接）"""
+        with self._pool_lock:
+            for conn in self._read_pool.values():
+                conn.close()
+            self._read_pool.clear()
+            # 替换线程局部对象，使其他线程下次读取时重新建立连接
+            self._local = threading.local()
         with self._lock:
             if self._conn:
                 self._conn.close()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+下载后端接口
+下载窗口、头像下载和下载日志只通过这里定义的方法使用下载后端（aria2 RPC 或内置的 asyncio HTTP 下载）
+"""
+
+import os
+import threading
+from typing import List, Dict, Optional, Tuple, Callable
+
+
+class DownloadBackend:
+    """
+    下载后端基类
+    
+    任务以 gid（字符串）标识；状态字典使用 aria2 的字段名（见 STATUS_KEYS，数值为字符串），
+    status 取值为 waiting / active / paused / complete / error / removed；
+    任务开始、完成、失败时以 aria2 的通知名（如 aria2.onDownloadComplete）调用通知回调
+    """
+    
+    NAME = ''
+    # 查询下载状态时返回的字段
+    STATUS_KEYS = ["gid", "status", "totalLength", "completedLength", "downloadSpeed", "errorMessage"]
+    # 批量添加任务时每批的任务数
+    ADD_CHUNK_SIZE = 200
+    
+    def __init__(self):
+        self.notifications_connected = False  # 通知是否可用（可用时状态跟踪只查询收到通知的任务）
+        self._notification_callbacks = []  # callback(事件名, gid)
+        self._notification_lock = threading.Lock()
+    
+    def start(self) -> bool:
+        """启动后端，返回是否成功"""
+        raise NotImplementedError
+    
+    def stop(self):
+        """停止后端"""
+        raise NotImplementedError
+    
+    def is_available(self) -> bool:
+        """后端是否已启动、可以添加任务"""
+        raise NotImplementedError
+    
+    def add_downloads(self, tasks: List[Tuple[str, str, str]], chunk_size: int = None) -> List[Optional[str]]:
+        """
+        批量添加下载任务
+        
+        Args:
+            tasks: [(url, 保存目录, 文件名)] 列表
+            chunk_size: 每批添加的任务数，默认为 ADD_CHUNK_SIZE
+            
+        Returns:
+            gid 列表，与 tasks 顺序一致，添加失败的任务为 None
+        """
+        raise NotImplementedError
+    
+    def get_statuses(self, gids: Optional[List[str]] = None) -> Optional[Dict[str, Dict[str, str]]]:
+        """
+        查询任务状态
+        
+        Args:
+            gids: 为 None 时查询所有任务；否则只查询下载中的任务和给定的任务
+            
+        Returns:
+            {gid: 状态字典}；查询失败返回 None
+        """
+        raise NotImplementedError
+    
+    def set_global_limits(self, max_concurrent: int, max_speed_mb: int):
+        """
+        修改同时下载数和总速度限制（不需要重启后端）
+        
+        Args:
+            max_concurrent: 同时下载的任务数
+            max_speed_mb: 总速度限制（MB/s），0 表示不限制
+        """
+        raise NotImplementedError
+    
+    def add_notification_callback(self, callback: Callable[[str, str], None]):
+        """
+        注册通知回调（在后端的线程中调用）
+        
+        Args:
+            callback: callback(事件名, gid)，事件名为 aria2 的通知方法名，如 aria2.onDownloadComplete
+        """
+        with self._notification_lock:
+            self._notification_callbacks.append(callback)
+    
+    def remove_notification_callback(self, callback: Callable[[str, str], None]):
+        """移除通知回调"""
+        with self._notification_lock:
+            if callback in self._notification_callbacks:
+                self._notification_callbacks.remove(callback)
+    
+    def _dispatch_notification(self, event: str, gid: str):
+        """调用所有通知回调"""
+        with self._notification_lock:
+            callbacks = list(self._notification_callbacks)
+        for callback in callbacks:
+            try:
+                callback(event, gid)
+            except Exception as e:
+                print(f"处理下载通知失败: {e}")
+    
+    def reconcile_journal(self, journal) -> int:
+        """
+        启动时将下载日志中已添加的任务与后端核对：后端中仍存在的任务更新为其当前状态；
+        后端重启后丢失的任务，目标文件已完整下载（没有 .aria2 控制文件）的标记为完成，其余重新标记为等待添加
+        
+        Args:
+            journal: 下载日志
+            
+        Returns:
+            需要继续下载（等待添加）的任务数
+        """
+        queued = journal.get_tasks(journal.STATE_QUEUED)
+        statuses = {}
+        for start in range(0, len(queued), self.ADD_CHUNK_SIZE):
+            chunk = queued[start:start + self.ADD_CHUNK_SIZE]
+            statuses.update(self.get_statuses([task['gid'] for task in chunk]) or {})
+        
+        finished = []  # [(gid, 状态, 错误信息)]
+        complete_ids = []
+        pending_ids = []
+        for task in queued:
+            status = statuses.get(task['gid'])
+            if status:
+                if status['status'] == 'complete':
+                    finished.append((task['gid'], journal.STATE_COMPLETE, None))
+                elif status['status'] == 'error':
+                    finished.append((task['gid'], journal.STATE_ERROR, status.get('errorMessage')))
+                elif status['status'] == 'removed':
+                    finished.append((task['gid'], journal.STATE_CANCELLED, None))
+                continue
+            
+            path = os.path.join(task['dir'], task['file_name'])
+            if os.path.exists(path) and not os.path.exists(path + '.aria2'):
+                complete_ids.append(task['task_id'])
+            else:
+                pending_ids.append(task['task_id'])
+        
+        journal.finish(finished)
+        journal.mark_complete(complete_ids)
+        journal.reset_to_pending(pending_ids)
+        return journal.get_stats()[journal.STATE_PENDING]
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+下载日志模块
+把下载任务及其状态记录在 SQLite 中，窗口关闭或程序崩溃后可以直接继续未完成的下载，不需要重新扫描媒体
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple
+
+
+# 全局下载日志（下载窗口和主窗口共用）
+global_download_journal = None
+_global_lock = threading.Lock()
+
+
+class DownloadJournal:
+    """下载日志：每个目标文件（保存目录 + 文件名）对应一条记录"""
+    
+    STATE_PENDING = 'pending'  # 等待添加到 aria2
+    STATE_QUEUED = 'queued'  # 已添加到 aria2
+    STATE_COMPLETE = 'complete'
+    STATE_ERROR = 'error'
+    STATE_CANCELLED = 'cancelled'
+    STATES = (STATE_PENDING, STATE_QUEUED, STATE_COMPLETE, STATE_ERROR, STATE_CANCELLED)
+    # 已完成和已取消的记录保留的天数，之后由 prune 删除（失败的记录保留，以便重试）
+    PRUNE_AFTER_DAYS = 7
+    
+    def __init__(self, db_path: str):
+        """
+        打开（或创建）下载日志
+        
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_db()
+    
+    def _init_db(self):
+        """初始化表结构"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS download_tasks (
+                    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    dir TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    file_type TEXT,
+                    batch TEXT,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    gid TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    UNIQUE (dir, file_name)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_download_tasks_state ON download_tasks(state)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_download_tasks_gid ON download_tasks(gid)')
+            self._conn.commit()
+    
+    def add_tasks(self, tasks: List[Dict[str, Any]]) -> Dict[Tuple[str, str], str]:
+        """
+        记录要下载的任务；同一目标文件已有记录时重置为等待添加（保留尝试次数）
+        
+        已添加到下载后端（queued）的记录不会被重置：它可能正由另一个下载窗口跟踪，
+        重置后那个窗口按 gid 记录的结束状态就会丢失。调用方应跳过这些任务，直接跟踪返回的 gid
+        
+        Args:
+            tasks: 任务列表，每个任务包含 url, dir, file_name，可选 file_type, batch
+            
+        Returns:
+            {(保存目录, 文件名): gid}，已添加到下载后端、本次没有重置的任务
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            queued = {}
+            for task in tasks:
+                row = self._conn.execute(
+                    "SELECT gid FROM download_tasks WHERE dir = ? AND file_name = ? AND state = 'queued'",
+                    (task['dir'], task['file_name'])
+                ).fetchone()
+                if row and row['gid']:
+                    queued[(task['dir'], task['file_name'])] = row['gid']
+            self._conn.executemany('''
+                INSERT INTO download_tasks (url, dir, file_name, file_type, batch, state, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)
+                ON CONFLICT (dir, file_name) DO UPDATE SET
+                    url = excluded.url,
+                    file_type = excluded.file_type,
+                    batch = excluded.batch,
+                    state = 'pending',
+                    last_error = NULL,
+                    gid = NULL,
+                    updated_at = excluded.updated_at
+                WHERE download_tasks.state != 'queued'
+            ''', [
+                (task['url'], task['dir'], task['file_name'], task.get('file_type'), task.get('batch'), now, now)
+                for task in tasks
+            ])
+            self._conn.commit()
+            return queued
+    
+    def mark_queued(self, items: List[Tuple[str, str, str]]):
+        """
+        标记任务已添加到 aria2
+        
+        Args:
+            items: [(保存目录, 文件名, gid)] 列表
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany('''
+                UPDATE download_tasks SET state = 'queued', gid = ?, attempts = attempts + 1, updated_at = ?
+                WHERE dir = ? AND file_name = ?
+            ''', [(gid, now, download_dir, file_name) for download_dir, file_name, gid in items])
+            self._conn.commit()
+    
+    def mark_add_failed(self, items: List[Tuple[str, str]], error: str):
+        """
+        标记任务添加到 aria2 失败
+        
+        Args:
+            items: [(保存目录, 文件名)] 列表
+            error: 错误信息
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany('''
+                UPDATE download_tasks SET state = 'error', gid = NULL, attempts = attempts + 1, last_error = ?, updated_at = ?
+                WHERE dir = ? AND file_name = ?
+            ''', [(error, now, download_dir, file_name) for download_dir, file_name in items])
+            self._conn.commit()
+    
+    def finish(self, results: List[Tuple[str, str, str]]):
+        """
+        按 gid 记录任务结束状态
+        
+        Args:
+            results: [(gid, 状态, 错误信息)] 列表，状态为 STATE_COMPLETE / STATE_ERROR / STATE_CANCELLED
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany('''
+                UPDATE download_tasks SET state = ?, last_error = ?, updated_at = ?
+                WHERE gid = ? AND state = 'queued'
+            ''', [(state, error, now, gid) for gid, state, error in results])
+            self._conn.commit()
+    
+    def reset_to_pending(self, task_ids: List[int]):
+        """把任务重新标记为等待添加（aria2 重启后丢失的任务）"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE download_tasks SET state = 'pending', gid = NULL, updated_at = ? WHERE task_id = ?",
+                [(now, task_id) for task_id in task_ids]
+            )
+            self._conn.commit()
+    
+    def mark_complete(self, task_ids: List[int]):
+        """把任务标记为已完成（目标文件已完整下载）"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE download_tasks SET state = 'complete', last_error = NULL, updated_at = ? WHERE task_id = ?",
+                [(now, task_id) for task_id in task_ids]
+            )
+            self._conn.commit()
+    
+    def cancel_pending(self):
+        """放弃所有等待添加的任务"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE download_tasks SET state = 'cancelled', updated_at = ? WHERE state = 'pending'", (now,)
+            )
+            self._conn.commit()
+    
+    def get_tasks(self, state: str) -> List[Dict[str, Any]]:
+        """
+        获取指定状态的任务
+        
+        Returns:
+            任务列表（按添加顺序），字段与表结构相同
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'SELECT * FROM download_tasks WHERE state = ? ORDER BY task_id', (state,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取队列统计信息
+        
+        Returns:
+            {状态: 任务数}，包含所有状态和 total
+        """
+        stats = {state: 0 for state in self.STATES}
+        with self._lock:
+            cursor = self._conn.execute('SELECT state, COUNT(*) FROM download_tasks GROUP BY state')
+            for state, count in cursor.fetchall():
+                stats[state] = count
+        stats['total'] = sum(stats.values())
+        return stats
+    
+    def prune(self, older_than_days: float = None) -> int:
+        """
+        删除已完成和已取消、且超过保留时间未更新的记录
+        
+        Args:
+            older_than_days: 保留天数，默认为 PRUNE_AFTER_DAYS；为 0 时删除所有已完成和已取消的记录
+            
+        Returns:
+            删除的记录数
+        """
+        if older_than_days is None:
+            older_than_days = self.PRUNE_AFTER_DAYS
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM download_tasks WHERE state IN ('complete', 'cancelled') AND updated_at <= ?", (cutoff,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+def get_download_journal() -> DownloadJournal:
+    """获取全局下载日志（文件为当前工作目录下的 download_journal.sqlite，与配置文件并列），首次打开时清理过期记录"""
+    global global_download_journal
+    with _global_lock:
+        if global_download_journal is None:
+            global_download_journal = DownloadJournal(os.path.join(os.getcwd(), 'download_journal.sqlite'))
+            global_download_journal.prune()
+        return global_download_journal
+
+
+def close_global_download_journal():
+    """关闭全局下载日志（程序退出时调用）"""
+    global global_download_journal
+    with _global_lock:
+        if global_download_journal:
+            global_download_journal.close()
+            global_download_journal = None
@@ -1,30 +1,58 @@
 import os
 import sys
+import shutil
 import subprocess
 import socket
 import time
+import threading
 import datetime
 import configparser
+import json
 from PySide6.QtWidgets import (
 	QApplication, QVBoxLayout,
 	QPushButton, QProgressBar, QLabel, QTableWidget, QTableWidgetItem, QDialog, QHBoxLayout, QLineEdit,
 	QSpinBox, QCheckBox, QMessageBox
 )
-from PySide6.QtCore import Signal, QObject, QTimer
+from PySide6.QtCore import Signal, QThread
 from PySide6.QtGui import QScreen
 import aria2p
+import websocket  # aria2p 的依赖（websocket-client）
 from i18n import t, get_language
+from thumbnails import get_thumbnail_cache
+from download_journal import DownloadJournal, get_download_journal
+from download_backend import DownloadBackend
+from http_downloader import AsyncioDownloadBackend
 
-# 全局 aria2 管理器实例
+# 全局下载后端实例（aria2 或内置 HTTP 下载）
 global_aria2_manager = None
 
 
-class Aria2Manager:
+class Aria2Manager(DownloadBackend):
 	"""管理 aria2c RPC 进程"""
+	NAME = 'aria2'
+	# tellWaiting / tellStopped 一次最多返回的任务数
+	MAX_STATUS_RESULTS = 100000
+
 	def __init__(self):
+		super().__init__()
 		self.process = None
 		self.port = None
 		self.api = None
+		self._notification_thread = None  # WebSocket 通知监听线程
+		self._listening = False
+
+	def is_available(self):
+		"""aria2c RPC 服务是否已启动"""
+		return self.api is not None
+
+	def set_global_limits(self, max_concurrent, max_speed_mb):
+		"""动态修改 aria2 的同时下载数和总速度限制"""
+		if not self.api:
+			return
+		self.api.set_global_options({
+			"max-concurrent-downloads": str(max_concurrent),
+			"max-overall-download-limit": f"{max_speed_mb}M" if max_speed_mb > 0 else "0"
+		})
 
 	def find_free_port(self):
 		"""查找一个可用的随机端口"""
@@ -66,7 +94,11 @@ class Aria2Manager:
 			if os.path.exists(bundled_aria2c):
 				aria2c_path = bundled_aria2c
 			else:
-				return False
+				# 非 Windows 系统使用 PATH 中的 aria2c
+				aria2c_path = shutil.which("aria2c")
+				if not aria2c_path:
+					print("未找到 aria2c")
+					return False
 
 			# 启动 aria2c RPC 服务
 			cmd = [
@@ -112,6 +144,7 @@ class Aria2Manager:
 					# 测试连接
 					self.api.get_global_options()
 					print(f"aria2c RPC 服务已启动，端口: {self.port}")
+					self.start_notification_listener()
 					return True
 				except:
 					continue
@@ -126,6 +159,8 @@ class Aria2Manager:
 
 	def stop(self):
 		"""停止 aria2c RPC 服务"""
+		self.stop_notification_listener()
+
 		if self.process:
 			try:
 				# 尝试通过 API 优雅地关闭
@@ -148,28 +183,81 @@ class Aria2Manager:
 			self.api = None
 			print("aria2c RPC 服务已停止")
 
+	def start_notification_listener(self):
+		"""启动 WebSocket 通知监听线程（连接断开后自动重连）"""
+		if not self.api or self._notification_thread:
+			return
+		self._listening = True
+		self._notification_thread = threading.Thread(
+			target=self._notification_loop, args=(self.api.client.ws_server,), daemon=True
+		)
+		self._notification_thread.start()
+
+	def stop_notification_listener(self):
+		"""停止 WebSocket 通知监听线程"""
+		self._listening = False
+		if self._notification_thread:
+			self._notification_thread.join(timeout=3)
+			self._notification_thread = None
+		self.notifications_connected = False
+
+	def _notification_loop(self, ws_server):
+		"""接收 aria2 推送的通知并分发给回调"""
+		while self._listening:
+			try:
+				ws = websocket.create_connection(ws_server, timeout=1)
+			except Exception:
+				time.sleep(1)
+				continue
+
+			self.notifications_connected = True
+			try:
+				while self._listening:
+					try:
+						message = ws.recv()
+					except websocket.WebSocketTimeoutException:
+						continue
+					if not message:
+						break
+					notification = json.loads(message)
+					event = notification.get('method')
+					for param in notification.get('params') or []:
+						self._dispatch_notification(event, param.get('gid'))
+			except Exception as e:
+				if self._listening:
+					print(f"aria2 通知连接断开: {e}")
+			finally:
+				self.notifications_connected = False
+				ws.close()
+
+	@staticmethod
+	def get_download_options(config=None):
+		"""
+		根据配置生成下载任务的公共选项（不含 dir 和 out）
+
+		Args:
+			config: 已加载的配置，为 None 时从配置文件读取
+		"""
+		if config is None:
+			config = load_config()
+		return {
+			"continue": "true",
+			"max-connection-per-server": config.get('aria2', 'max_connection_per_server'),
+			"split": config.get('aria2', 'split'),
+			"min-split-size": "1M",
+			"timeout": config.get('aria2', 'timeout'),
+			"max-tries": "1"
+		}
+
 	def add_download(self, url, download_dir, file_name):
 		"""添加下载任务"""
 		if not self.api:
 			return None
 
 		try:
-			# 加载配置
-			config = load_config()
-			max_conn = config.get('aria2', 'max_connection_per_server')
-			split = config.get('aria2', 'split')
-			timeout = config.get('aria2', 'timeout')
-
-			options = {
-				"dir": download_dir,
-				"out": file_name,
-				"continue": "true",
-				"max-connection-per-server": max_conn,
-				"split": split,
-				"min-split-size": "1M",
-				"timeout": timeout,
-				"max-tries": "1"
-			}
+			options = self.get_download_options()
+			options["dir"] = download_dir
+			options["out"] = file_name
 
 			# 使用 API 添加下载
 			download = self.api.add_uris([url], options=options)
@@ -179,91 +267,303 @@ class Aria2Manager:
 			print(f"添加下载任务失败: {e}")
 			return None
 
+	def add_downloads(self, tasks, chunk_size=None):
+		"""
+		批量添加下载任务：配置只读取一次，每 chunk_size 个任务合并为一次 system.multicall 请求
+
+		Args:
+			tasks: [(url, 保存目录, 文件名)] 列表
+			chunk_size: 每次请求添加的任务数，默认为 ADD_CHUNK_SIZE
+
+		Returns:
+			gid 列表，与 tasks 顺序一致，添加失败的任务为 None
+		"""
+		if not self.api:
+			return [None] * len(tasks)
+
+		chunk_size = chunk_size or self.ADD_CHUNK_SIZE
+		client = self.api.client
+		base_options = self.get_download_options()
+		gids = []
+		for start in range(0, len(tasks), chunk_size):
+			calls = []
+			for url, download_dir, file_name in tasks[start:start + chunk_size]:
+				options = dict(base_options, dir=download_dir, out=file_name)
+				calls.append((client.ADD_URI, [[url], options]))
+			try:
+				results = client.multicall2(calls)
+			except Exception as e:
+				print(f"添加下载任务失败: {e}")
+				gids.extend([None] * len(calls))
+				continue
+			for result in results:
+				# 成功时为只有一个元素（gid）的数组，失败时为包含错误信息的字典
+				if isinstance(result, list) and result:
+					gids.append(result[0])
+				else:
+					print(f"添加下载任务失败: {result}")
+					gids.append(None)
+		return gids
+
 	def get_download(self, gid):
-		"""获取下载状态"""
+		"""获取单个任务的下载状态（tellStatus，不需要取回整个队列）"""
 		if not self.api:
 			return None
 
 		try:
-			downloads = self.api.get_downloads()
-			for download in downloads:
-				if download.gid == gid:
-					return download
-			return None
+			return self.api.get_download(gid)
 		except Exception as e:
 			print(f"查询下载状态失败: {e}")
 			return None
 
+	def get_statuses(self, gids=None):
+		"""
+		通过一次 system.multicall 查询任务状态
 
-class DownloadMonitor(QObject):
-	"""监控 aria2 下载进度"""
-	progress = Signal(int, int)  # 任务ID, 进度百分比
-	status_update = Signal(int, str)  # 任务ID, 状态
-	finished = Signal(int)  # 任务ID
+		Args:
+			gids: 为 None 时查询所有等待中、下载中和已停止的任务；
+				否则只查询下载中的任务和给定的任务（查询量与队列长度无关）
 
-	def __init__(self, task_id, gid, aria2_manager, parent=None):
-		super().__init__(parent)
-		self.task_id = task_id
-		self.gid = gid
-		self.aria2_manager = aria2_manager
-		self.is_running = True
-		self.timer = QTimer()
-		self.timer.timeout.connect(self.check_status)
-		self.timer.start(500)  # 每500ms检查一次
+		Returns:
+			{gid: 状态字典}，只包含 STATUS_KEYS 中的字段（数值为字符串）；查询失败返回 None
+		"""
+		if not self.api:
+			return None
 
-	def check_status(self):
-		"""检查下载状态"""
-		if not self.is_running:
-			return
+		client = self.api.client
+		if gids is None:
+			calls = [
+				(client.TELL_WAITING, [0, self.MAX_STATUS_RESULTS, self.STATUS_KEYS]),
+				(client.TELL_ACTIVE, [self.STATUS_KEYS]),
+				(client.TELL_STOPPED, [0, self.MAX_STATUS_RESULTS, self.STATUS_KEYS]),
+			]
+		else:
+			calls = [(client.TELL_ACTIVE, [self.STATUS_KEYS])]
+			calls.extend((client.TELL_STATUS, [gid, self.STATUS_KEYS]) for gid in gids)
+		try:
+			results = client.multicall2(calls)
+		except Exception as e:
+			print(f"查询下载状态失败: {e}")
+			return None
+
+		statuses = {}
+		for result in results:
+			# 每个结果是只有一个元素的数组，出错时（如任务结果已被清除）为包含错误信息的字典
+			if not isinstance(result, list) or not result:
+				continue
+			result = result[0]
+			for status in (result if isinstance(result, list) else [result]):
+				statuses[status['gid']] = status
+		return statuses
 
-		download = self.aria2_manager.get_download(self.gid)
-		if not download:
-			return
 
-		status = download.status
 
-		if status == "active":
-			# 下载中
-			if download.total_length > 0:
-				progress = int((download.completed_length / download.total_length) * 100)
-				self.progress.emit(self.task_id, progress)
+class Aria2StatusTracker:
+	"""
+	跟踪一组 aria2 任务的状态
 
-				# 显示速度信息
-				speed_mb = download.download_speed / 1024 / 1024
-				self.status_update.emit(self.task_id, t('downloading_speed', speed=speed_mb))
+	WebSocket 通知可用时，只查询下载中的任务和收到通知的任务，并定期完整核对一次（防止漏掉通知）；
+	通知不可用时每次都完整查询
+	"""
 
-		elif status == "complete":
-			# 下载完成
-			self.progress.emit(self.task_id, 100)
-			self.status_update.emit(self.task_id, t('completed'))
-			self.stop()
-			self.finished.emit(self.task_id)
+	def __init__(self, aria2_manager, interval=0.5, reconcile_interval=10):
+		"""
+		Args:
+			aria2_manager: aria2 管理器
+			interval: 查询间隔（秒），收到通知时会立即查询
+			reconcile_interval: 通知可用时完整核对的间隔（秒）
+		"""
+		self.aria2_manager = aria2_manager
+		self.interval = interval
+		self.reconcile_interval = reconcile_interval
+		self._gids = set()  # 跟踪中的任务
+		self._notified = set()  # 收到通知、等待查询的任务
+		self._last_statuses = {}  # gid -> 上次返回的状态，状态没有变化的任务不再返回
+		self._last_reconcile = 0
+		self._lock = threading.Lock()
+		self._wakeup = threading.Event()
+		aria2_manager.add_notification_callback(self._on_notification)
+
+	def track(self, gids):
+		"""开始跟踪任务"""
+		with self._lock:
+			self._gids.update(gids)
+			# 添加期间可能已经有任务结束，它们的通知在跟踪前到达，下次查询时完整核对一次
+			self._last_reconcile = 0
+
+	def untrack(self, gids):
+		"""停止跟踪任务（任务结束后调用）"""
+		with self._lock:
+			for gid in gids:
+				self._gids.discard(gid)
+				self._notified.discard(gid)
+				self._last_statuses.pop(gid, None)
+
+	def wake(self):
+		"""立即结束 poll 中的等待"""
+		self._wakeup.set()
+
+	def close(self):
+		"""取消通知回调"""
+		self.aria2_manager.remove_notification_callback(self._on_notification)
+		self.wake()
+
+	def _on_notification(self, event, gid):
+		"""收到 aria2 通知（在通知线程中调用）"""
+		with self._lock:
+			if gid in self._gids:
+				self._notified.add(gid)
+				self._wakeup.set()
+
+	def poll(self):
+		"""
+		等待通知或查询间隔，然后查询一次状态
+
+		Returns:
+			{gid: 状态字典}，只包含状态有变化的跟踪中任务
+		"""
+		self._wakeup.wait(self.interval)
+		self._wakeup.clear()
+
+		with self._lock:
+			gids = list(self._gids)
+			notified, self._notified = self._notified, set()
+			reconcile = (not self.aria2_manager.notifications_connected or
+				time.monotonic() - self._last_reconcile >= self.reconcile_interval)
+		if not gids:
+			return {}
+
+		statuses = self.aria2_manager.get_statuses(None if reconcile else notified)
+		if statuses is None:
+			# 查询失败，下次重新查询收到通知的任务
+			with self._lock:
+				self._notified |= notified
+			return {}
+
+		changed = {}
+		with self._lock:
+			if reconcile:
+				self._last_reconcile = time.monotonic()
+			for gid in gids:
+				status = statuses.get(gid)
+				if status and gid in self._gids and status != self._last_statuses.get(gid):
+					self._last_statuses[gid] = status
+					changed[gid] = status
+		return changed
+
+
+class Aria2StatusPoller(QThread):
+	"""在后台线程中跟踪 aria2 任务状态，把状态变化批量发送给界面"""
+	statuses_updated = Signal(dict)  # {gid: 状态字典}，只包含状态有变化的任务
+
+	def __init__(self, aria2_manager, interval=500, parent=None):
+		super().__init__(parent)
+		self.tracker = Aria2StatusTracker(aria2_manager, interval=interval / 1000)
+		self.is_running = True
 
-		elif status == "error":
-			# 下载失败
-			error_msg = download.error_message or "Unknown error"
-			self.status_update.emit(self.task_id, t('download_failed', error=error_msg))
-			self.stop()
-			self.finished.emit(self.task_id)
+	def track(self, gids):
+		"""开始跟踪任务"""
+		self.tracker.track(gids)
 
-		elif status == "removed":
-			# 任务被移除
-			self.status_update.emit(self.task_id, t('task_cancelled'))
-			self.stop()
-			self.finished.emit(self.task_id)
+	def untrack(self, gids):
+		"""停止跟踪任务（任务结束后调用）"""
+		self.tracker.untrack(gids)
+
+	def run(self):
+		while self.is_running:
+			changed = self.tracker.poll()
+			if changed and self.is_running:
+				self.statuses_updated.emit(changed)
 
 	def stop(self):
-		"""停止监控"""
+		"""停止查询并等待线程退出"""
 		self.is_running = False
-		self.timer.stop()
+		self.tracker.close()
+		self.wait()
+
+
+class Aria2AddThread(QThread):
+	"""在后台线程中分批添加下载任务，每批添加完成后通知界面"""
+	chunk_added = Signal(list, list)  # 任务所在行列表, gid 列表（添加失败为 None）
+
+	def __init__(self, aria2_manager, rows, tasks, journal=None, parent=None):
+		"""
+		Args:
+			aria2_manager: aria2 管理器
+			rows: 任务在表格中的行号列表
+			tasks: 与 rows 对应的任务列表，每个任务包含 url, dir, file_name，可选 file_type, batch
+			journal: 下载日志，为 None 时不记录
+		"""
+		super().__init__(parent)
+		self.aria2_manager = aria2_manager
+		self.rows = rows
+		self.tasks = tasks
+		self.journal = journal
+		self._is_cancelled = False
+
+	def cancel(self):
+		"""取消添加（当前批次完成后退出）"""
+		self._is_cancelled = True
+
+	def run(self):
+		# 先记录所有任务，添加中途退出时未添加的任务保持等待状态，下次启动时继续；
+		# 已在下载中（如由另一个下载窗口添加）的任务不重复添加，直接跟踪原来的 gid
+		queued = self.journal.add_tasks(self.tasks) if self.journal else {}
+
+		chunk_size = self.aria2_manager.ADD_CHUNK_SIZE
+		for start in range(0, len(self.tasks), chunk_size):
+			if self._is_cancelled:
+				break
+			chunk = self.tasks[start:start + chunk_size]
+			gids = [queued.get((task['dir'], task['file_name'])) for task in chunk]
+			to_add = [i for i, gid in enumerate(gids) if not gid]
+			if to_add:
+				added = self.aria2_manager.add_downloads([
+					(chunk[i]['url'], chunk[i]['dir'], chunk[i]['file_name']) for i in to_add
+				])
+				for i, gid in zip(to_add, added):
+					gids[i] = gid
+				if self.journal:
+					self.journal.mark_queued([
+						(chunk[i]['dir'], chunk[i]['file_name'], gids[i]) for i in to_add if gids[i]
+					])
+					self.journal.mark_add_failed([
+						(chunk[i]['dir'], chunk[i]['file_name']) for i in to_add if not gids[i]
+					], t('add_failed'))
+			self.chunk_added.emit(self.rows[start:start + chunk_size], gids)
+
+
+def create_download_backend(backend='auto'):
+	"""
+	创建并启动下载后端
+
+	Args:
+		backend: aria2、http（内置 asyncio 下载），或 auto（优先使用 aria2c，找不到或启动失败时使用内置下载）
+
+	Returns:
+		下载后端实例（backend 为 aria2 且启动失败时 is_available() 为 False）
+	"""
+	if backend in ('auto', 'aria2'):
+		aria2_manager = Aria2Manager()
+		if aria2_manager.start() or backend == 'aria2':
+			return aria2_manager
+		print("aria2c 不可用，使用内置 HTTP 下载")
+
+	config = load_config()
+	http_backend = AsyncioDownloadBackend(
+		max_concurrent=config.getint('aria2', 'max_concurrent_downloads'),
+		timeout=config.getint('aria2', 'timeout'),
+		max_speed_mb=config.getint('aria2', 'max_overall_download_limit')
+	)
+	http_backend.start()
+	return http_backend
 
 
 def init_global_aria2_manager():
-	"""初始化全局 aria2 管理器"""
+	"""初始化全局下载后端（由配置 [download] backend 选择）"""
 	global global_aria2_manager
 	if global_aria2_manager is None:
-		global_aria2_manager = Aria2Manager()
-		global_aria2_manager.start()
+		global_aria2_manager = create_download_backend(load_config().get('download', 'backend'))
 	return global_aria2_manager
 
 
@@ -302,6 +602,14 @@ def load_config():
 	if not config.has_option('download', 'exact_match'):
 		config.set('download', 'exact_match', 'False')
 
+	# 图片下载完成后是否在后台预先生成 Web 画廊使用的缩略图（需要安装 Pillow）
+	if not config.has_option('download', 'pregenerate_thumbnails'):
+		config.set('download', 'pregenerate_thumbnails', 'False')
+
+	# 下载后端：auto 优先使用 aria2c，不可用时使用内置 HTTP 下载；aria2 / http 指定后端
+	if not config.has_option('download', 'backend'):
+		config.set('download', 'backend', 'auto')
+
 	# 数据库配置节
 	if not config.has_section('database'):
 		config.add_section('database')
@@ -312,6 +620,14 @@ def load_config():
 	if not config.has_option('database', 'deleted_db'):
 		config.set('database', 'deleted_db', 'deleted.sqlite')
 
+	# 全文索引分词器：trigram 支持中日文子串搜索，unicode61 按单词搜索
+	if not config.has_option('database', 'fts_tokenizer'):
+		config.set('database', 'fts_tokenizer', 'trigram')
+
+	# raw_data 压缩方式：none（JSON 文本）、zlib 或 zstd（需要安装 zstandard），修改后已有记录会在后台转换
+	if not config.has_option('database', 'raw_data_compression'):
+		config.set('database', 'raw_data_compression', 'none')
+
 	# 通用配置节
 	if not config.has_section('general'):
 		config.add_section('general')
@@ -332,6 +648,14 @@ def load_config():
 	if not config.has_option('webserver', 'port'):
 		config.set('webserver', 'port', '5001')
 
+	# 服务后端：auto（安装了 waitress 时使用 waitress，否则使用 werkzeug）、waitress 或 werkzeug
+	if not config.has_option('webserver', 'backend'):
+		config.set('webserver', 'backend', 'auto')
+
+	# 工作线程数（waitress 使用固定大小的线程池）
+	if not config.has_option('webserver', 'threads'):
+		config.set('webserver', 'threads', '8')
+
 	# aria2 配置节
 	if not config.has_section('aria2'):
 		config.add_section('aria2')
@@ -467,17 +791,10 @@ class Aria2SettingsDialog(QDialog):
 		self.config.set('aria2', 'timeout', str(self.timeout_spin.value()))
 		save_config(self.config)
 
-		# 动态修改全局选项（不需要重启aria2）
-		if self.aria2_manager and self.aria2_manager.api:
+		# 动态修改全局选项（不需要重启下载后端）
+		if self.aria2_manager and self.aria2_manager.is_available():
 			try:
-				# 构建速度限制字符串
-				speed_limit = self.speed_spin.value()
-				speed_limit_str = f"{speed_limit}M" if speed_limit > 0 else "0"
-
-				self.aria2_manager.api.set_global_options({
-					"max-concurrent-downloads": str(self.concurrent_spin.value()),
-					"max-overall-download-limit": speed_limit_str
-				})
+				self.aria2_manager.set_global_limits(self.concurrent_spin.value(), self.speed_spin.value())
 			except Exception as e:
 				print(f"动态修改aria2选项失败: {e}")
 
@@ -519,11 +836,14 @@ class DownloadWindow(QDialog):
 		self.resize(600, 400)
 		self.tasks = tasks
 		self.aria2_manager = global_aria2_manager
-		self.monitors = []
+		self.status_poller = None  # 所有任务共用一个状态查询线程
+		self.add_thread = None  # 后台添加任务的线程
+		self.journal = get_download_journal()  # 记录任务状态，中断后可以继续下载
+		self.gid_rows = {}  # aria2 gid -> 任务所在行
 		self.completed_count = 0
 		self.base_path = base_path or os.path.join(os.getcwd(), "downloads")
 		self.failed_count = 0  # 失败任务计数
-		self.failed_tasks = []  # 失败任务列表，用于重试
+		self.failed_rows = set()  # 失败任务（添加失败或下载失败）所在行，用于重试
 		self.hide_completed = True  # 是否隐藏已完成的任务
 
 		# 标记是否已经开始下载
@@ -554,6 +874,12 @@ class DownloadWindow(QDialog):
 		self.progress_bar = QProgressBar()
 		layout.addWidget(self.progress_bar)
 
+		# 下载日志中的队列统计（包括之前批次中尚未结束的任务）
+		self.journal_stats_label = QLabel()
+		self.journal_stats_label.setStyleSheet("color: gray;")
+		layout.addWidget(self.journal_stats_label)
+		self.update_journal_stats()
+
 		# 表格初始化
 		self.table = QTableWidget(len(self.tasks), 3)
 		self.table.setHorizontalHeaderLabels([t('col_url_download'), t('col_progress'), t('col_status')])
@@ -644,7 +970,7 @@ class DownloadWindow(QDialog):
 		self.batch_input.setEnabled(False)
 
 		# 检查 aria2 是否已启动
-		if not self.aria2_manager or not self.aria2_manager.api:
+		if not self.aria2_manager or not self.aria2_manager.is_available():
 			self.progress_label.setText(t('aria2_not_started'))
 			return
 
@@ -655,31 +981,136 @@ class DownloadWindow(QDialog):
 		self.config.set('download', 'batch_number', self.batch_number)
 		save_config(self.config)
 
-		# 添加所有下载任务
+		# 在后台分批添加所有下载任务
 		self.completed_count = 0
-		for i, task in enumerate(self.tasks):
-			# 使用新的路径逻辑
-			download_dir = get_download_path(self.base_path, task['file_type'], self.batch_number)
-
-			# 确保目录存在
-			os.makedirs(download_dir, exist_ok=True)
+		self.add_tasks(range(len(self.tasks)))
+		self.progress_label.setText(t('downloading_progress', completed=0, total=len(self.tasks)))
 
-			# 添加下载任务
-			download = self.aria2_manager.add_download(task['url'], download_dir, task['file_name'])
+	def add_tasks(self, rows):
+		"""
+		在后台线程中分批添加下载任务
+
+		Args:
+			rows: 要添加的任务所在行
+		"""
+		rows = list(rows)
+		add_tasks = []
+		created_dirs = set()
+		for i in rows:
+			task = self.tasks[i]
+			# 从下载日志恢复的任务沿用原来的保存目录，其余使用新的路径逻辑
+			download_dir = task.get('dir') or get_download_path(self.base_path, task['file_type'], self.batch_number)
 
-			if download:
+			# 确保目录存在
+			if download_dir not in created_dirs:
+				os.makedirs(download_dir, exist_ok=True)
+				created_dirs.add(download_dir)
+
+			add_tasks.append({
+				'url': task['url'],
+				'dir': download_dir,
+				'file_name': task['file_name'],
+				'file_type': task.get('file_type'),
+				'batch': task.get('batch') or self.batch_number,
+			})
+
+		self.add_thread = Aria2AddThread(self.aria2_manager, rows, add_tasks, journal=self.journal, parent=self)
+		self.add_thread.chunk_added.connect(self.on_chunk_added)
+		self.add_thread.start()
+
+	def on_chunk_added(self, rows, gids):
+		"""一批任务添加完成，开始跟踪添加成功的任务"""
+		added_gids = []
+		add_failed = False
+		for i, gid in zip(rows, gids):
+			if gid:
 				self.table.setItem(i, 2, QTableWidgetItem(t('added_to_queue')))
-				# 创建监控器
-				monitor = DownloadMonitor(i, download.gid, self.aria2_manager, parent=self)
-				monitor.progress.connect(self.update_task_progress)
-				monitor.status_update.connect(self.update_task_status)
-				monitor.finished.connect(self.on_task_finished)
-				self.monitors.append(monitor)
+				self.gid_rows[gid] = i
+				added_gids.append(gid)
 			else:
+				# 添加失败的任务没有 gid，按行记录以便重试
 				self.table.setItem(i, 2, QTableWidgetItem(t('add_failed')))
 				self.completed_count += 1
+				self.failed_rows.add(i)
+				self.failed_count += 1
+				add_failed = True
 
-		self.progress_label.setText(t('downloading_progress', completed=0, total=len(self.tasks)))
+		if add_failed:
+			self.update_failed_label()
+		self.track_downloads(added_gids)
+		self.update_journal_stats()
+
+		# 最后一批（或全部）任务添加失败时，不会再有状态更新触发完成检查
+		self.update_overall_progress()
+		self.check_all_done()
+
+	def track_downloads(self, gids):
+		"""把新添加的任务交给状态查询线程跟踪"""
+		if self.status_poller is None:
+			self.status_poller = Aria2StatusPoller(self.aria2_manager, parent=self)
+			self.status_poller.statuses_updated.connect(self.on_statuses_updated)
+			self.status_poller.start()
+		self.status_poller.track(gids)
+
+	def on_statuses_updated(self, statuses):
+		"""状态查询线程返回一批状态变化，统一更新表格后只重新计算一次总体进度"""
+		finished_gids = []
+		journal_results = []  # [(gid, 状态, 错误信息)]
+		for gid, download in statuses.items():
+			task_id = self.gid_rows.get(gid)
+			if task_id is None:
+				continue
+
+			status = download['status']
+			if status == "active":
+				# 下载中
+				total_length = int(download.get('totalLength', 0))
+				if total_length > 0:
+					progress = int((int(download.get('completedLength', 0)) / total_length) * 100)
+					self.table.setItem(task_id, 1, QTableWidgetItem(f"{progress}%"))
+
+					# 显示速度信息
+					speed_mb = int(download.get('downloadSpeed', 0)) / 1024 / 1024
+					self.update_task_status(task_id, t('downloading_speed', speed=speed_mb))
+
+			elif status == "complete":
+				# 下载完成
+				self.table.setItem(task_id, 1, QTableWidgetItem("100%"))
+				self.update_task_status(task_id, t('completed'))
+				finished_gids.append(gid)
+				journal_results.append((gid, DownloadJournal.STATE_COMPLETE, None))
+
+			elif status == "error":
+				# 下载失败
+				error_msg = download.get('errorMessage') or "Unknown error"
+				self.update_task_status(task_id, t('download_failed', error=error_msg))
+				finished_gids.append(gid)
+				journal_results.append((gid, DownloadJournal.STATE_ERROR, error_msg))
+
+			elif status == "removed":
+				# 任务被移除
+				self.update_task_status(task_id, t('task_cancelled'))
+				finished_gids.append(gid)
+				journal_results.append((gid, DownloadJournal.STATE_CANCELLED, None))
+
+		if finished_gids:
+			self.journal.finish(journal_results)
+			self.status_poller.untrack(finished_gids)
+			for gid in finished_gids:
+				self.on_task_finished(self.gid_rows.pop(gid))
+			self.update_journal_stats()
+
+		# 更新总体进度
+		self.update_overall_progress()
+
+		# 检查是否所有任务完成
+		if finished_gids:
+			self.check_all_done()
+
+	def check_all_done(self):
+		"""所有任务都已结束（完成、失败或添加失败）时显示完成状态"""
+		if self.completed_count >= len(self.tasks):
+			self.all_task_done()
 
 	def on_task_finished(self, task_id):
 		"""任务完成回调"""
@@ -690,24 +1121,17 @@ class DownloadWindow(QDialog):
 		if status.startswith(t('download_failed', error='').split(':')[0]):
 			self.failed_count += 1
 			# 记录失败的任务以便重试
-			self.failed_tasks.append(self.tasks[task_id])
+			self.failed_rows.add(task_id)
 			self.update_failed_label()
 		elif status == t('completed'):
 			# 下载成功，如果勾选了隐藏已完成则隐藏该行
 			if self.hide_completed:
 				self.table.setRowHidden(task_id, True)
-
-		# 更新总体进度
-		self.update_overall_progress()
-
-		# 检查是否所有任务完成
-		if self.completed_count >= len(self.tasks):
-			self.all_task_done()
-
-	def update_task_progress(self, task_id, progress):
-		"""更新任务进度"""
-		self.table.setItem(task_id, 1, QTableWidgetItem(f"{progress}%"))
-		self.update_overall_progress()
+			# 按配置在后台预先生成缩略图
+			task = self.tasks[task_id]
+			if task['file_type'] == 'photo' and self.config.getboolean('download', 'pregenerate_thumbnails', fallback=False):
+				download_dir = task.get('dir') or get_download_path(self.base_path, task['file_type'], self.batch_number)
+				get_thumbnail_cache().pregenerate([os.path.join(download_dir, task['file_name'])])
 
 	def update_task_status(self, task_id, status):
 		"""更新任务状态"""
@@ -731,6 +1155,17 @@ class DownloadWindow(QDialog):
 			self.failed_label.setVisible(False)
 			self.failed_info_label.setVisible(False)
 
+	def update_journal_stats(self):
+		"""更新下载日志的队列统计"""
+		stats = self.journal.get_stats()
+		self.journal_stats_label.setText(t(
+			'journal_stats',
+			pending=stats[DownloadJournal.STATE_PENDING],
+			queued=stats[DownloadJournal.STATE_QUEUED],
+			complete=stats[DownloadJournal.STATE_COMPLETE],
+			error=stats[DownloadJournal.STATE_ERROR]
+		))
+
 	def update_overall_progress(self):
 		"""更新总体进度"""
 		# 计算已完成和下载中的任务的进度
@@ -758,21 +1193,24 @@ class DownloadWindow(QDialog):
 		self.progress_bar.setValue(100)
 		self.progress_label.setText(t('all_downloads_complete', completed=self.completed_count, total=len(self.tasks)))
 
-		# 停止所有监控器
-		for monitor in self.monitors:
-			monitor.stop()
-		self.monitors.clear()
+		# 批次结束时清理过期的已完成记录，避免下载日志无限增长
+		self.journal.prune()
+		self.update_journal_stats()
 
 		# 如果有失败任务，启用重试按钮
-		if len(self.failed_tasks) > 0:
+		if self.failed_rows:
 			self.retry_button.setEnabled(True)
 
 	def closeEvent(self, event):
 		"""窗口关闭事件"""
-		# 停止所有监控器
-		for monitor in self.monitors:
-			monitor.stop()
-		self.monitors.clear()
+		# 停止添加任务和状态查询线程
+		if self.add_thread:
+			self.add_thread.cancel()
+			self.add_thread.wait()
+			self.add_thread = None
+		if self.status_poller:
+			self.status_poller.stop()
+			self.status_poller = None
 
 		# 发送下载完成信号（不在这里刷新，等所有dialog关闭后再刷新）
 		self.download_completed.emit()
@@ -798,11 +1236,11 @@ class DownloadWindow(QDialog):
 
 	def retry_failed_tasks(self):
 		"""重试失败的任务"""
-		if not self.failed_tasks:
+		if not self.failed_rows:
 			return
 
 		# 重置失败计数
-		retry_count = len(self.failed_tasks)
+		retry_count = len(self.failed_rows)
 		self.progress_label.setText(t('retrying_tasks', count=retry_count))
 
 		# 禁用重试按钮
@@ -812,46 +1250,18 @@ class DownloadWindow(QDialog):
 		self.failed_count = 0
 		self.completed_count = len(self.tasks) - retry_count
 
-		# 获取失败任务的索引
-		failed_task_indices = []
-		for failed_task in self.failed_tasks:
-			for i, task in enumerate(self.tasks):
-				if task['url'] == failed_task['url'] and task['file_name'] == failed_task['file_name']:
-					failed_task_indices.append(i)
-					break
+		# 失败任务所在行（清空后重新收集）
+		failed_task_indices = sorted(self.failed_rows)
+		self.failed_rows.clear()
 
-		# 清空失败任务列表（准备重新收集）
-		self.failed_tasks.clear()
-
-		# 重新添加失败的任务
+		# 重置行状态
 		for i in failed_task_indices:
-			task = self.tasks[i]
-
-			# 重置行状态
 			self.table.setItem(i, 1, QTableWidgetItem("0%"))
 			self.table.setItem(i, 2, QTableWidgetItem(t('waiting')))
 			self.table.setRowHidden(i, False)
 
-			# 使用新的路径逻辑
-			download_dir = get_download_path(self.base_path, task['file_type'], self.batch_number)
-
-			# 确保目录存在
-			os.makedirs(download_dir, exist_ok=True)
-
-			# 添加下载任务
-			download = self.aria2_manager.add_download(task['url'], download_dir, task['file_name'])
-
-			if download:
-				self.table.setItem(i, 2, QTableWidgetItem(t('added_to_queue')))
-				# 创建监控器
-				monitor = DownloadMonitor(i, download.gid, self.aria2_manager, parent=self)
-				monitor.progress.connect(self.update_task_progress)
-				monitor.status_update.connect(self.update_task_status)
-				monitor.finished.connect(self.on_task_finished)
-				self.monitors.append(monitor)
-			else:
-				self.table.setItem(i, 2, QTableWidgetItem(t('add_failed')))
-				self.completed_count += 1
+		# 在后台重新添加失败的任务
+		self.add_tasks(failed_task_indices)
 
 		# 更新失败标签
 		self.update_failed_label()
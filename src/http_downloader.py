@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+"""
+内置 HTTP 下载模块
+纯 Python 的 asyncio 下载后端，不依赖 aria2c，可在没有 aria2c 的系统（如 Linux NAS）上使用：
+按主机复用 HTTP/1.1 连接，限制同时下载数，通过 Range 断点续传，下载到临时文件后再重命名
+"""
+
+import asyncio
+import os
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urljoin
+
+from download_backend import DownloadBackend
+
+
+class _RateLimiter:
+    """全局限速：按已下载的字节数推算下一次允许读取的时间"""
+    
+    def __init__(self, bytes_per_second: float = 0):
+        self.bytes_per_second = bytes_per_second
+        self._next_time = 0.0
+    
+    async def consume(self, size: int):
+        """读取了 size 字节后调用，超过速度限制时等待"""
+        if self.bytes_per_second <= 0:
+            return
+        now = asyncio.get_running_loop().time()
+        self._next_time = max(self._next_time, now) + size / self.bytes_per_second
+        delay = self._next_time - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncioDownloadBackend(DownloadBackend):
+    """在独立线程的 asyncio 事件循环中下载，接口与 Aria2Manager 相同"""
+    
+    NAME = 'http'
+    READ_SIZE = 64 * 1024
+    WRITE_BUFFER_SIZE = 1024 * 1024  # 累积到该大小后交给文件线程写入，避免在事件循环中做磁盘 I/O
+    MAX_REDIRECTS = 5
+    MAX_IDLE_CONNECTIONS = 8  # 每个主机保留的空闲连接数
+    MAX_STOPPED_RESULTS = 1000  # 保留的已结束任务状态数（与 aria2 的 max-download-result 默认值相同）
+    TEMP_SUFFIX = '.part'
+    USER_AGENT = 'Mozilla/5.0 (compatible; twitter-web-exporter-gui)'
+    
+    def __init__(self, max_concurrent: int = 5, timeout: float = 60, max_speed_mb: int = 0):
+        """
+        Args:
+            max_concurrent: 同时下载的任务数
+            timeout: 超过该时间（秒）没有收到数据视为超时，任务失败
+            max_speed_mb: 总速度限制（MB/s），0 表示不限制
+        """
+        super().__init__()
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._limiter = _RateLimiter(max_speed_mb * 1024 * 1024)
+        self._loop = None
+        self._thread = None
+        self._queue = None  # 等待下载的 gid
+        self._slot_changed = None  # 下载数变化时通知调度协程
+        self._active = 0
+        self._running = set()  # 下载中的 asyncio 任务（保持引用）
+        self._pool = {}  # (scheme, host, port) -> [(reader, writer)] 空闲连接
+        self._io_executor = None  # 执行文件读写的单个线程（同一文件的写入和关闭按提交顺序执行）
+        self._ssl_context = ssl.create_default_context()
+        self._tasks = {}  # gid -> (url, 保存目录, 文件名)
+        self._statuses = {}  # gid -> 状态字典
+        self._stopped = deque()  # 已结束任务的 gid，超过 MAX_STOPPED_RESULTS 时丢弃最早的状态
+        self._lock = threading.Lock()  # 保护 _tasks / _statuses / _stopped
+    
+    def start(self) -> bool:
+        """启动事件循环线程"""
+        if self._thread:
+            return True
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True, name='http-downloader')
+        self._thread.start()
+        ready.wait()
+        # 任务状态变化由后端自己发出通知，不会遗漏
+        self.notifications_connected = True
+        print("内置 HTTP 下载已启动")
+        return True
+    
+    def stop(self):
+        """停止事件循环（下载中的任务保留临时文件，下次添加时断点续传）"""
+        if not self._thread:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._loop = None
+        self.notifications_connected = False
+        print("内置 HTTP 下载已停止")
+    
+    def is_available(self) -> bool:
+        return self._thread is not None
+    
+    def _run_loop(self, ready: threading.Event):
+        """事件循环线程"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._slot_changed = asyncio.Condition()
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='http-downloader-io')
+        dispatcher = loop.create_task(self._dispatch())
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            pending = [dispatcher] + list(self._running)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            # 等待已提交的写入完成，临时文件保持为连续的已下载部分，下次可以断点续传
+            self._io_executor.shutdown(wait=True)
+            for connections in self._pool.values():
+                for _, writer in connections:
+                    writer.close()
+            self._pool.clear()
+            loop.close()
+    
+    def set_global_limits(self, max_concurrent: int, max_speed_mb: int):
+        """修改同时下载数和总速度限制"""
+        def apply():
+            self.max_concurrent = max_concurrent
+            self._limiter.bytes_per_second = max_speed_mb * 1024 * 1024
+            loop.create_task(self._notify_slot_changed())
+        
+        loop = self._loop
+        if loop:
+            loop.call_soon_threadsafe(apply)
+    
+    def add_downloads(self, tasks: List[Tuple[str, str, str]], chunk_size: int = None) -> List[Optional[str]]:
+        """批量添加下载任务（按添加顺序开始下载）"""
+        if not self._loop:
+            return [None] * len(tasks)
+        
+        gids = []
+        with self._lock:
+            for url, download_dir, file_name in tasks:
+                gid = os.urandom(8).hex()
+                self._tasks[gid] = (url, download_dir, file_name)
+                self._statuses[gid] = {
+                    'gid': gid, 'status': 'waiting', 'totalLength': '0', 'completedLength': '0',
+                    'downloadSpeed': '0', 'errorMessage': ''
+                }
+                gids.append(gid)
+        self._loop.call_soon_threadsafe(lambda: [self._queue.put_nowait(gid) for gid in gids])
+        return gids
+    
+    def get_statuses(self, gids: Optional[List[str]] = None) -> Optional[Dict[str, Dict[str, str]]]:
+        """查询任务状态（直接读取内存中的状态，不需要 RPC）"""
+        with self._lock:
+            if gids is None:
+                return {gid: dict(status) for gid, status in self._statuses.items()}
+            statuses = {
+                gid: dict(status) for gid, status in self._statuses.items() if status['status'] == 'active'
+            }
+            for gid in gids:
+                status = self._statuses.get(gid)
+                if status:
+                    statuses[gid] = dict(status)
+            return statuses
+    
+    def _update_status(self, gid: str, **fields):
+        """更新任务状态"""
+        with self._lock:
+            self._statuses[gid].update({key: str(value) for key, value in fields.items()})
+    
+    def _finish(self, gid: str, status: str, error: str = ''):
+        """任务结束：更新状态并发出通知"""
+        with self._lock:
+            self._statuses[gid].update(status=status, downloadSpeed='0', errorMessage=error)
+            self._tasks.pop(gid, None)
+            self._stopped.append(gid)
+            while len(self._stopped) > self.MAX_STOPPED_RESULTS:
+                self._statuses.pop(self._stopped.popleft(), None)
+        event = 'aria2.onDownloadComplete' if status == 'complete' else 'aria2.onDownloadError'
+        self._dispatch_notification(event, gid)
+    
+    async def _notify_slot_changed(self):
+        async with self._slot_changed:
+            self._slot_changed.notify_all()
+    
+    async def _dispatch(self):
+        """按添加顺序取出任务，同时下载的任务数不超过 max_concurrent"""
+        while True:
+            gid = await self._queue.get()
+            async with self._slot_changed:
+                await self._slot_changed.wait_for(lambda: self._active < self.max_concurrent)
+                self._active += 1
+            task = asyncio.get_running_loop().create_task(self._run_task(gid))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+    
+    async def _run_task(self, gid: str):
+        """下载一个任务"""
+        try:
+            with self._lock:
+                url, download_dir, file_name = self._tasks[gid]
+            self._update_status(gid, status='active')
+            self._dispatch_notification('aria2.onDownloadStart', gid)
+            
+            path = os.path.join(download_dir, file_name)
+            try:
+                # 与 aria2 的 --continue 一致：目标文件已存在视为已下载
+                if not os.path.exists(path):
+                    os.makedirs(download_dir, exist_ok=True)
+                    temp_path = path + self.TEMP_SUFFIX
+                    await self._fetch(gid, url, temp_path)
+                    os.replace(temp_path, path)
+                self._finish(gid, 'complete')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._finish(gid, 'error', str(e) or e.__class__.__name__)
+        finally:
+            self._active -= 1
+            await self._notify_slot_changed()
+    
+    async def _fetch(self, gid: str, url: str, temp_path: str):
+        """
+        下载到临时文件（已有临时文件时用 Range 请求剩余部分），跟随重定向
+        
+        临时文件与服务器上的文件对不上时（416 且总长度不等于临时文件大小、206 的起点不是请求的位置），
+        删除临时文件后从头下载
+        """
+        for _ in range(self.MAX_REDIRECTS + 1):
+            offset = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+            status, headers, reader, writer, key = await self._request(url, offset)
+            try:
+                if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                    url = urljoin(url, headers['location'])
+                    writer.close()
+                    continue
+                if status == 416 and offset:
+                    writer.close()
+                    _, total = self._parse_content_range(headers.get('content-range', ''))
+                    if total == offset:
+                        # 临时文件已经完整（上次下载完成但没来得及重命名）
+                        return
+                    await self._run_io(os.remove, temp_path)
+                    continue
+                if status not in (200, 206):
+                    raise IOError(f"HTTP {status}")
+                
+                total_length = None
+                if status == 206:
+                    start, total_length = self._parse_content_range(headers.get('content-range', ''))
+                    if start != offset:
+                        if not offset:
+                            raise IOError(f"无效的 Content-Range: {headers.get('content-range', '')}")
+                        # 服务器返回的范围与请求的不一致，不能接在临时文件后面
+                        writer.close()
+                        await self._run_io(os.remove, temp_path)
+                        continue
+                else:
+                    # 服务器不支持 Range，从头下载
+                    offset = 0
+                if total_length is None and 'content-length' in headers:
+                    total_length = offset + int(headers['content-length'])
+                completed = offset
+                self._update_status(gid, totalLength=total_length or 0, completedLength=completed)
+                
+                sample_time = time.monotonic()
+                sample_bytes = 0
+                f = await self._run_io(self._open_temp, temp_path, offset)
+                buffer = bytearray()
+                try:
+                    async for data in self._iter_body(reader, headers):
+                        buffer += data
+                        if len(buffer) >= self.WRITE_BUFFER_SIZE:
+                            chunk, buffer = buffer, bytearray()
+                            await self._run_io(f.write, chunk)
+                        completed += len(data)
+                        sample_bytes += len(data)
+                        now = time.monotonic()
+                        if now - sample_time >= 0.5:
+                            self._update_status(
+                                gid, completedLength=completed,
+                                downloadSpeed=int(sample_bytes / (now - sample_time))
+                            )
+                            sample_time = now
+                            sample_bytes = 0
+                        await self._limiter.consume(len(data))
+                finally:
+                    # 出错或停止时也写入已收到的数据，下次从这里续传
+                    await self._run_io(self._close_temp, f, buffer)
+                self._update_status(gid, completedLength=completed)
+                
+                if total_length is not None and completed != total_length:
+                    raise IOError(f"下载不完整: {completed}/{total_length}")
+            except BaseException:
+                writer.close()
+                raise
+            
+            # 响应体已读完，连接可以复用
+            if headers.get('connection', '').lower() != 'close' and (
+                    'content-length' in headers or headers.get('transfer-encoding', '').lower() == 'chunked'):
+                self._release(key, reader, writer)
+            else:
+                writer.close()
+            return
+        raise IOError("重定向或重新下载的次数过多")
+    
+    @staticmethod
+    def _parse_content_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+        """
+        解析 Content-Range 响应头（bytes 起点-终点/总长度，或 416 响应的 bytes */总长度）
+        
+        Returns:
+            (起点, 总长度)，无法解析或未知（*）的部分为 None
+        """
+        unit, _, spec = value.strip().partition(' ')
+        if unit.lower() != 'bytes':
+            return None, None
+        byte_range, _, total = spec.strip().partition('/')
+        start = byte_range.split('-', 1)[0].strip()
+        total = total.strip()
+        return (int(start) if start.isdigit() else None), (int(total) if total.isdigit() else None)
+    
+    async def _run_io(self, func, *args):
+        """在文件线程中执行阻塞的文件操作"""
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor, func, *args)
+    
+    @staticmethod
+    def _open_temp(temp_path: str, offset: int):
+        """打开临时文件并定位到 offset，丢弃其后的内容"""
+        f = open(temp_path, 'r+b' if offset else 'wb')
+        f.seek(offset)
+        f.truncate()
+        return f
+    
+    @staticmethod
+    def _close_temp(f, buffer: bytearray):
+        """写入剩余的数据并关闭临时文件"""
+        try:
+            if buffer:
+                f.write(buffer)
+        finally:
+            f.close()
+    
+    async def _read(self, coroutine):
+        """带超时的读取"""
+        return await asyncio.wait_for(coroutine, self.timeout)
+    
+    async def _open(self, key: Tuple[str, str, int]):
+        """
+        获取到主机的连接：优先复用空闲连接
+        
+        Returns:
+            (reader, writer, 是否为复用的连接)
+        """
+        idle = self._pool.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        
+        scheme, host, port = key
+        ssl_context = self._ssl_context if scheme == 'https' else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context, limit=self.READ_SIZE * 4),
+            self.timeout
+        )
+        return reader, writer, False
+    
+    def _release(self, key: Tuple[str, str, int], reader, writer):
+        """把连接放回空闲连接池"""
+        idle = self._pool.setdefault(key, [])
+        if len(idle) < self.MAX_IDLE_CONNECTIONS:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+    
+    async def _request(self, url: str, offset: int = 0):
+        """
+        发送 GET 请求并读取响应头
+        
+        Returns:
+            (状态码, 响应头（键为小写）, reader, writer, 连接池的键)
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ('http', 'https'):
+            raise IOError(f"不支持的协议: {scheme}")
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        lines = [
+            f'GET {target} HTTP/1.1',
+            f'Host: {parts.netloc}',
+            f'User-Agent: {self.USER_AGENT}',
+            'Accept: */*',
+            'Accept-Encoding: identity',
+            'Connection: keep-alive',
+        ]
+        if offset:
+            lines.append(f'Range: bytes={offset}-')
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        
+        for attempt in range(2):
+            reader, writer, reused = await self._open(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await self._read(reader.readline())
+                if not status_line:
+                    raise ConnectionResetError("连接已被服务器关闭")
+                status = int(status_line.split()[1])
+                headers = {}
+                while True:
+                    line = await self._read(reader.readline())
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                return status, headers, reader, writer, key
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # 复用的空闲连接可能已被服务器关闭，换新连接重试一次
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+    
+    async def _iter_body(self, reader, headers: Dict[str, str]):
+        """按块读取响应体（支持 chunked 和 Content-Length，两者都没有时读到连接关闭）"""
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size_line = await self._read(reader.readline())
+                size = int(size_line.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # 跳过 trailer
+                    while (await self._read(reader.readline())) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                remaining = size
+                while remaining:
+                    data = await self._read(reader.read(min(remaining, self.READ_SIZE)))
+                    if not data:
+                        raise asyncio.IncompleteReadError(b'', remaining)
+                    remaining -= len(data)
+                    yield data
+                await self._read(reader.readexactly(2))
+        elif 'content-length' in headers:
+            remaining = int(headers['content-length'])
+            while remaining > 0:
+                data = await self._read(reader.read(min(remaining, self.READ_SIZE)))
+                if not data:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(data)
+                yield data
+        else:
+            while True:
+                data = await self._read(reader.read(self.READ_SIZE))
+                if not data:
+                    return
+                yield data
@@ -11,6 +11,7 @@ _translations = {
         'app_title': 'twegui v0.1.4',
         'starting_aria2': 'Starting aria2c...',
         'aria2_started': 'aria2c started',
+        'http_downloader_started': 'Built-in HTTP downloader started',
         'aria2_failed': 'aria2c failed to start (download unavailable)',
         'import_json_btn': 'Import Tweets from JSON',
         'drop_json_hint': ', or drop a JSON file here',
@@ -160,6 +161,9 @@ _translations = {
         'retrying_tasks': 'Retrying {count} failed tasks...',
         'hide_completed': 'Hide Completed',
         'show_completed': 'Show Completed',
+        'resume_downloads_title': 'Unfinished Downloads',
+        'resume_downloads_msg': '{count} download task(s) from the last session did not finish.\n\nContinue downloading them now? Choosing No discards them.',
+        'journal_stats': 'Download queue: {pending} waiting, {queued} in progress, {complete} complete, {error} failed',
         
         # 更多菜单
         'more_menu': 'More',
@@ -291,6 +295,12 @@ _translations = {
         
         # 头像缓存管理
         'profile_cache_btn': 'Profile Image Cache',
+        'compact_db_btn': 'Compact Database',
+        'compact_db_title': 'Compact Database',
+        'compact_db_confirm': 'Rebuild the databases to reclaim unused disk space?\n\nThis may take a while for large databases. Imports and other writes will wait until it finishes.',
+        'compact_db_import_running': 'Please wait for the current import to finish.',
+        'compact_db_done': 'The databases have been compacted.',
+        'compact_db_failed': 'Failed to compact the databases.',
         'profile_cache_title': 'Profile Image Cache Manager',
         'profile_cache_status': 'Status',
         'profile_cache_loading': 'Loading user data...',
@@ -349,6 +359,7 @@ _translations = {
         'app_title': 'twegui v0.1.4',
         'starting_aria2': '正在启动 aria2c...',
         'aria2_started': 'aria2c 已启动',
+        'http_downloader_started': '内置 HTTP 下载已启动',
         'aria2_failed': 'aria2c 启动失败（下载功能不可用）',
         'import_json_btn': '从 JSON 文件导入推文',
         'drop_json_hint': '，或拖放一个 JSON 文件到窗口',
@@ -498,6 +509,9 @@ _translations = {
         'retrying_tasks': '正在重试 {count} 个失败任务...',
         'hide_completed': '隐藏已完成',
         'show_completed': '显示已完成',
+        'resume_downloads_title': '未完成的下载',
+        'resume_downloads_msg': '上次有 {count} 个下载任务未完成。\n\n是否现在继续下载？选择「否」将放弃这些任务。',
+        'journal_stats': '下载队列：等待添加 {pending}，下载中 {queued}，已完成 {complete}，失败 {error}',
         
         # 更多菜单
         'more_menu': '更多',
@@ -629,6 +643,12 @@ _translations = {
         
         # 头像缓存管理
         'profile_cache_btn': '头像缓存管理',
+        'compact_db_btn': '压缩数据库',
+        'compact_db_title': '压缩数据库',
+        'compact_db_confirm': '重建数据库以回收未使用的磁盘空间？\n\n数据库较大时可能需要一段时间，期间导入等写入操作会等待其完成。',
+        'compact_db_import_running': '请等待当前导入完成。',
+        'compact_db_done': '数据库已压缩。',
+        'compact_db_failed': '压缩数据库失败。',
         'profile_cache_title': '头像缓存管理',
         'profile_cache_status': '状态',
         'profile_cache_loading': '正在加载用户数据...',
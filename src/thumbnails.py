@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图模块
+为 Web 画廊生成缩小的预览图，并缓存在磁盘上
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional
+
+try:
+    from PIL import Image, ImageOps  # 可选依赖：未安装 Pillow 时不生成缩略图，直接使用原图
+except ImportError:
+    Image = None
+    ImageOps = None
+
+
+# 可以生成缩略图的图片扩展名
+THUMBNAIL_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+# 全局缩略图缓存（Web 服务器和下载窗口共用）
+global_thumbnail_cache = None
+_global_lock = threading.Lock()
+
+
+class ThumbnailCache:
+    """
+    缩略图磁盘缓存：由固定大小的线程池在后台生成，缓存文件以原图路径、mtime 和宽度为键
+    
+    缓存文件的 mtime 记录最近一次使用的时间，总大小超过上限时按最近最少使用删除
+    """
+    
+    # 支持的缩略图宽度，请求的宽度向上取整到其中之一，避免为每个宽度都生成一份缓存
+    WIDTHS = (360, 720, 1080)
+    DEFAULT_WIDTH = 720
+    # 请求线程等待生成的默认时间（秒），超时后由调用方先返回原图，缩略图继续在后台生成
+    WAIT_TIMEOUT = 0.2
+    # 命中缓存时距上次更新使用时间超过该值（秒）才再次更新，避免每次请求都写文件元数据
+    TOUCH_INTERVAL = 24 * 3600
+    # 清理时删除到上限的比例，留出余量避免频繁清理
+    PRUNE_TARGET_RATIO = 0.9
+    # 生成失败或进程退出时残留的临时文件，超过该时间（秒）后清理
+    STALE_TEMP_AGE = 3600
+    
+    def __init__(self, cache_dir: str, max_workers: int = 2, quality: int = 80, max_size_mb: int = 1024):
+        """
+        初始化缩略图缓存（在后台线程中清理一次超出上限的缓存）
+        
+        Args:
+            cache_dir: 缓存目录
+            max_workers: 生成缩略图的线程数（缩放图片很占 CPU，数量不宜过多）
+            quality: JPEG 质量
+            max_size_mb: 缓存目录的大小上限（MB）
+        """
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self.max_size = max_size_mb * 1024 * 1024
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnail')
+        self._pending = {}  # 缓存文件路径 -> 正在生成的 Future，避免同一张缩略图被重复生成
+        self._pending_lock = threading.Lock()
+        self._written = 0  # 上次清理后新写入的字节数，超过上限的 1/10 时再次清理
+        self._prune_lock = threading.Lock()
+        self._executor.submit(self.prune)
+    
+    @staticmethod
+    def is_available() -> bool:
+        """是否可以生成缩略图（需要安装 Pillow）"""
+        return Image is not None
+    
+    def normalize_width(self, width: Optional[int]) -> int:
+        """将请求的宽度向上取整到支持的宽度"""
+        if not width or width <= 0:
+            return self.DEFAULT_WIDTH
+        for supported in self.WIDTHS:
+            if width <= supported:
+                return supported
+        return self.WIDTHS[-1]
+    
+    def _cache_path(self, source_path: str, width: int) -> Optional[str]:
+        """获取缩略图的缓存文件路径（原图被替换后 mtime 变化，会对应新的缓存文件）"""
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+        key = hashlib.sha1(
+            f'{os.path.abspath(source_path)}|{stat.st_mtime_ns}|{stat.st_size}|{width}'.encode('utf-8')
+        ).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f'{key}.jpg')
+    
+    def _generate(self, source_path: str, cache_path: str, width: int) -> str:
+        """
+        生成缩略图（在线程池中执行）
+        
+        Returns:
+            缩略图路径；原图不比目标宽度大时返回原图路径
+        """
+        with Image.open(source_path) as image:
+            # JPEG 可以在解码时直接按 1/2、1/4、1/8 缩小，大图能快很多
+            # 要求宽高都不小于目标宽度，EXIF 旋转 90 度后宽度仍然足够
+            image.draft('RGB', (width, width))
+            image = ImageOps.exif_transpose(image)
+            if image.width <= width:
+                return source_path
+            image.thumbnail((width, image.height), Image.LANCZOS)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            
+            # 先写入临时文件再重命名，避免其他请求读到不完整的文件
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = f'{cache_path}.{threading.get_ident()}.tmp'
+            try:
+                image.save(temp_path, 'JPEG', quality=self.quality, optimize=True)
+                os.replace(temp_path, cache_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        
+        with self._prune_lock:
+            self._written += os.path.getsize(cache_path)
+            need_prune = self._written > self.max_size // 10
+        if need_prune:
+            self.prune()
+        return cache_path
+    
+    def _touch(self, cache_path: str) -> bool:
+        """缓存文件存在时更新其使用时间（mtime）并返回 True"""
+        try:
+            mtime = os.stat(cache_path).st_mtime
+        except OSError:
+            return False
+        if time.time() - mtime > self.TOUCH_INTERVAL:
+            try:
+                os.utime(cache_path)
+            except OSError:
+                pass
+        return True
+    
+    def _submit(self, source_path: str, width: int):
+        """提交生成任务，返回 (缓存路径, Future)；缓存已存在时 Future 为 None"""
+        cache_path = self._cache_path(source_path, width)
+        if cache_path is None or self._touch(cache_path):
+            return cache_path, None
+        
+        with self._pending_lock:
+            future = self._pending.get(cache_path)
+            if future is not None:
+                return cache_path, future
+            future = self._executor.submit(self._generate, source_path, cache_path, width)
+            self._pending[cache_path] = future
+        # 在锁外注册回调：任务已经完成时回调会立即在当前线程执行
+        future.add_done_callback(lambda _: self._pop_pending(cache_path))
+        return cache_path, future
+    
+    def _pop_pending(self, cache_path: str):
+        """生成结束后移出 _pending"""
+        with self._pending_lock:
+            self._pending.pop(cache_path, None)
+    
+    def get(self, source_path: str, width: int = None, timeout: float = None) -> Optional[str]:
+        """
+        获取缩略图路径，缓存不存在时交给线程池生成并短暂等待结果
+        
+        Args:
+            source_path: 原图路径
+            width: 缩略图宽度（会向上取整到 WIDTHS 中的值）
+            timeout: 等待生成的最长时间（秒），默认为 WAIT_TIMEOUT；超时后缩略图继续在后台生成
+            
+        Returns:
+            缩略图路径；没有可用的缩略图（未安装 Pillow、不是图片、原图不比目标宽度大、生成失败或尚未生成完）时返回 None
+        """
+        if not self.is_available() or os.path.splitext(source_path)[1].lower() not in THUMBNAIL_EXTENSIONS:
+            return None
+        
+        cache_path, future = self._submit(source_path, self.normalize_width(width))
+        if cache_path is None:
+            return None
+        if future is None:
+            return cache_path
+        try:
+            result = future.result(timeout=self.WAIT_TIMEOUT if timeout is None else timeout)
+        except FutureTimeoutError:
+            return None
+        except Exception as e:
+            print(f"生成缩略图失败: {source_path}, 错误: {e}")
+            return None
+        return result if result == cache_path else None
+    
+    def pregenerate(self, source_paths: List[str], width: int = None):
+        """
+        在后台预先生成缩略图（不等待结果）
+        
+        Args:
+            source_paths: 原图路径列表，非图片文件会被跳过
+            width: 缩略图宽度，默认为 DEFAULT_WIDTH
+        """
+        if not self.is_available():
+            return
+        width = self.normalize_width(width)
+        for source_path in source_paths:
+            if os.path.splitext(source_path)[1].lower() in THUMBNAIL_EXTENSIONS:
+                self._submit(source_path, width)
+    
+    def prune(self) -> int:
+        """
+        清理缓存目录：删除残留的临时文件；总大小超过上限时按使用时间从旧到新删除，直到低于上限的 90%
+        
+        Returns:
+            删除的缩略图数
+        """
+        with self._prune_lock:
+            self._written = 0
+        
+        now = time.time()
+        entries = []  # (使用时间, 大小, 路径)
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith('.tmp'):
+                        if now - stat.st_mtime > self.STALE_TEMP_AGE:
+                            os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        
+        if total <= self.max_size:
+            return 0
+        
+        removed = 0
+        target = self.max_size * self.PRUNE_TARGET_RATIO
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+    
+    def shutdown(self):
+        """停止线程池（取消排队中的任务）"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """获取全局缩略图缓存（缓存目录为当前工作目录下的 thumbnails，与头像目录 profile_images 并列）"""
+    global global_thumbnail_cache
+    with _global_lock:
+        if global_thumbnail_cache is None:
+            global_thumbnail_cache = ThumbnailCache(os.path.join(os.getcwd(), 'thumbnails'))
+        return global_thumbnail_cache
+
+
+def shutdown_global_thumbnail_cache():
+    """停止全局缩略图缓存的线程池（程序退出时调用）"""
+    global global_thumbnail_cache
+    with _global_lock:
+        if global_thumbnail_cache:
+            global_thumbnail_cache.shutdown()
+            global_thumbnail_cache = None
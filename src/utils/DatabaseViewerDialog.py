@@ -4,7 +4,6 @@
 import gc
 import json
 import os
-import re
 
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import QDialog, QLabel, QTableWidget, QPushButton, QHBoxLayout, QCheckBox, QLineEdit, \
@@ -332,79 +331,43 @@ class DatabaseViewerDialog(QDialog):
 			return not any(
 				idr in downloaded_file or downloaded_file in idr for downloaded_file in self.downloaded_files)
 
-	def _extract_media_from_legacy(self, legacy: dict, record_id: str, photos: set, videos: set, 
-								   err_photo_url_list: list, err_video_url_list: list) -> tuple:
+	def _map_media(self, record: dict, media_rows: list, photos: set, videos: set,
+				   err_photo_url_list: list, err_video_url_list: list):
 		"""
-		从 legacy 数据中提取媒体信息（用于引用推文）
+		根据媒体记录建立推文与图片、视频及下载任务的映射（包括引用推文中的媒体）
 		
 		Args:
-			legacy: legacy 数据字典
-			record_id: 记录ID（用于下载任务）
+			record: 推文记录
+			media_rows: 该推文的媒体记录（来自 tweet_media 表）
 			photos: 全局图片集合（用于去重）
 			videos: 全局视频集合（用于去重）
 			err_photo_url_list: 错误图片URL列表
 			err_video_url_list: 错误视频URL列表
-			
-		Returns:
-			(photo_ids, video_ids, photo_tasks, video_tasks) 元组
 		"""
-		photo_ids = []
-		video_ids = []
-		photo_tasks = []
-		video_tasks = []
-		
-		# 优先使用 extended_entities，没有则使用 entities
-		entities = legacy.get('extended_entities', legacy.get('entities', {}))
-		media_list = entities.get('media', [])
-		
-		for media in media_list:
-			media_type = media.get('type')
-			if media_type == 'photo':
-				media_url = media.get('media_url_https', '')
-				if media_url:
-					# 构造原图 URL
-					url = f"{media_url}?format=jpg&name=orig"
-					# 提取图片标识符
-					match = re.search(r"/media/([A-Za-z0-9_-]+)\.", media_url)
-					if match:
-						identifier = match.group(1)
-						if len(identifier) == 15:
-							if identifier not in photos:
-								photos.add(identifier)
-								photo_ids.append(identifier)
-								photo_tasks.append({
-									"url": url, "file_name": identifier + ".jpg", "idr": identifier,
-									"file_type": "photo", "record_id": record_id
-								})
-						else:
-							err_photo_url_list.append(url)
-					else:
-						err_photo_url_list.append(media_url)
-			elif media_type == 'video':
-				# 视频需要从 video_info 中获取最高质量的 URL
-				video_info = media.get('video_info', {})
-				variants = video_info.get('variants', [])
-				mp4_variants = [v for v in variants if v.get('content_type') == 'video/mp4']
-				if mp4_variants:
-					best_variant = max(mp4_variants, key=lambda x: x.get('bitrate', 0))
-					url = best_variant.get('url', '')
-					match = re.search(r"vid/[a-zA-Z0-9_/-]+/([A-Za-z0-9_-]+)\.mp4", url)
-					if match:
-						identifier = match.group(1)
-						if len(identifier) == 16:
-							if identifier not in videos:
-								videos.add(identifier)
-								video_ids.append(identifier)
-								video_tasks.append({
-									"url": url, "file_name": identifier + ".mp4", "idr": identifier,
-									"file_type": "video", "record_id": record_id
-								})
-						else:
-							err_video_url_list.append(url)
-					else:
-						err_video_url_list.append(url)
-		
-		return photo_ids, video_ids, photo_tasks, video_tasks
+		for media in media_rows:
+			identifier = media["identifier"]
+			url = media["url"]
+			if media["type"] == "photo":
+				if len(identifier) == 15:
+					if identifier not in photos:
+						photos.add(identifier)
+						record["_photos"].append(identifier)  # 建立映射
+						record["_photo_download_tasks"].append(
+							{"url": url, "file_name": identifier + ".jpg", "idr": identifier,
+							 "file_type": "photo", "record_id": record["id"]})
+				else:
+					err_photo_url_list.append(url)
+
+			elif media["type"] == "video":
+				if len(identifier) == 16:
+					if identifier not in videos:
+						videos.add(identifier)
+						record["_videos"].append(identifier)  # 建立映射
+						record["_video_download_tasks"].append(
+							{"url": url, "file_name": identifier + ".mp4", "idr": identifier,
+							 "file_type": "video", "record_id": record["id"]})
+				else:
+					err_video_url_list.append(url)
 
 	def load_data(self):
 		download_path = self.path_input.text()
@@ -413,15 +376,14 @@ class DatabaseViewerDialog(QDialog):
 		if not os.path.exists(download_path):
 			os.makedirs(download_path)
 
-		# 扫描/download/文件夹下的所有文件，使用 set 提升查找性能
-		self.downloaded_files = set()
-		for root, dirs, files in os.walk(download_path):
-			for file in files:
-				# 去除文件扩展名
-				file_name_without_extension = os.path.splitext(file)[0]
-				self.downloaded_files.add(file_name_without_extension)
+		# 增量扫描下载目录（只读取有变化的目录），从媒体索引读取已下载文件，使用 set 提升查找性能
+		globals_module.db.scan_media_files(download_path)
+		self.downloaded_files = globals_module.db.get_media_file_identifiers()
 
-		self.records = globals_module.db.all()[::-1]  # 按逆序加载
+		# 按逆序流式加载，只读取表格需要的列，不解码 raw_data
+		self.records = list(globals_module.db.iter_rows(
+			columns=["id", "created_at", "full_text", "name", "views_count", "url"], order="DESC"))
+		media_map = globals_module.db.get_media()
 		self.table.setRowCount(len(self.records))
 
 		# 设置每一行的高度，防止按钮被挤压
@@ -437,11 +399,11 @@ class DatabaseViewerDialog(QDialog):
 		for row, record in enumerate(self.records):
 			# 填入数据
 			self.table.setItem(row, 0, QTableWidgetItem(str(record.get("id", ""))))
-			self.table.setItem(row, 1, QTableWidgetItem(record.get("created_at", "")))
-			self.table.setItem(row, 2, QTableWidgetItem(record.get("full_text", "")))
-			self.table.setItem(row, 3, QTableWidgetItem(record.get("name", "")))
+			self.table.setItem(row, 1, QTableWidgetItem(record.get("created_at") or ""))
+			self.table.setItem(row, 2, QTableWidgetItem(record.get("full_text") or ""))
+			self.table.setItem(row, 3, QTableWidgetItem(record.get("name") or ""))
 			self.table.setItem(row, 4, QTableWidgetItem(str(record.get("views_count", ""))))
-			self.table.setItem(row, 5, QTableWidgetItem(record.get("url", "")))
+			self.table.setItem(row, 5, QTableWidgetItem(record.get("url") or ""))
 
 			# 初始化临时映射变量
 			record["_photos"] = []
@@ -450,58 +412,9 @@ class DatabaseViewerDialog(QDialog):
 			record["_photo_download_tasks"] = []
 			record["_video_download_tasks"] = []
 
-			# 手写匹配
-			medias = record.get("media", [])
-			for media in medias:
-				if media.get("type") == "photo":
-					url = media.get("original")
-					match = re.search(r"media/([A-Za-z0-9_-]+)\?format=", url)
-
-					if match:
-						identifier = match.group(1)
-						if len(identifier) == 15:
-							if identifier not in photos:
-								photos.add(identifier)
-								record["_photos"].append(identifier)  # 建立映射
-								record["_photo_download_tasks"].append(
-									{"url": url, "file_name": identifier + ".jpg", "idr": identifier,
-									 "file_type": "photo", "record_id": record["id"]})
-						else:
-							err_photo_url_list.append(url)
-					else:
-						err_photo_url_list.append(url)
-
-				elif media.get("type") == "video":
-					url = media.get("original")
-					match = re.search(r"vid/[a-zA-Z0-9_/-]+/([A-Za-z0-9_-]+)\.mp4", url)
-
-					if match:
-						identifier = match.group(1)
-						if len(identifier) == 16:
-							if identifier not in videos:
-								videos.add(identifier)
-								record["_videos"].append(identifier)  # 建立映射
-								record["_video_download_tasks"].append(
-									{"url": url, "file_name": identifier + ".mp4", "idr": identifier,
-									 "file_type": "video", "record_id": record["id"]})
-						else:
-							err_video_url_list.append(url)
-					else:
-						err_video_url_list.append(url)
-
-			# 处理引用推文中的媒体
-			metadata = record.get("metadata", {})
-			quoted_result = metadata.get("quoted_status_result", {}).get("result", {})
-			if quoted_result:
-				quoted_legacy = quoted_result.get("legacy", {})
-				if quoted_legacy:
-					q_photo_ids, q_video_ids, q_photo_tasks, q_video_tasks = self._extract_media_from_legacy(
-						quoted_legacy, record["id"], photos, videos, err_photo_url_list, err_video_url_list
-					)
-					record["_photos"].extend(q_photo_ids)
-					record["_videos"].extend(q_video_ids)
-					record["_photo_download_tasks"].extend(q_photo_tasks)
-					record["_video_download_tasks"].extend(q_video_tasks)
+			# 从媒体表建立映射
+			self._map_media(record, media_map.get(record["doc_id"], []), photos, videos,
+							err_photo_url_list, err_video_url_list)
 
 			# 添加查看和删除按钮
 			view_button = QPushButton(t('view'))
@@ -579,7 +492,9 @@ class DatabaseViewerDialog(QDialog):
 
 	def view_record(self, record):
 		# 过滤掉以 _ 开头的键, 因为这是python的内部临时状态标记，不是原始推文数据
-		filtered_record = {k: v for k, v in record.items() if not k.startswith('_')}
+		# 表格中只保存了部分列，查看时再读取完整记录
+		full_record = globals_module.db.get_by_doc_id(record["doc_id"]) or record
+		filtered_record = {k: v for k, v in full_record.items() if not k.startswith('_')}
 		self.view_text(t('view_record'), json.dumps(filtered_record, indent=4, ensure_ascii=False))
 
 	def view_text(self, title, text):
@@ -1,12 +1,116 @@
 # -*- coding: utf-8 -*-
 # @Author: 神无月可乐
 # @Create at: 2025/12/13 01:00
+import codecs
 import json
+import os
+import tempfile
 
 from PySide6.QtCore import QThread, Signal
 
 import src.utils.globals as globals_module
 
+# 每次从文件读取的字节数
+CHUNK_SIZE = 1024 * 1024
+# 每批插入的条目数（每批一个事务）
+BATCH_SIZE = 1000
+# 单个元素的最大长度（字符数），超过时视为文件损坏，避免把文件剩余部分全部读入内存
+MAX_ELEMENT_SIZE = 64 * 1024 * 1024
+# 解析错误位置距缓冲区末尾超过该字符数时，认为元素本身格式错误而不是被缓冲区截断
+TRUNCATION_MARGIN = 16
+
+
+def iter_json_array(f, chunk_size: int = CHUNK_SIZE):
+	"""
+	逐个解析 JSON 数组中的元素，不把整个文件读入内存
+
+	Args:
+		f: 以二进制模式打开的文件对象
+		chunk_size: 每次读取的字节数
+
+	Yields:
+		(元素原文, 元素对象, 已读取的字节数)
+
+	Raises:
+		ValueError: 文件内容不是 JSON 数组，或某个元素格式错误 / 过大（错误信息包含元素的位置）
+	"""
+	decoder = json.JSONDecoder()
+	text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+	buf = ''
+	pos = 0
+	bytes_read = 0
+	eof = False
+	started = False
+	consumed = 0  # 已丢弃的字符数（buf[0] 在文件中的字符位置）
+	index = 0  # 当前元素的序号
+
+	def read_more():
+		nonlocal buf, pos, bytes_read, eof, consumed
+		chunk = f.read(chunk_size)
+		bytes_read += len(chunk)
+		eof = not chunk
+		# 丢弃已解析的部分，缓冲区大小只取决于单个元素
+		consumed += pos
+		buf = buf[pos:] + text_decoder.decode(chunk, final=eof)
+		pos = 0
+
+	while True:
+		# 跳过空白和元素之间的逗号
+		while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ',')):
+			pos += 1
+		if pos >= len(buf):
+			if eof:
+				raise ValueError('JSON 数组不完整')
+			read_more()
+			continue
+
+		if not started:
+			if buf[pos] != '[':
+				raise ValueError('JSON 顶层不是数组')
+			started = True
+			pos += 1
+			continue
+
+		if buf[pos] == ']':
+			return
+
+		try:
+			obj, end = decoder.raw_decode(buf, pos)
+		except json.JSONDecodeError as e:
+			# 错误不在缓冲区末尾附近（未闭合的字符串除外）时是元素本身格式错误，直接在该元素处报错
+			truncated = e.pos >= len(buf) - TRUNCATION_MARGIN or e.msg.startswith('Unterminated string')
+			if eof or not truncated:
+				raise ValueError(
+					f'第 {index + 1} 个元素（第 {consumed + pos} 个字符处）格式错误: '
+					f'{e.msg}（第 {consumed + e.pos} 个字符）'
+				) from e
+			if len(buf) - pos > MAX_ELEMENT_SIZE:
+				raise ValueError(f'第 {index + 1} 个元素（第 {consumed + pos} 个字符处）过大或未闭合')
+			# 元素跨越了缓冲区末尾，继续读取
+			read_more()
+			continue
+		# 数字等标量元素可能在缓冲区末尾被截断（如 "0." 或 "1e" 只解析出前缀），
+		# 必须看到元素之后的下一个非空白字符是 ',' 或 ']' 才能确认元素完整
+		nxt = end
+		while nxt < len(buf) and buf[nxt].isspace():
+			nxt += 1
+		if nxt >= len(buf):
+			if not eof:
+				read_more()
+				continue
+		elif buf[nxt] not in ',]':
+			if not eof and len(buf) - end <= TRUNCATION_MARGIN:
+				read_more()
+				continue
+			raise ValueError(
+				f'第 {index + 1} 个元素（第 {consumed + pos} 个字符处）格式错误: '
+				f'元素之后应为逗号或 ]（第 {consumed + nxt} 个字符）'
+			)
+
+		yield buf[pos:end], obj, bytes_read
+		pos = end
+		index += 1
+
 
 class JSONProcessorThread(QThread):
 	progress = Signal(int)
@@ -17,43 +121,95 @@ class JSONProcessorThread(QThread):
 		self.file_path = file_path
 		self.reverse_insert = reverse_insert
 
+	def _insert_batch(self, batch: list) -> int:
+		"""
+		插入一批条目：只添加不在 main db 且不在 deleted db 中的条目
+
+		Returns:
+			实际插入的条目数
+		"""
+		ids = [entry['id'] for entry in batch]
+		existing_ids = globals_module.db.get_existing_ids(ids) | globals_module.ddb.get_existing_ids(ids)
+
+		new_entries = []
+		for entry in batch:
+			_id = entry['id']
+			if _id not in existing_ids:
+				new_entries.append(entry)
+				# 写入前就把 id 放进集合，避免批内重复；之前批次中的重复由数据库中已存在的 id 排除
+				existing_ids.add(_id)
+
+		if not new_entries:
+			return 0
+		return globals_module.db.insert_multiple(new_entries)
+
 	def run(self):
 		try:
-			# 1) 预加载 main db 与 deleted db 的所有 id（使用高性能方法）
-			existing_ids = globals_module.db.get_all_ids() | globals_module.ddb.get_all_ids()
-
-			# 2) 读取 JSON 文件
-			with open(self.file_path, "r", encoding="utf-8") as f:
-				data = json.load(f)
-
-			if not isinstance(data, list):
-				self.completed.emit(-1)
-				return
-
-			new_entries_list = []
-			total_entries = len(data) or 1  # 防止除零
-
-			# 3) 只添加：不在 main db 且不在 deleted db 的条目
-			for i, entry in enumerate(data):
-				_id = entry.get('id')
-				if _id and _id not in existing_ids:
-					new_entries_list.append(entry)
-					# 写入前就把 id 放进集合，避免 JSON 内部重复
-					existing_ids.add(_id)
-
-				if i % 10 == 0:
-					self.progress.emit(int(i * 100 / total_entries))
-
-			# 4) 批量插入
-			if new_entries_list:
-				# 根据设置决定是否反转顺序插入
+			total_bytes = os.path.getsize(self.file_path) or 1  # 防止除零
+			inserted = 0
+
+			with open(self.file_path, "rb") as f:
 				if self.reverse_insert:
-					globals_module.db.insert_multiple(new_entries_list)
+					# 按文件顺序流式解析，每凑满一批就插入并提交
+					batch = []
+					last_progress = -1
+					for _, entry, bytes_read in iter_json_array(f):
+						if isinstance(entry, dict) and entry.get('id'):
+							batch.append(entry)
+						if len(batch) >= BATCH_SIZE:
+							inserted += self._insert_batch(batch)
+							batch = []
+
+						progress = int(bytes_read * 99 / total_bytes)
+						if progress != last_progress:
+							self.progress.emit(progress)
+							last_progress = progress
+
+					if batch:
+						inserted += self._insert_batch(batch)
 				else:
-					globals_module.db.insert_multiple(new_entries_list[::-1])
+					inserted = self._run_reversed(f, total_bytes)
 
 			self.progress.emit(100)
-			self.completed.emit(len(new_entries_list))
+			self.completed.emit(inserted)
 
 		except Exception:
 			self.completed.emit(-1)
+
+	def _run_reversed(self, f, total_bytes: int) -> int:
+		"""
+		按文件倒序插入：先把各元素原文暂存到临时文件并记录偏移，再从后往前分批读取插入
+
+		Returns:
+			实际插入的条目数
+		"""
+		inserted = 0
+		offsets = []
+		with tempfile.TemporaryFile() as spool:
+			# 1) 流式解析，暂存元素原文（进度 0~50%）
+			last_progress = -1
+			for raw, entry, bytes_read in iter_json_array(f):
+				if isinstance(entry, dict) and entry.get('id'):
+					offsets.append(spool.tell())
+					spool.write(raw.replace('\n', ' ').encode('utf-8') + b'\n')
+
+				progress = int(bytes_read * 50 / total_bytes)
+				if progress != last_progress:
+					self.progress.emit(progress)
+					last_progress = progress
+
+			# 2) 从后往前读取暂存的元素，分批插入（进度 50~100%）
+			total_entries = len(offsets) or 1
+			batch = []
+			for i, offset in enumerate(reversed(offsets)):
+				spool.seek(offset)
+				batch.append(json.loads(spool.readline()))
+				if len(batch) >= BATCH_SIZE:
+					inserted += self._insert_batch(batch)
+					batch = []
+					self.progress.emit(50 + int((i + 1) * 49 / total_entries))
+
+			if batch:
+				inserted += self._insert_batch(batch)
+
+		return inserted
@@ -12,9 +12,11 @@ from PySide6.QtWidgets import (
 	QComboBox, QGroupBox, QSpinBox, QFrame, QMenu
 )
 
-from database import TweetDatabase, is_tinydb_file
-from downloader import init_global_aria2_manager, shutdown_global_aria2_manager, load_config, save_config, Aria2SettingsDialog, global_aria2_manager
+from database import is_tinydb_file
+from downloader import init_global_aria2_manager, shutdown_global_aria2_manager, load_config, save_config, Aria2SettingsDialog, DownloadWindow, global_aria2_manager
+from download_journal import get_download_journal, close_global_download_journal
 from i18n import t, set_language, get_language, get_available_languages
+from thumbnails import shutdown_global_thumbnail_cache
 import src.utils.globals as globals_module
 from src.utils.DatabaseViewerDialog import DatabaseViewerDialog
 from src.utils.JSONProcessorThread import JSONProcessorThread
@@ -22,6 +24,7 @@ from src.utils.MediaDownloadCheckThread import MediaDownloadCheckThread
 from src.utils.Migration import MigrationDialog
 from src.utils.WebServerCheckThread import WebServerCheckThread
 from src.utils.ProfileImageCacheDialog import ProfileImageCacheDialog
+from src.utils.RawDataMigrationThread import RawDataMigrationThread
 from src.utils.RestorePointManager import RestorePointManager
 from src.utils.RestorePointDialog import RestorePointInputDialog, RestorePointListDialog
 from webserver import start_web_server, stop_web_server, is_server_running, get_server_url, set_allow_delete
@@ -60,6 +63,8 @@ class MainWindow(QMainWindow):
 		self.download_settings_action.triggered.connect(self.open_download_settings)
 		self.profile_cache_action = self.more_menu.addAction(t('profile_cache_btn'))
 		self.profile_cache_action.triggered.connect(self.open_profile_cache_dialog)
+		self.compact_db_action = self.more_menu.addAction(t('compact_db_btn'))
+		self.compact_db_action.triggered.connect(self.compact_database)
 		self.more_menu_btn.setMenu(self.more_menu)
 		
 		# Github 按钮
@@ -291,6 +296,9 @@ class MainWindow(QMainWindow):
 		self.setAcceptDrops(True)
 		self.thread = None
 
+		# 下载后端状态文本（aria2 或内置 HTTP 下载）
+		self._download_backend_status_key = 'aria2_started'
+
 		# Web 服务器启动检测相关
 		self._web_check_thread = None
 		self._web_server_url = ""
@@ -298,6 +306,9 @@ class MainWindow(QMainWindow):
 		# 媒体下载检测线程
 		self._media_check_thread = None
 
+		# raw_data 存储格式转换线程
+		self._raw_data_migration_thread = None
+
 		# 延迟启动 aria2（避免阻塞 UI）
 		QTimer.singleShot(500, self.init_aria2)
 
@@ -307,6 +318,9 @@ class MainWindow(QMainWindow):
 		# 检查是否需要自动启动 Web 服务器
 		QTimer.singleShot(1500, self.check_auto_start_web_server)
 
+		# 在后台把已有记录转换为配置的 raw_data 存储格式
+		QTimer.singleShot(3000, self.start_raw_data_migration)
+
 	def on_language_changed(self, index):
 		"""语言切换事件"""
 		lang_code = self.lang_combo.itemData(index)
@@ -342,9 +356,10 @@ class MainWindow(QMainWindow):
 		self.more_menu_btn.setText(t('more_menu'))
 		self.download_settings_action.setText(t('aria2_settings'))
 		self.profile_cache_action.setText(t('profile_cache_btn'))
+		self.compact_db_action.setText(t('compact_db_btn'))
 		# 更新 aria2 状态
 		if self.aria2_status_label.styleSheet() == "color: green;":
-			self.aria2_status_label.setText(t('aria2_started'))
+			self.aria2_status_label.setText(t(self._download_backend_status_key))
 		elif self.aria2_status_label.styleSheet() == "color: red;":
 			self.aria2_status_label.setText(t('aria2_failed'))
 		else:
@@ -389,24 +404,59 @@ class MainWindow(QMainWindow):
 	def init_aria2(self):
 		"""初始化 aria2 守护进程"""
 		aria2_manager = init_global_aria2_manager()
-		if aria2_manager and aria2_manager.api:
-			self.aria2_status_label.setText(t('aria2_started'))
+		if aria2_manager and aria2_manager.is_available():
+			# 找不到 aria2c 或配置为 http 时使用内置 HTTP 下载
+			self._download_backend_status_key = 'aria2_started' if aria2_manager.NAME == 'aria2' else 'http_downloader_started'
+			self.aria2_status_label.setText(t(self._download_backend_status_key))
 			self.aria2_status_label.setStyleSheet("color: green;")
+			self.resume_unfinished_downloads(aria2_manager)
 		else:
 			self.aria2_status_label.setText(t('aria2_failed'))
 			self.aria2_status_label.setStyleSheet("color: red;")
 
+	def resume_unfinished_downloads(self, aria2_manager):
+		"""与 aria2 核对下载日志，询问是否继续上次未完成的下载"""
+		journal = get_download_journal()
+		try:
+			pending_count = aria2_manager.reconcile_journal(journal)
+		except Exception as e:
+			print(f"核对下载日志失败: {e}")
+			return
+		if not pending_count:
+			return
+
+		reply = QMessageBox.question(
+			self,
+			t('resume_downloads_title'),
+			t('resume_downloads_msg', count=pending_count),
+			QMessageBox.Yes | QMessageBox.No,
+			QMessageBox.Yes
+		)
+		if reply != QMessageBox.Yes:
+			journal.cancel_pending()
+			return
+
+		# 直接使用日志中记录的任务和保存目录，不需要重新扫描媒体
+		download_window = DownloadWindow(journal.get_tasks(journal.STATE_PENDING), parent=self)
+		download_window.start_download()
+		download_window.exec()
+
 	def closeEvent(self, event):
 		"""窗口关闭事件"""
 		# 停止检测线程
 		if self._web_check_thread and self._web_check_thread.isRunning():
 			self._web_check_thread.stop()
 			self._web_check_thread.wait(1000)
+		# 停止 raw_data 转换（下次启动时继续）
+		self.stop_raw_data_migration()
 		# 停止 Web 服务器
 		if is_server_running():
 			stop_web_server()
 		# 关闭 aria2 守护进程
 		shutdown_global_aria2_manager()
+		close_global_download_journal()
+		# 停止缩略图生成线程
+		shutdown_global_thumbnail_cache()
 		event.accept()
 
 	def dragEnterEvent(self, event):
@@ -488,8 +538,10 @@ class MainWindow(QMainWindow):
 				file_path += '.sqlite'
 
 			# 更新全局数据库实例
+			self.stop_raw_data_migration()
 			globals_module.db.close()
-			globals_module.db = TweetDatabase(file_path)
+			globals_module.db = globals_module.open_main_db(file_path)
+			self.start_raw_data_migration()
 
 			# 保存到配置
 			self.config.set('database', 'main_db', file_path)
@@ -519,8 +571,10 @@ class MainWindow(QMainWindow):
 				file_path += '.sqlite'
 
 			# 更新全局数据库实例
+			self.stop_raw_data_migration()
 			globals_module.ddb.close()
-			globals_module.ddb = TweetDatabase(file_path)
+			globals_module.ddb = globals_module.open_deleted_db(file_path)
+			self.start_raw_data_migration()
 
 			# 保存到配置
 			self.config.set('database', 'deleted_db', file_path)
@@ -573,7 +627,9 @@ class MainWindow(QMainWindow):
 			media_path = fresh_config.get('download', 'base_path')
 			allow_delete = self.allow_delete_checkbox.isChecked()
 
-			success, result = start_web_server(globals_module.db, media_path, port, deleted_db=globals_module.ddb, allow_delete=allow_delete)
+			success, result = start_web_server(globals_module.db, media_path, port, deleted_db=globals_module.ddb, allow_delete=allow_delete,
+											   backend=fresh_config.get('webserver', 'backend'),
+											   threads=fresh_config.getint('webserver', 'threads', fallback=8))
 
 			if success:
 				# 显示黄灯，进入第一阶段检测
@@ -605,7 +661,9 @@ class MainWindow(QMainWindow):
 			media_path = fresh_config.get('download', 'base_path')
 			allow_delete = self.allow_delete_checkbox.isChecked()
 
-			success, result = start_web_server(globals_module.db, media_path, port, deleted_db=globals_module.ddb, allow_delete=allow_delete)
+			success, result = start_web_server(globals_module.db, media_path, port, deleted_db=globals_module.ddb, allow_delete=allow_delete,
+											   backend=fresh_config.get('webserver', 'backend'),
+											   threads=fresh_config.getint('webserver', 'threads', fallback=8))
 
 			if success:
 				# 显示黄灯，进入第一阶段检测
@@ -809,6 +867,57 @@ class MainWindow(QMainWindow):
 			self.media_check_label.setText(t('media_check_all_downloaded'))
 			self.media_check_label.setStyleSheet("color: #22C55E;")
 
+	def start_raw_data_migration(self):
+		"""启动后台线程，把主库和删除库中已有记录的 raw_data 转换为配置的存储格式"""
+		if self._raw_data_migration_thread and self._raw_data_migration_thread.isRunning():
+			return
+		self._raw_data_migration_thread = RawDataMigrationThread([globals_module.db, globals_module.ddb])
+		self._raw_data_migration_thread.start()
+
+	def stop_raw_data_migration(self):
+		"""停止后台转换并等待当前批次提交"""
+		if self._raw_data_migration_thread and self._raw_data_migration_thread.isRunning():
+			self._raw_data_migration_thread.stop()
+			self._raw_data_migration_thread.wait()
+
+	def compact_database(self):
+		"""压缩数据库：在后台对主库和删除库执行完整的 VACUUM（期间所有写入都要等待，因此要求 Web 服务器和导入都已停止）"""
+		if is_server_running():
+			QMessageBox.warning(
+				self,
+				t('error'),
+				t('web_server_status_on') + '\n\n' + t('restore_point_stop_server_first')
+			)
+			return
+		if self.thread and self.thread.isRunning():
+			QMessageBox.warning(self, t('error'), t('compact_db_import_running'))
+			return
+
+		reply = QMessageBox.question(
+			self,
+			t('compact_db_title'),
+			t('compact_db_confirm'),
+			QMessageBox.Yes | QMessageBox.No,
+			QMessageBox.No
+		)
+		if reply != QMessageBox.Yes:
+			return
+
+		# 先停止后台转换，由压缩线程转换剩余的记录后再执行 VACUUM
+		self.stop_raw_data_migration()
+		self.compact_db_action.setEnabled(False)
+		self._raw_data_migration_thread = RawDataMigrationThread([globals_module.db, globals_module.ddb], vacuum=True)
+		self._raw_data_migration_thread.completed.connect(self.on_compact_database_completed)
+		self._raw_data_migration_thread.start()
+
+	def on_compact_database_completed(self, converted: int):
+		"""数据库压缩完成"""
+		self.compact_db_action.setEnabled(True)
+		if converted < 0:
+			QMessageBox.warning(self, t('error'), t('compact_db_failed'))
+		else:
+			QMessageBox.information(self, t('compact_db_title'), t('compact_db_done'))
+
 	def open_profile_cache_dialog(self):
 		"""打开头像缓存管理对话框"""
 		dialog = ProfileImageCacheDialog(self)
@@ -866,11 +975,11 @@ class MainWindow(QMainWindow):
 		else:
 			name = default_name
 
-		# 创建还原点
+		# 创建还原点（通过 SQLite 备份接口复制，包含尚在 WAL 日志中的事务）
 		success, result = self.restore_point_manager.create_restore_point(
 			name,
-			globals_module.main_db_path,
-			globals_module.deleted_db_path
+			globals_module.db,
+			globals_module.ddb
 		)
 
 		if success:
@@ -909,7 +1018,8 @@ class MainWindow(QMainWindow):
 		if not point:
 			return
 
-		# 执行还原
+		# 执行还原（还原会替换数据库文件，先停止后台转换）
+		self.stop_raw_data_migration()
 		success, result = self.restore_point_manager.restore_from_point(
 			point["folder_path"],
 			globals_module.main_db_path,
@@ -920,9 +1030,9 @@ class MainWindow(QMainWindow):
 
 		if success:
 			# 重新打开数据库
-			from database import TweetDatabase
-			globals_module.db = TweetDatabase(globals_module.main_db_path)
-			globals_module.ddb = TweetDatabase(globals_module.deleted_db_path)
+			globals_module.db = globals_module.open_main_db(globals_module.main_db_path)
+			globals_module.ddb = globals_module.open_deleted_db(globals_module.deleted_db_path)
+			self.start_raw_data_migration()
 
 			QMessageBox.information(
 				self,
@@ -931,9 +1041,9 @@ class MainWindow(QMainWindow):
 			)
 		else:
 			# 还原失败时也需要重新打开数据库
-			from database import TweetDatabase
-			globals_module.db = TweetDatabase(globals_module.main_db_path)
-			globals_module.ddb = TweetDatabase(globals_module.deleted_db_path)
+			globals_module.db = globals_module.open_main_db(globals_module.main_db_path)
+			globals_module.ddb = globals_module.open_deleted_db(globals_module.deleted_db_path)
+			self.start_raw_data_migration()
 
 			QMessageBox.warning(
 				self,
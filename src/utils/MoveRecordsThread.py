@@ -19,9 +19,10 @@ class MoveRecordsThread(QThread):
 			record for record in self.records if record.get("_need_download") == 1
 		]
 
-		# 清理临时字段后插入到删除数据库
+		# 列表中只有部分列，从数据库读取完整记录，清理临时字段后插入到删除数据库
+		full_records = self.main_db.get_by_doc_ids([record.get('doc_id') for record in need_move_records])
 		clean_records = []
-		for record in need_move_records:
+		for record in full_records:
 			clean_record = {k: v for k, v in record.items() if not k.startswith('_') and k != 'doc_id'}
 			clean_records.append(clean_record)
 
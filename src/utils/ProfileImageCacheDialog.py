@@ -2,7 +2,6 @@
 # 头像缓存管理对话框
 import os
 import re
-import time
 from typing import List, Dict, Set
 from PySide6.QtCore import Qt, QThread, Signal, QTimer
 from PySide6.QtWidgets import (
@@ -54,7 +53,7 @@ class ProfileImageDownloadThread(QThread):
         os.makedirs(self.save_dir, exist_ok=True)
         
         # 检查 aria2 管理器是否可用
-        if not self.aria2_manager or not self.aria2_manager.api:
+        if not self.aria2_manager or not self.aria2_manager.is_available():
             # aria2 不可用，直接返回失败
             for user in self.users:
                 self.item_result.emit(user.get('user_id', ''), False, "aria2 未启动")
@@ -65,20 +64,13 @@ class ProfileImageDownloadThread(QThread):
         fail_count = 0
         total = len(self.users)
         
-        # 加载 aria2 配置
-        config = downloader_module.load_config()
-        max_conn = config.get('aria2', 'max_connection_per_server')
-        split = config.get('aria2', 'split')
-        timeout = config.get('aria2', 'timeout')
-        
         # 存储下载任务: {gid: {'user_id': str, 'completed': bool}}
         download_tasks = {}
         
-        # 添加所有下载任务
+        # 构建所有下载任务
+        user_ids = []
+        add_tasks = []
         for user in self.users:
-            if self._is_cancelled:
-                break
-            
             user_id = user.get('user_id', '')
             screen_name = user.get('screen_name', '')
             profile_image_url = user.get('profile_image_url', '')
@@ -96,53 +88,44 @@ class ProfileImageDownloadThread(QThread):
                 url = f"https://unavatar.io/twitter/{screen_name}?fallback=false"
                 ext = ".jpg"  # unavatar 默认返回 jpg
             
-            file_name = f"{user_id}{ext}"
+            user_ids.append(user_id)
+            add_tasks.append((url, self.save_dir, f"{user_id}{ext}"))
+        
+        # 分批添加到 aria2（每批一次 system.multicall 请求，应用配置中的设置）
+        chunk_size = self.aria2_manager.ADD_CHUNK_SIZE
+        for start in range(0, len(add_tasks), chunk_size):
+            if self._is_cancelled:
+                break
             
-            try:
-                # 使用 aria2 添加下载任务（应用配置中的设置）
-                options = {
-                    "dir": self.save_dir,
-                    "out": file_name,
-                    "continue": "true",
-                    "max-connection-per-server": max_conn,
-                    "split": split,
-                    "min-split-size": "1M",
-                    "timeout": timeout,
-                    "max-tries": "1"
-                }
-                download = self.aria2_manager.api.add_uris([url], options=options)
-                
-                if download:
-                    download_tasks[download.gid] = {
+            gids = self.aria2_manager.add_downloads(add_tasks[start:start + chunk_size])
+            for user_id, gid in zip(user_ids[start:start + chunk_size], gids):
+                if gid:
+                    download_tasks[gid] = {
                         'user_id': user_id,
                         'completed': False
                     }
                 else:
                     fail_count += 1
                     self.item_result.emit(user_id, False, t('add_failed'))
-            except Exception as e:
-                fail_count += 1
-                self.item_result.emit(user_id, False, str(e))
         
         # 发送初始进度（添加任务阶段已完成）
         completed = success_count + fail_count
         self.progress.emit(completed, total)
         
-        # 轮询检查下载状态
-        while download_tasks and not self._is_cancelled:
-            completed_gids = []
-            
-            # 复制字典进行迭代，避免迭代时修改的问题
-            for gid, task_info in list(download_tasks.items()):
-                if task_info['completed']:
-                    continue
+        # 跟踪下载状态：收到 aria2 通知时立即查询，否则定时查询
+        tracker = downloader_module.Aria2StatusTracker(self.aria2_manager, interval=0.3)
+        tracker.track(list(download_tasks))
+        try:
+            while download_tasks and not self._is_cancelled:
+                completed_gids = []
                 
-                try:
-                    download = self.aria2_manager.get_download(gid)
-                    if not download:
+                # 只返回状态有变化的任务
+                for gid, download in tracker.poll().items():
+                    task_info = download_tasks.get(gid)
+                    if not task_info or task_info['completed']:
                         continue
                     
-                    status = download.status
+                    status = download['status']
                     
                     if status == "complete":
                         success_count += 1
@@ -154,23 +137,20 @@ class ProfileImageDownloadThread(QThread):
                         fail_count += 1
                         task_info['completed'] = True
                         completed_gids.append(gid)
-                        error_msg = getattr(download, 'error_message', None) or t('download_failed', error='Unknown')
+                        error_msg = download.get('errorMessage') or t('download_failed', error='Unknown')
                         self.item_result.emit(task_info['user_id'], False, error_msg)
-                except Exception:
-                    # 查询状态失败，跳过
-                    pass
-            
-            # 移除已完成的任务
-            for gid in completed_gids:
-                del download_tasks[gid]
-            
-            # 更新进度
-            completed = success_count + fail_count
-            self.progress.emit(completed, total)
-            
-            # 如果还有未完成的任务，等待一下再检查
-            if download_tasks:
-                time.sleep(0.3)
+                
+                # 移除已完成的任务
+                if completed_gids:
+                    tracker.untrack(completed_gids)
+                    for gid in completed_gids:
+                        del download_tasks[gid]
+                    
+                    # 更新进度
+                    completed = success_count + fail_count
+                    self.progress.emit(completed, total)
+        finally:
+            tracker.close()
         
         # 如果取消了，记录剩余任务为失败
         if self._is_cancelled:
@@ -310,29 +290,16 @@ class ProfileImageCacheDialog(QDialog):
         """加载所有用户信息并检查哪些头像未下载"""
         self.status_label.setText(t('profile_cache_loading'))
         
-        # 从数据库获取所有用户信息
-        all_tweets = globals_module.db.all()
-        
-        # 去重，收集所有用户
-        users_dict: Dict[str, Dict] = {}  # user_id -> user_info
-        
-        for tweet in all_tweets:
-            user_id = tweet.get('user_id', '')
-            if not user_id:
-                # 尝试从 metadata 中获取
-                metadata = tweet.get('metadata', {})
-                user_result = metadata.get('user_results', {}).get('result', {})
-                user_id = user_result.get('rest_id', '')
-            
-            if user_id and user_id not in users_dict:
-                users_dict[user_id] = {
-                    'user_id': user_id,
-                    'name': tweet.get('name', ''),
-                    'screen_name': tweet.get('screen_name', ''),
-                    'profile_image_url': tweet.get('profile_image_url', '')
-                }
-        
-        self.all_users = list(users_dict.values())
+        # 从用户表读取所有用户（插入推文时维护，无需遍历推文）
+        self.all_users = [
+            {
+                'user_id': user['user_id'],
+                'name': user['name'] or '',
+                'screen_name': user['screen_name'] or '',
+                'profile_image_url': user['profile_image_url'] or ''
+            }
+            for user in globals_module.db.get_users()
+        ]
         
         # 检查哪些头像已下载
         downloaded_ids = self._get_downloaded_profile_ids()
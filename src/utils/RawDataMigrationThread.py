@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# raw_data 存储格式转换与数据库压缩线程
+from PySide6.QtCore import QThread, Signal
+
+
+class RawDataMigrationThread(QThread):
+	"""后台把已有记录的 raw_data 转换为配置的存储格式（压缩或还原为 JSON 文本），可选在之后执行完整的 VACUUM"""
+	# 信号：已转换数, 总数
+	progress = Signal(int, int)
+	# 信号：转换的记录总数（出错时为 -1）
+	completed = Signal(int)
+
+	def __init__(self, databases: list, vacuum: bool = False):
+		super().__init__()
+		self.databases = databases
+		self.vacuum = vacuum  # 转换完成后是否执行完整的 VACUUM（由用户主动发起）
+		self._stop_flag = False
+
+	def stop(self):
+		"""停止转换（当前批次提交后退出，下次启动时继续）"""
+		self._stop_flag = True
+
+	def run(self):
+		converted = 0
+		try:
+			for database in self.databases:
+				if self._stop_flag:
+					break
+				converted += database.migrate_raw_data(
+					progress_callback=self.progress.emit,
+					should_stop=lambda: self._stop_flag
+				)
+				if self.vacuum and not self._stop_flag:
+					database.vacuum()
+			self.completed.emit(converted)
+		except Exception as e:
+			print(f"转换 raw_data 失败: {e}")
+			self.completed.emit(-1)
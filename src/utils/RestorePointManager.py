@@ -58,15 +58,15 @@ class RestorePointManager:
     def create_restore_point(
         self, 
         name: str, 
-        main_db_path: str, 
-        deleted_db_path: str
+        main_db, 
+        deleted_db
     ) -> tuple[bool, str]:
         """创建还原点
         
         Args:
             name: 还原点名称（同时作为文件夹名）
-            main_db_path: 主数据库文件路径
-            deleted_db_path: 删除库文件路径
+            main_db: 主数据库（TweetDatabase），通过其 backup 方法生成一致的快照
+            deleted_db: 删除库（TweetDatabase）
         
         Returns:
             (成功与否, 错误信息或还原点路径)
@@ -87,17 +87,14 @@ class RestorePointManager:
             os.makedirs(restore_point_dir)
             
             # 复制数据库文件
-            main_db_filename = os.path.basename(main_db_path)
-            deleted_db_filename = os.path.basename(deleted_db_path)
+            main_db_filename = os.path.basename(main_db.db_path)
+            deleted_db_filename = os.path.basename(deleted_db.db_path)
             
             main_db_dest = os.path.join(restore_point_dir, main_db_filename)
             deleted_db_dest = os.path.join(restore_point_dir, deleted_db_filename)
             
-            if os.path.exists(main_db_path):
-                shutil.copy2(main_db_path, main_db_dest)
-            
-            if os.path.exists(deleted_db_path):
-                shutil.copy2(deleted_db_path, deleted_db_dest)
+            main_db.backup(main_db_dest)
+            deleted_db.backup(deleted_db_dest)
             
             # 创建清单文件
             manifest = {
@@ -193,9 +190,11 @@ class RestorePointManager:
             deleted_db_src = os.path.join(folder_path, deleted_db_filename)
             
             if os.path.exists(main_db_src):
+                self._remove_wal_files(main_db_path)
                 shutil.copy2(main_db_src, main_db_path)
             
             if os.path.exists(deleted_db_src):
+                self._remove_wal_files(deleted_db_path)
                 shutil.copy2(deleted_db_src, deleted_db_path)
             
             return True, manifest.get("name", "")
@@ -238,6 +237,17 @@ class RestorePointManager:
         except Exception:
             return None
     
+    def _remove_wal_files(self, db_path: str):
+        """删除数据库残留的 WAL 日志文件，避免旧日志被应用到还原后的数据库
+        
+        Args:
+            db_path: 数据库文件路径
+        """
+        for suffix in ('-wal', '-shm'):
+            path = db_path + suffix
+            if os.path.exists(path):
+                os.remove(path)
+    
     def _sanitize_folder_name(self, name: str) -> str:
         """清理文件夹名称中的非法字符
         
@@ -34,5 +34,23 @@ if is_tinydb_file(deleted_db_path):
 elif not os.path.exists(deleted_db_path):
 	deleted_db_path = get_sqlite_path(deleted_db_path)
 
-db = TweetDatabase(main_db_path)  # main db (SQLite)
-ddb = TweetDatabase(deleted_db_path)  # deleted db (SQLite)
+
+def get_raw_data_compression():
+	"""获取配置的 raw_data 压缩方式（none 返回 None）"""
+	compression = config.get('database', 'raw_data_compression').strip().lower()
+	return None if compression in ('', 'none') else compression
+
+
+def open_main_db(path):
+	"""按配置打开主数据库"""
+	return TweetDatabase(path, fts_tokenizer=config.get('database', 'fts_tokenizer'),
+						 compression=get_raw_data_compression())
+
+
+def open_deleted_db(path):
+	"""打开删除库（删除库不参与搜索，不建立全文索引）"""
+	return TweetDatabase(path, fts_tokenizer=None, compression=get_raw_data_compression())
+
+
+db = open_main_db(main_db_path)  # main db (SQLite)
+ddb = open_deleted_db(deleted_db_path)  # deleted db (SQLite)
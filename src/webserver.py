@@ -7,30 +7,191 @@ Web 服务器模块
 import os
 import re
 import json
+import base64
+import gzip
+import hashlib
 import sys
 import socket
 import threading
 import time
-from datetime import datetime
-from flask import Flask, render_template, jsonify, request, send_from_directory, abort
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory, abort
 from werkzeug.serving import make_server
-from database import TweetDatabase
+from database import TweetDatabase, extract_user_id, parse_twitter_date
 from i18n import get_language, get_translations
+from thumbnails import get_thumbnail_cache
+
+try:
+    import brotli  # 可选依赖：安装后对支持的客户端使用 brotli 压缩响应，否则只使用 gzip
+except ImportError:
+    brotli = None
+
+try:
+    import waitress  # 可选依赖：安装后默认使用 waitress 提供服务（固定大小的线程池、支持 keep-alive）
+except ImportError:
+    waitress = None
 
 # Web 服务器实例
 _web_server = None
 _server_thread = None
-_http_server = None  # werkzeug 服务器实例，用于优雅关闭
+_http_server = None  # 服务后端实例（见 SERVER_BACKENDS），用于优雅关闭
 _is_running = False
-_cache_ready = False  # 媒体缓存是否已构建完成
-_cache_building = False  # 媒体缓存是否正在构建
+_cache_ready = False  # 媒体索引是否已扫描完成
+_cache_building = False  # 媒体索引是否正在扫描
 _profile_images_dir = None  # 头像缓存目录
 
+# SQLite 整数的取值范围，超出范围的查询参数无法绑定到 SQL 语句
+SQLITE_INT_MIN = -2 ** 63
+SQLITE_INT_MAX = 2 ** 63 - 1
+
+
+class WerkzeugServerBackend:
+    """werkzeug 开发服务器（每个连接一个线程），未安装 waitress 时使用"""
+    
+    def __init__(self, app, host: str, port: int, threads: int):
+        self._server = make_server(host, port, app, threaded=True)
+    
+    def serve_forever(self):
+        """处理请求，直到 shutdown 被调用"""
+        self._server.serve_forever()
+    
+    def shutdown(self):
+        """停止接受新连接并让 serve_forever 返回"""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class WaitressServerBackend:
+    """waitress 生产级 WSGI 服务器：固定大小的工作线程池，支持 HTTP/1.1 keep-alive"""
+    
+    # 事件循环处理一次 I/O 事件的最长等待时间（秒），关闭过程中用较短的值以便及时检查是否发送完毕
+    POLL_TIMEOUT = 1.0
+    DRAIN_POLL_TIMEOUT = 0.05
+    
+    def __init__(self, app, host: str, port: int, threads: int):
+        from waitress.server import create_server
+        self._map = {}  # 事件循环的连接表（只在事件循环线程中修改）
+        self._server = create_server(
+            app,
+            map=self._map,
+            host=host,
+            port=port,
+            threads=threads,
+            channel_timeout=120,  # 空闲的 keep-alive 连接保留时间（秒）
+            ident=None
+        )
+        self._stopping = threading.Event()  # 已请求关闭：停止接受新连接
+        self._draining = threading.Event()  # 工作线程已结束：发送完剩余响应后关闭所有连接
+        self._stopped = threading.Event()  # 事件循环已退出
+        self._drain_timeout = 5
+    
+    def serve_forever(self):
+        """处理请求，直到 shutdown 被调用（所有连接和监听 socket 都在这个线程中关闭）"""
+        from waitress import wasyncore
+        server = self._server
+        drain_deadline = None
+        try:
+            while self._map:
+                timeout = self.DRAIN_POLL_TIMEOUT if self._stopping.is_set() else self.POLL_TIMEOUT
+                wasyncore.loop(timeout=timeout, map=self._map, count=1)
+                
+                if self._stopping.is_set() and server.accepting:
+                    # 只把监听 socket 移出事件循环，trigger 仍保留，工作线程写出响应时需要用它唤醒事件循环
+                    server.accepting = False
+                    server.del_channel()
+                    server.socket.close()
+                
+                if self._draining.is_set():
+                    if drain_deadline is None:
+                        drain_deadline = time.monotonic() + self._drain_timeout
+                    pending = any(getattr(channel, 'total_outbufs_len', 0) for channel in self._map.values())
+                    if not pending or time.monotonic() >= drain_deadline:
+                        # 关闭剩余的连接和 trigger，连接表为空后循环结束
+                        for channel in list(self._map.values()):
+                            try:
+                                channel.handle_close()
+                            except Exception as e:
+                                print(f"关闭连接失败: {e}")
+                        self._map.clear()
+        finally:
+            self._stopped.set()
+    
+    def shutdown(self, timeout: float = 5):
+        """
+        优雅关闭：停止接受新连接，等待进行中的请求处理完并发送完响应，再关闭所有连接
+        
+        只设置标志并通过 trigger 唤醒事件循环，连接表和各连接由事件循环线程自己修改
+        
+        Args:
+            timeout: 等待进行中的请求、等待发送响应的最长时间（秒，各自计算）
+        """
+        if self._stopped.is_set():
+            return
+        server = self._server
+        self._drain_timeout = timeout
+        self._stopping.set()
+        server.pull_trigger()
+        
+        # 等待工作线程处理完当前请求，排队中的请求会被取消（任务队列有自己的锁，可以在其他线程中调用）
+        server.task_dispatcher.shutdown(timeout=timeout)
+        
+        # 由事件循环发送完已生成的响应后关闭所有连接
+        self._draining.set()
+        server.pull_trigger()
+        if not self._stopped.wait(timeout + 1):
+            print('等待 Web 服务器事件循环退出超时')
+
+
+# 服务后端：名称 -> 类（auto 表示安装了 waitress 时使用 waitress，否则使用 werkzeug）
+SERVER_BACKENDS = {
+    'waitress': WaitressServerBackend,
+    'werkzeug': WerkzeugServerBackend,
+}
+
+
+def create_server_backend(app, host: str, port: int, backend: str = 'auto', threads: int = 8):
+    """
+    创建服务后端
+    
+    Args:
+        app: WSGI 应用
+        host: 监听地址
+        port: 监听端口
+        backend: 后端名称（auto、waitress 或 werkzeug）
+        threads: 工作线程数（仅 waitress 使用）
+        
+    Returns:
+        服务后端实例
+    """
+    if backend == 'auto':
+        backend = 'waitress' if waitress is not None else 'werkzeug'
+    elif backend not in SERVER_BACKENDS:
+        raise ValueError(f'无效的服务后端: {backend}')
+    
+    if backend == 'waitress' and waitress is None:
+        print('未安装 waitress，改用 werkzeug 开发服务器')
+        backend = 'werkzeug'
+    return SERVER_BACKENDS[backend](app, host, port, threads)
+
 
 class WebServer:
     """Web 服务器类"""
     
-    def __init__(self, db: TweetDatabase, media_path: str, host: str = '0.0.0.0', port: int = 5001, deleted_db: TweetDatabase = None, allow_delete: bool = False):
+    # 处理后推文缓存的最大条目数
+    TWEET_CACHE_SIZE = 2000
+    
+    # 文件路由的浏览器缓存时间（秒）；文件响应都带有 ETag 和 Last-Modified，过期后可用 304 重新验证
+    MEDIA_MAX_AGE = 365 * 24 * 3600  # 媒体文件
+    PROFILE_MAX_AGE = 24 * 3600  # 头像
+    RES_MAX_AGE = 24 * 3600  # 静态资源
+    
+    # 响应压缩：只压缩这些类型且不小于 COMPRESS_MIN_SIZE 字节的响应
+    COMPRESS_MIMETYPES = {'application/json', 'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript'}
+    COMPRESS_MIN_SIZE = 1024
+    
+    def __init__(self, db: TweetDatabase, media_path: str, host: str = '0.0.0.0', port: int = 5001, deleted_db: TweetDatabase = None, allow_delete: bool = False,
+                 backend: str = 'auto', threads: int = 8):
         """
         初始化 Web 服务器
         
@@ -41,6 +202,8 @@ class WebServer:
             port: 监听端口
             deleted_db: 删除库实例，用于过滤已删除的推文
             allow_delete: 是否允许远程删除推文
+            backend: 服务后端（auto、waitress 或 werkzeug）
+            threads: 工作线程数（仅 waitress 使用）
         """
         self.db = db
         self.deleted_db = deleted_db
@@ -48,22 +211,42 @@ class WebServer:
         self.host = host
         self.port = port
         self.allow_delete = allow_delete
+        self.backend = backend
+        self.threads = threads
         
         # 头像目录（在当前工作目录下）
         self.profile_images_dir = os.path.join(os.getcwd(), 'profile_images')
         
-        # 缓存相关
+        # 缩略图缓存（与下载窗口共用，下载完成后可以预先生成）
+        self.thumbnails = get_thumbnail_cache()
+        
+        # 已删除推文 ID 缓存：删除库的数据版本变化时才刷新，只有新增记录时增量合并
         self._deleted_ids_cache = None
-        self._cache_timestamp = 0
+        self._deleted_ids_version = None  # 缓存对应的删除库 data_version
+        self._deleted_ids_remove_version = None  # 缓存对应的删除库 remove_version
+        self._deleted_ids_last_doc_id = 0  # 已同步到的删除库最大 doc_id
         self._cache_lock = threading.Lock()
-        self._cache_ttl = 60  # 缓存60秒
-        
-        # 初始化媒体缓存为空，确保每次启动都会重新构建
-        self._media_cache = None
         
         # 头像缓存（user_id -> 文件路径）
         self._profile_cache = None
         
+        # API 响应 ETag 的前缀：数据版本号在程序重启后从 0 开始，加入启动时间避免与重启前的 ETag 重复
+        self._etag_prefix = format(int(time.time() * 1000), 'x')
+        
+        # 预先渲染并压缩的主页：(语言, allow_delete) -> {编码: 内容, 'etag': ETag}
+        self._index_cache = {}
+        
+        # 处理后的推文缓存（LRU，doc_id -> 返回给前端的数据），只对 _tweet_cache_version 版本的数据有效
+        self._tweet_cache = OrderedDict()
+        self._tweet_cache_version = -1
+        self._tweet_cache_lock = threading.Lock()
+        self._tweet_cache_hits = 0
+        self._tweet_cache_misses = 0
+        
+        # 将删除库附加到主库的读连接上，列表查询在 SQL 中排除已删除的推文
+        if self.deleted_db:
+            self.db.attach_deleted_db(self.deleted_db)
+        
         # 获取 web 文件夹路径（兼容开发环境和 PyInstaller 打包后环境）
         if getattr(sys, 'frozen', False):
             # PyInstaller 打包后的环境，资源在 _MEIPASS 目录下
@@ -79,6 +262,80 @@ class WebServer:
                         template_folder=template_path,
                         static_folder=static_path)
         self._setup_routes()
+        self.app.after_request(self._compress_response)
+    
+    def _accepted_encoding(self) -> str:
+        """
+        根据 Accept-Encoding 选择响应的压缩编码
+        
+        Returns:
+            br、gzip 或 identity（不压缩）
+        """
+        accept = request.accept_encodings
+        if brotli is not None and accept['br']:
+            return 'br'
+        if accept['gzip']:
+            return 'gzip'
+        return 'identity'
+    
+    def _compress(self, data: bytes, encoding: str, best: bool = False) -> bytes:
+        """
+        压缩响应内容
+        
+        Args:
+            data: 原始内容
+            encoding: br 或 gzip
+            best: 是否使用最高压缩率（用于只压缩一次的内容，动态响应使用较快的级别）
+        """
+        if encoding == 'br':
+            return brotli.compress(data, quality=11 if best else 5)
+        return gzip.compress(data, compresslevel=9 if best else 6)
+    
+    def _compress_response(self, response: Response) -> Response:
+        """按 Accept-Encoding 压缩 JSON、HTML 等文本响应（文件响应和过小的响应不压缩）"""
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.COMPRESS_MIMETYPES):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        encoding = self._accepted_encoding()
+        data = response.get_data()
+        if encoding == 'identity' or len(data) < self.COMPRESS_MIN_SIZE:
+            return response
+        
+        response.set_data(self._compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        # 不同编码的内容不同，强 ETag 改为弱 ETag（If-None-Match 使用弱比较，仍然可以返回 304）
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+    
+    def _render_index(self, lang: str) -> dict:
+        """
+        渲染主页并预先压缩（每种语言和 allow_delete 状态只渲染一次）
+        
+        Returns:
+            {'identity': 原始内容, 'gzip': gzip 内容, 'br': brotli 内容（未安装时为 None）, 'etag': ETag}
+        """
+        key = (lang, self.allow_delete)
+        page = self._index_cache.get(key)
+        if page is None:
+            # 将 allow_delete 状态和国际化信息注入到模板中，供前端使用
+            html = render_template('index.html',
+                                   allow_delete=self.allow_delete,
+                                   current_lang=lang,
+                                   translations=get_translations(lang)).encode('utf-8')
+            page = {
+                'identity': html,
+                'gzip': self._compress(html, 'gzip', best=True),
+                'br': self._compress(html, 'br', best=True) if brotli is not None else None,
+                'etag': hashlib.sha1(html).hexdigest()
+            }
+            self._index_cache[key] = page
+        return page
     
     def _setup_routes(self):
         """设置路由"""
@@ -102,14 +359,21 @@ class WebServer:
         @self.app.route('/')
         def index():
             """主页"""
-            # 获取当前语言和翻译字典
-            current_lang = get_language()
-            translations = get_translations(current_lang)
-            # 将 allow_delete 状态和国际化信息注入到模板中，供前端使用
-            return render_template('index.html', 
-                                 allow_delete=self.allow_delete,
-                                 current_lang=current_lang,
-                                 translations=translations)
+            # 使用预先渲染并压缩的页面，不必每次都渲染模板
+            page = self._render_index(get_language())
+            if request.if_none_match.contains_weak(page['etag']):
+                return self._not_modified(page['etag'])
+            
+            encoding = self._accepted_encoding()
+            response = Response(page[encoding], mimetype='text/html')
+            response.vary.add('Accept-Encoding')
+            response.headers['Cache-Control'] = 'no-cache'
+            if encoding == 'identity':
+                response.set_etag(page['etag'])
+            else:
+                response.headers['Content-Encoding'] = encoding
+                response.set_etag(page['etag'], weak=True)
+            return response
         
         @self.app.route('/api/tweets')
         def get_tweets():
@@ -126,76 +390,91 @@ class WebServer:
             # 筛选参数：包含未下载的媒体
             has_undownloaded_media = request.args.get('has_undownloaded_media', '0') == '1'
             
+            # 排序与发推时间范围（from/to 为毫秒时间戳或 YYYY-MM-DD，闭区间）
+            sort = request.args.get('sort', 'added', type=str)
+            if sort not in TweetDatabase.SORT_ORDERS:
+                return jsonify({'error': 'Invalid sort'}), 400
+            try:
+                date_from = self._parse_date_param(request.args.get('from', ''))
+                date_to = self._parse_date_param(request.args.get('to', ''), end_of_day=True)
+            except ValueError:
+                return jsonify({'error': 'Invalid date range'}), 400
+            
             # 限制每页数量
             per_page = min(per_page, 200)
             
-            # 获取已删除的推文ID（使用缓存）
-            deleted_ids = self._get_deleted_ids()
+            # 稀疏字段集：fields=id,full_text,photos 只返回列出的字段（id 和 doc_id 总是返回）
+            fields = self._parse_fields(request.args.get('fields', None, type=str))
+            
+            # 数据版本未变化时相同的请求直接返回 304（版本号在查询之前读取）
+            version = self.db.data_version
+            etag = self._api_etag(version)
+            if request.if_none_match.contains_weak(etag):
+                return self._not_modified(etag)
             
-            # 如果需要筛选未下载媒体，需要特殊处理
-            if has_undownloaded_media:
-                # 获取所有符合搜索条件的推文，然后在应用层过滤
-                all_tweets, _ = self.db.get_paginated(
-                    page=1, 
-                    per_page=999999,  # 获取所有
-                    exclude_ids=deleted_ids,
+            # 游标分页模式：传入 cursor 参数（首页为空字符串）时启用
+            cursor = request.args.get('cursor', None, type=str)
+            if cursor is not None:
+                try:
+                    direction, doc_id, cursor_ts = self._decode_cursor(cursor)
+                except ValueError:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                if direction and sort != 'added' and cursor_ts is None:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                
+                with_total = request.args.get('with_total', '0') == '1'
+                tweets, has_older, has_newer, total = self.db.get_page_by_cursor(
+                    per_page=per_page,
+                    before_doc_id=doc_id if direction == 'b' else None,
+                    after_doc_id=doc_id if direction == 'a' else None,
+                    exclude_deleted=True,
                     search_keyword=search_keyword,
                     search_in_name=search_in_name,
                     search_in_screen_name=search_in_screen_name,
-                    search_in_text=search_in_text
+                    search_in_text=search_in_text,
+                    has_undownloaded_media=has_undownloaded_media,
+                    with_total=with_total,
+                    date_from=date_from,
+                    date_to=date_to,
+                    sort=sort,
+                    cursor_ts=cursor_ts
                 )
                 
-                # 过滤出包含未下载媒体的推文
-                filtered_tweets = []
-                for tweet in all_tweets:
-                    if self._has_undownloaded_media(tweet):
-                        filtered_tweets.append(tweet)
-                
-                # 手动分页
-                total = len(filtered_tweets)
-                total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-                start_idx = (page - 1) * per_page
-                end_idx = start_idx + per_page
-                paged_tweets = filtered_tweets[start_idx:end_idx]
-                
-                # 处理推文数据
-                processed_tweets = []
-                for tweet in paged_tweets:
-                    processed = self._process_tweet(tweet)
-                    processed_tweets.append(processed)
-                
-                return jsonify({
-                    'tweets': processed_tweets,
-                    'page': page,
+                response = {
+                    'tweets': self._select_fields(tweets, self._process_tweets(tweets, version), fields),
                     'per_page': per_page,
-                    'total': total,
-                    'total_pages': total_pages,
-                    'has_prev': page > 1,
-                    'has_next': page < total_pages,
+                    'next_cursor': self._encode_cursor('b', tweets[-1]) if has_older else None,
+                    'prev_cursor': self._encode_cursor('a', tweets[0]) if has_newer else None,
+                    'has_next': has_older,
+                    'has_prev': has_newer,
                     'allow_delete': self.allow_delete
-                })
+                }
+                if with_total:
+                    response['total'] = total
+                return self._cacheable_json(response, etag)
             
-            # 普通分页查询（无未下载媒体筛选）
+            # 普通分页查询（未下载媒体筛选同样在数据库中完成）
             tweets, total = self.db.get_paginated(
                 page=page, 
                 per_page=per_page, 
-                exclude_ids=deleted_ids,
+                exclude_deleted=True,
                 search_keyword=search_keyword,
                 search_in_name=search_in_name,
                 search_in_screen_name=search_in_screen_name,
-                search_in_text=search_in_text
+                search_in_text=search_in_text,
+                has_undownloaded_media=has_undownloaded_media,
+                date_from=date_from,
+                date_to=date_to,
+                sort=sort
             )
             
             # 计算总页数
             total_pages = (total + per_page - 1) // per_page if total > 0 else 1
             
             # 处理推文数据，添加媒体信息
-            processed_tweets = []
-            for tweet in tweets:
-                processed = self._process_tweet(tweet)
-                processed_tweets.append(processed)
+            processed_tweets = self._select_fields(tweets, self._process_tweets(tweets, version), fields)
             
-            return jsonify({
+            return self._cacheable_json({
                 'tweets': processed_tweets,
                 'page': page,
                 'per_page': per_page,
@@ -204,7 +483,7 @@ class WebServer:
                 'has_prev': page > 1,
                 'has_next': page < total_pages,
                 'allow_delete': self.allow_delete
-            })
+            }, etag)
         
         @self.app.route('/api/config')
         def get_config():
@@ -222,11 +501,34 @@ class WebServer:
             if tweet_id in deleted_ids:
                 return jsonify({'error': 'Tweet not found'}), 404
             
+            version = self.db.data_version
+            etag = self._api_etag(version)
+            if request.if_none_match.contains_weak(etag):
+                return self._not_modified(etag)
+            
             tweet = self.db.get_by_id(tweet_id)
             if tweet:
-                return jsonify(self._process_tweet(tweet))
+                return self._cacheable_json(self._process_tweets([tweet], version)[0], etag)
             return jsonify({'error': 'Tweet not found'}), 404
         
+        @self.app.route('/api/tweet/<tweet_id>/raw')
+        def get_tweet_raw(tweet_id):
+            """获取单条推文的原始 JSON API（列表接口不再附带，由前端在查看时按需请求）"""
+            if tweet_id in self._get_deleted_ids():
+                return jsonify({'error': 'Tweet not found'}), 404
+            
+            etag = self._api_etag()
+            if request.if_none_match.contains_weak(etag):
+                return self._not_modified(etag)
+            
+            tweet = self.db.get_by_id(tweet_id)
+            if not tweet:
+                return jsonify({'error': 'Tweet not found'}), 404
+            response = Response(self._format_raw(tweet), mimetype='application/json')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
         @self.app.route('/api/tweet/<tweet_id>', methods=['DELETE'])
         def delete_tweet(tweet_id):
             """删除推文 API"""
@@ -251,7 +553,7 @@ class WebServer:
             # 如果需要删除媒体文件，先获取媒体文件路径
             media_files_to_delete = []
             if delete_media:
-                processed = self._process_tweet(tweet)
+                processed = self._process_tweets([tweet])[0]
                 media_files_to_delete = processed.get('media_paths', [])
             
             try:
@@ -281,14 +583,13 @@ class WebServer:
                             if os.path.exists(file_path):
                                 os.remove(file_path)
                                 deleted_media_count += 1
-                                # 从媒体缓存中移除
-                                if self._media_cache:
-                                    base_name = os.path.splitext(os.path.basename(file_path))[0]
-                                    if base_name in self._media_cache:
-                                        del self._media_cache[base_name]
                         except Exception as e:
                             # 媒体文件删除失败不影响整体结果，只记录日志
                             print(f"删除媒体文件失败: {file_path}, 错误: {e}")
+                    # 从媒体索引中移除
+                    self.db.remove_media_files(
+                        [file_path for file_path in media_files_to_delete if not os.path.exists(file_path)]
+                    )
                 
                 return jsonify({
                     'success': True, 
@@ -315,7 +616,7 @@ class WebServer:
                 return jsonify({'error': 'Tweet not found'}), 404
             
             # 获取推文在非搜索模式下的位置
-            position = self.db.get_tweet_position(tweet_id, exclude_ids=deleted_ids)
+            position = self.db.get_tweet_position(tweet_id, exclude_deleted=True)
             if position < 0:
                 return jsonify({'error': 'Tweet not found'}), 404
             
@@ -360,6 +661,9 @@ class WebServer:
                 # 3. 清除 full_text 中的引用链接（可选，通常以 https://t.co/xxx 结尾）
                 # 这里不做处理，保留原文本
                 
+                # 清理临时字段（doc_id、_created_at_ts 等）后再写回
+                tweet = {k: v for k, v in tweet.items() if not k.startswith('_') and k != 'doc_id'}
+                
                 # 更新数据库
                 success = self.db.update(tweet_id, tweet)
                 
@@ -388,16 +692,41 @@ class WebServer:
             # 获取文件名（不带路径和扩展名）
             base_name = os.path.splitext(os.path.basename(safe_path))[0]
             
-            # 递归搜索媒体目录
-            found_file = self._find_media_file(base_name)
+            # 从媒体索引中查找
+            found_file = self.db.find_media_file(base_name)
             if found_file:
                 # 返回找到的文件
                 file_dir = os.path.dirname(found_file)
                 file_name = os.path.basename(found_file)
-                return send_from_directory(file_dir, file_name)
+                # 媒体内容由标识符唯一确定，不会变化，允许浏览器长期缓存且无需重新验证
+                response = send_from_directory(file_dir, file_name, max_age=self.MEDIA_MAX_AGE)
+                response.headers['Cache-Control'] = f'public, max-age={self.MEDIA_MAX_AGE}, immutable'
+                return response
             
             abort(404)
         
+        @self.app.route('/thumb/<identifier>')
+        def serve_thumbnail(identifier):
+            """提供图片缩略图服务（?w= 指定宽度；没有可用的缩略图时返回原图，不允许长期缓存）"""
+            if not self.media_path or not os.path.exists(self.media_path):
+                abort(404)
+            
+            found_file = self.db.find_media_file(identifier)
+            if not found_file:
+                abort(404)
+            
+            # 缩略图由线程池生成并缓存在磁盘上，请求只短暂等待；还没有缩略图时先返回原图，
+            # 并禁止浏览器长期缓存，以便之后换成生成好的缩略图
+            thumb_path = self.thumbnails.get(found_file, request.args.get('w', None, type=int))
+            if thumb_path is None:
+                response = send_from_directory(os.path.dirname(found_file), os.path.basename(found_file))
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            response = send_from_directory(os.path.dirname(thumb_path), os.path.basename(thumb_path),
+                                           max_age=self.MEDIA_MAX_AGE)
+            response.headers['Cache-Control'] = f'public, max-age={self.MEDIA_MAX_AGE}, immutable'
+            return response
+        
         @self.app.route('/profile/<user_id>')
         def serve_profile_image(user_id):
             """提供本地头像服务"""
@@ -410,7 +739,8 @@ class WebServer:
                 file_path = self._profile_cache[user_id]
                 file_dir = os.path.dirname(file_path)
                 file_name = os.path.basename(file_path)
-                return send_from_directory(file_dir, file_name)
+                # 头像可能被重新下载，缓存时间较短，过期后通过 ETag/Last-Modified 重新验证
+                return send_from_directory(file_dir, file_name, max_age=self.PROFILE_MAX_AGE)
             
             # 未找到，返回 404 让前端处理回退逻辑
             # 这样在混合模式下，前端的 onerror 事件会被触发，可以回退到 Twitter CDN
@@ -433,18 +763,25 @@ class WebServer:
             
             file_path = os.path.join(res_path, safe_path)
             if os.path.exists(file_path):
-                return send_from_directory(res_path, safe_path)
+                return send_from_directory(res_path, safe_path, max_age=self.RES_MAX_AGE)
             
             abort(404)
         
+        @self.app.route('/api/cache_stats')
+        def get_cache_stats():
+            """获取处理后推文缓存的命中统计 API"""
+            return jsonify(self.get_tweet_cache_stats())
+        
         @self.app.route('/api/reload', methods=['POST'])
         def reload_server():
-            """重载服务器（刷新媒体缓存）API"""
+            """重载服务器（刷新媒体索引）API"""
             try:
-                # 刷新媒体缓存
-                self.refresh_media_cache()
+                # 增量扫描媒体目录
+                self.refresh_media_index()
                 # 刷新头像缓存
                 self._build_profile_cache()
+                # 媒体路径可能变化，清空处理后的推文缓存
+                self._clear_tweet_cache()
                 return jsonify({
                     'success': True,
                     'message': 'Server reloaded successfully'
@@ -455,137 +792,166 @@ class WebServer:
                     'error': str(e)
                 }), 500
     
-    def _has_undownloaded_media(self, tweet: dict) -> bool:
+    def _encode_cursor(self, direction: str, tweet: dict) -> str:
         """
-        检查推文是否包含未下载的媒体（包括引用推文中的媒体）
+        生成不透明的分页游标
         
         Args:
-            tweet: 原始推文数据
+            direction: 'b' 表示取该位置之后的记录（向后翻页），'a' 表示取之前的记录（向前翻页）
+            tweet: 定位用的推文记录（使用其 doc_id 和发推时间）
             
         Returns:
-            如果有任何媒体未下载返回 True，否则返回 False
+            游标字符串
         """
-        # 确保媒体缓存已构建
-        if self._media_cache is None:
-            self._build_media_cache()
-        
-        # 检查主推文的媒体
-        media_list = tweet.get('media', [])
-        for media in media_list:
-            media_type = media.get('type')
-            if media_type == 'photo':
-                url = media.get('original', '')
-                # 提取图片标识符
-                match = re.search(r"media/([A-Za-z0-9_-]+)\?format=", url)
-                if match:
-                    identifier = match.group(1)
-                    # 检查是否已下载
-                    if not self._media_cache or identifier not in self._media_cache:
-                        return True
-            elif media_type == 'video':
-                url = media.get('original', '')
-                # 提取视频标识符
-                match = re.search(r"vid/[a-zA-Z0-9_/-]+/([A-Za-z0-9_-]+)\.mp4", url)
-                if match:
-                    identifier = match.group(1)
-                    # 检查是否已下载
-                    if not self._media_cache or identifier not in self._media_cache:
-                        return True
-        
-        # 检查引用推文的媒体
-        metadata = tweet.get('metadata', {})
-        quoted_result = metadata.get('quoted_status_result', {}).get('result', {})
-        if quoted_result:
-            quoted_legacy = quoted_result.get('legacy', {})
-            if quoted_legacy:
-                # 优先使用 extended_entities，没有则使用 entities
-                entities = quoted_legacy.get('extended_entities', quoted_legacy.get('entities', {}))
-                quoted_media_list = entities.get('media', [])
-                
-                for media in quoted_media_list:
-                    media_type = media.get('type')
-                    if media_type == 'photo':
-                        media_url = media.get('media_url_https', '')
-                        if media_url:
-                            # 提取图片标识符
-                            match = re.search(r"/media/([A-Za-z0-9_-]+)\.", media_url)
-                            if match:
-                                identifier = match.group(1)
-                                # 检查是否已下载
-                                if not self._media_cache or identifier not in self._media_cache:
-                                    return True
-                    elif media_type == 'video':
-                        # 视频需要从 video_info 中获取
-                        video_info = media.get('video_info', {})
-                        variants = video_info.get('variants', [])
-                        mp4_variants = [v for v in variants if v.get('content_type') == 'video/mp4']
-                        if mp4_variants:
-                            best_variant = max(mp4_variants, key=lambda x: x.get('bitrate', 0))
-                            url = best_variant.get('url', '')
-                            match = re.search(r"vid/[a-zA-Z0-9_/-]+/([A-Za-z0-9_-]+)\.mp4", url)
-                            if match:
-                                identifier = match.group(1)
-                                # 检查是否已下载
-                                if not self._media_cache or identifier not in self._media_cache:
-                                    return True
-        
-        return False
+        raw = f"{direction}:{tweet['doc_id']}:{tweet.get('_created_at_ts', 0)}".encode('ascii')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    def _decode_cursor(self, cursor: str) -> tuple:
+        """
+        解析分页游标
+        
+        Args:
+            cursor: 游标字符串，空字符串表示第一页
+            
+        Returns:
+            (方向, doc_id, 发推时间)，第一页返回 (None, None, None)；旧格式游标的发推时间为 None
+            
+        Raises:
+            ValueError: 游标格式无效
+        """
+        if not cursor:
+            return None, None, None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            parts = base64.urlsafe_b64decode(padded).decode('ascii').split(':')
+            direction, doc_id = parts[0], int(parts[1])
+            cursor_ts = int(parts[2]) if len(parts) == 3 else None
+        except Exception:
+            raise ValueError('Invalid cursor')
+        if direction not in ('a', 'b') or len(parts) > 3:
+            raise ValueError('Invalid cursor')
+        for value in (doc_id, cursor_ts):
+            if value is not None and not SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+                raise ValueError('Invalid cursor')
+        return direction, doc_id, cursor_ts
+    
+    def _api_etag(self, version: int = None) -> str:
+        """
+        生成 API 响应的 ETag（主库或删除库的任何写入都会使其变化）
+        
+        Args:
+            version: 主库的数据版本号，为 None 时读取当前值
+            
+        Returns:
+            ETag 值（不含引号）
+        """
+        if version is None:
+            version = self.db.data_version
+        deleted_version = self.deleted_db.data_version if self.deleted_db else 0
+        # 响应中包含 allow_delete，设置变化后也需要重新获取
+        return f'{self._etag_prefix}-{version}-{deleted_version}-{int(self.allow_delete)}'
     
-    def _find_media_file(self, base_name: str) -> str:
+    def _not_modified(self, etag: str) -> Response:
+        """返回 304 响应"""
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    def _cacheable_json(self, data, etag: str) -> Response:
+        """返回带 ETag 的 JSON 响应（no-cache：浏览器可以缓存，但每次使用前需要用 If-None-Match 重新验证）"""
+        response = jsonify(data)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    def _parse_fields(self, value: str) -> set:
         """
-        在媒体目录中递归搜索文件
+        解析 fields 参数
         
         Args:
-            base_name: 文件名（不含扩展名）
+            value: 逗号分隔的字段名，如 id,full_text,photos
             
         Returns:
-            找到的文件完整路径，如果没找到返回 None
+            字段名集合，参数为空时返回 None（返回全部字段）
+        """
+        if not value:
+            return None
+        return {field.strip() for field in value.split(',') if field.strip()}
+    
+    def _select_fields(self, tweets: list, processed: list, fields: set) -> list:
         """
-        # 使用缓存提高性能
-        # 如果缓存不存在或为空，重新构建
-        if self._media_cache is None:
-            self._build_media_cache()
+        按 fields 参数裁剪处理后的推文数据（返回新字典，不修改缓存中的数据）
         
-        # 从缓存中查找
-        if self._media_cache and base_name in self._media_cache:
-            return self._media_cache[base_name]
+        Args:
+            tweets: 原始推文数据列表
+            processed: 处理后的推文数据列表
+            fields: 要返回的字段，为 None 时返回全部字段；
+                    包含 raw 时附带格式化后的原始 JSON（推荐改用 /api/tweet/<id>/raw 按需获取）
+            
+        Returns:
+            裁剪后的推文数据列表
+        """
+        if fields is None:
+            return processed
+        fields = fields | {'id', 'doc_id'}
+        result = []
+        for tweet, item in zip(tweets, processed):
+            selected = {key: value for key, value in item.items() if key in fields}
+            if 'raw' in fields:
+                selected['raw'] = self._format_raw(tweet)
+            result.append(selected)
+        return result
+    
+    def _format_raw(self, tweet: dict) -> str:
+        """将原始推文数据格式化为便于阅读的 JSON（去掉下划线开头的临时字段）"""
+        return json.dumps({k: v for k, v in tweet.items() if not k.startswith('_')}, ensure_ascii=False, indent=2)
+    
+    def _parse_date_param(self, value: str, end_of_day: bool = False) -> int:
+        """
+        解析日期范围参数
         
-        return None
+        Args:
+            value: 毫秒时间戳，或 YYYY-MM-DD 格式的日期（按服务器本地时区）
+            end_of_day: 日期格式时是否取当天的最后一毫秒（用于范围上限）
+            
+        Returns:
+            毫秒时间戳，参数为空时返回 None
+            
+        Raises:
+            ValueError: 参数格式无效
+        """
+        if not value:
+            return None
+        if value.isdigit():
+            timestamp = int(value)
+        else:
+            day = datetime.strptime(value, '%Y-%m-%d')
+            try:
+                if end_of_day:
+                    timestamp = int((day + timedelta(days=1)).timestamp() * 1000) - 1
+                else:
+                    timestamp = int(day.timestamp() * 1000)
+            except (OverflowError, OSError):
+                # 日期处于 datetime 可表示范围的边缘（如 9999-12-31 的次日、本地时区无法换算的 0001-01-01）
+                raise ValueError(f'Invalid date: {value}')
+        if not SQLITE_INT_MIN <= timestamp <= SQLITE_INT_MAX:
+            raise ValueError(f'Date out of range: {value}')
+        return timestamp
     
-    def _build_media_cache(self):
-        """构建媒体文件缓存"""
+    def refresh_media_index(self):
+        """增量扫描媒体目录，更新数据库中的本地媒体文件索引"""
         global _cache_ready, _cache_building
         _cache_building = True
         _cache_ready = False
         
-        # 强制重新构建缓存，清空旧缓存
-        self._media_cache = {}
-        extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp4', '.webm', '.mov'}
-        
-        if not self.media_path or not os.path.exists(self.media_path):
+        try:
+            self.db.scan_media_files(self.media_path)
+        except Exception as e:
+            print(f"扫描媒体目录失败: {e}")
+        finally:
             _cache_building = False
             _cache_ready = True
-            return
-        
-        # 递归遍历媒体目录
-        for root, dirs, files in os.walk(self.media_path):
-            for file in files:
-                ext = os.path.splitext(file)[1].lower()
-                if ext in extensions:
-                    base_name = os.path.splitext(file)[0]
-                    full_path = os.path.join(root, file)
-                    # 如果同名文件已存在，优先保留已有的
-                    if base_name not in self._media_cache:
-                        self._media_cache[base_name] = full_path
-        
-        _cache_building = False
-        _cache_ready = True
-    
-    def refresh_media_cache(self):
-        """刷新媒体文件缓存"""
-        if hasattr(self, '_media_cache'):
-            del self._media_cache
-        self._build_media_cache()
     
     def _build_profile_cache(self):
         """构建头像文件缓存"""
@@ -608,29 +974,57 @@ class WebServer:
         """
         获取已删除的推文ID集合（带缓存）
         
+        删除库的 data_version 未变化时直接返回缓存；只新增了记录时按 doc_id 增量合并，
+        有记录被移除（remove_version 变化）时才完整重新加载
+        
         Returns:
             已删除推文ID的集合
         """
         with self._cache_lock:
-            current_time = time.time()
-            # 如果缓存有效，直接返回
-            if self._deleted_ids_cache is not None and (current_time - self._cache_timestamp) < self._cache_ttl:
+            if not self.deleted_db:
+                return set()
+            
+            # 先读版本号再查询：查询期间发生的写入会让下次调用看到新的版本号并再次同步
+            version = self.deleted_db.data_version
+            if self._deleted_ids_cache is not None and version == self._deleted_ids_version:
                 return self._deleted_ids_cache
             
-            # 重新加载缓存
-            if self.deleted_db:
-                self._deleted_ids_cache = self.deleted_db.get_all_ids()
+            remove_version = self.deleted_db.remove_version
+            if self._deleted_ids_cache is None or remove_version != self._deleted_ids_remove_version:
+                self._deleted_ids_cache, self._deleted_ids_last_doc_id = self.deleted_db.get_ids_after(0)
             else:
-                self._deleted_ids_cache = set()
+                new_ids, self._deleted_ids_last_doc_id = self.deleted_db.get_ids_after(self._deleted_ids_last_doc_id)
+                self._deleted_ids_cache |= new_ids
             
-            self._cache_timestamp = current_time
+            self._deleted_ids_version = version
+            self._deleted_ids_remove_version = remove_version
             return self._deleted_ids_cache
     
     def _invalidate_cache(self):
-        """使缓存失效"""
-        with self._cache_lock:
-            self._deleted_ids_cache = None
-            self._cache_timestamp = 0
+        """使缓存失效（已删除推文 ID 缓存按删除库的数据版本自动刷新，这里只需清空推文缓存）"""
+        self._clear_tweet_cache()
+    
+    def _clear_tweet_cache(self):
+        """清空处理后的推文缓存"""
+        with self._tweet_cache_lock:
+            self._tweet_cache.clear()
+    
+    def get_tweet_cache_stats(self) -> dict:
+        """
+        获取处理后推文缓存的统计信息
+        
+        Returns:
+            {'size': 条目数, 'max_size': 最大条目数, 'hits': 命中次数, 'misses': 未命中次数, 'hit_rate': 命中率}
+        """
+        with self._tweet_cache_lock:
+            total = self._tweet_cache_hits + self._tweet_cache_misses
+            return {
+                'size': len(self._tweet_cache),
+                'max_size': self.TWEET_CACHE_SIZE,
+                'hits': self._tweet_cache_hits,
+                'misses': self._tweet_cache_misses,
+                'hit_rate': self._tweet_cache_hits / total if total else 0.0
+            }
     
     def get_allow_delete(self) -> bool:
         """获取是否允许删除的状态"""
@@ -652,105 +1046,52 @@ class WebServer:
         # 例如: abc_normal.jpg -> abc.jpg
         return re.sub(r'_normal(\.[a-zA-Z]+)$', r'\1', url)
     
-    def _parse_twitter_date(self, date_str: str) -> int:
+    def _build_media_entries(self, media_rows: list) -> tuple:
         """
-        解析日期字符串并转换为毫秒时间戳
+        将媒体记录转换为前端使用的图片、视频列表
         
         Args:
-            date_str: 日期字符串，支持以下格式：
-                - "2023-06-20 21:20:39 +08:00" （数据库存储格式）
-                - "Sun Jun 09 21:43:26 +0000 2024" （Twitter 原始格式）
-            
-        Returns:
-            毫秒时间戳，解析失败返回 0
-        """
-        if not date_str:
-            return 0
-        
-        # 尝试多种日期格式
-        formats = [
-            "%Y-%m-%d %H:%M:%S %z",      # 数据库格式: "2023-06-20 21:20:39 +08:00"
-            "%a %b %d %H:%M:%S %z %Y",   # Twitter 格式: "Sun Jun 09 21:43:26 +0000 2024"
-        ]
-        
-        for fmt in formats:
-            try:
-                dt = datetime.strptime(date_str, fmt)
-                return int(dt.timestamp() * 1000)
-            except ValueError:
-                continue
-        
-        return 0
-    
-    def _extract_media_from_legacy(self, legacy: dict) -> tuple:
-        """
-        从 legacy 数据中提取媒体信息
-        
-        Args:
-            legacy: legacy 数据字典
+            media_rows: 媒体记录列表（来自 tweet_media 表）
             
         Returns:
             (photos, videos, media_paths) 元组
         """
         photos = []
         videos = []
-        media_paths = []
-        
-        # 优先使用 extended_entities，没有则使用 entities
-        entities = legacy.get('extended_entities', legacy.get('entities', {}))
-        media_list = entities.get('media', [])
-        
-        for media in media_list:
-            media_type = media.get('type')
-            if media_type == 'photo':
-                # 构造原图 URL
-                media_url = media.get('media_url_https', '')
-                if media_url:
-                    # 转换为原图 URL 格式
-                    url = f"{media_url}?format=jpg&name=orig"
-                    # 提取图片标识符
-                    match = re.search(r"/media/([A-Za-z0-9_-]+)\.", media_url)
-                    if match:
-                        identifier = match.group(1)
-                        photos.append({
-                            'id': identifier,
-                            'original_url': url,
-                            'local_url': f'/media/{identifier}'
-                        })
-                        # 获取媒体文件完整路径
-                        if self._media_cache and identifier in self._media_cache:
-                            media_paths.append(self._media_cache[identifier])
-            elif media_type == 'video':
-                # 视频需要从 video_info 中获取最高质量的 URL
-                video_info = media.get('video_info', {})
-                variants = video_info.get('variants', [])
-                # 过滤出 mp4 格式并按比特率排序
-                mp4_variants = [v for v in variants if v.get('content_type') == 'video/mp4']
-                if mp4_variants:
-                    # 选择比特率最高的
-                    best_variant = max(mp4_variants, key=lambda x: x.get('bitrate', 0))
-                    url = best_variant.get('url', '')
-                    # 提取视频标识符
-                    match = re.search(r"vid/[a-zA-Z0-9_/-]+/([A-Za-z0-9_-]+)\.mp4", url)
-                    if match:
-                        identifier = match.group(1)
-                        videos.append({
-                            'id': identifier,
-                            'original_url': url,
-                            'local_url': f'/media/{identifier}.mp4'
-                        })
-                        # 获取媒体文件完整路径
-                        if self._media_cache and identifier in self._media_cache:
-                            media_paths.append(self._media_cache[identifier])
+        media_paths = []  # 媒体文件完整路径列表
+        
+        for media in media_rows:
+            identifier = media['identifier']
+            if not identifier:
+                continue
+            if media['type'] == 'photo':
+                photos.append({
+                    'id': identifier,
+                    'original_url': media['url'],
+                    'local_url': f'/media/{identifier}',
+                    'thumb_url': f'/thumb/{identifier}'
+                })
+            elif media['type'] == 'video':
+                videos.append({
+                    'id': identifier,
+                    'original_url': media['url'],
+                    'local_url': f'/media/{identifier}.mp4'
+                })
+            else:
+                continue
+            # 获取媒体文件完整路径
+            if media['path']:
+                media_paths.append(media['path'])
         
         return photos, videos, media_paths
     
-    def _extract_quoted_tweet(self, tweet: dict) -> dict:
+    def _extract_quoted_tweet(self, tweet: dict, media_rows: list) -> dict:
         """
         从推文中提取引用推文信息
         
         Args:
             tweet: 原始推文数据
+            media_rows: 引用推文的媒体记录
             
         Returns:
             引用推文信息字典，如果没有引用则返回 None
@@ -781,7 +1122,7 @@ class WebServer:
         legacy = quoted_result.get('legacy', {})
         
         # 提取原推文媒体
-        photos, videos, media_paths = self._extract_media_from_legacy(legacy)
+        photos, videos, media_paths = self._build_media_entries(media_rows)
         
         # 检查是否有嵌套引用（第二层只有ID）
         nested_quoted_id = None
@@ -811,77 +1152,96 @@ class WebServer:
             'nested_quoted_id': nested_quoted_id  # 嵌套引用的ID（如果有）
         }
     
-    def _process_tweet(self, tweet: dict) -> dict:
+    def _process_tweets(self, tweets: list, version: int = None) -> list:
+        """
+        批量处理推文数据（优先使用缓存，未命中的推文一次查询取出所有媒体记录）
+        
+        Args:
+            tweets: 原始推文数据列表
+            version: 读取这些推文之前的数据版本号（db.data_version），为 None 时不使用缓存
+            
+        Returns:
+            处理后的推文数据列表
+        """
+        results = [None] * len(tweets)
+        missing = list(range(len(tweets)))
+        if version is not None:
+            with self._tweet_cache_lock:
+                # 数据版本变化后旧的缓存全部作废；比缓存旧的版本读到的数据不使用缓存
+                if version > self._tweet_cache_version:
+                    self._tweet_cache.clear()
+                    self._tweet_cache_version = version
+                if version == self._tweet_cache_version:
+                    missing = []
+                    for i, tweet in enumerate(tweets):
+                        cached = self._tweet_cache.get(tweet['doc_id'])
+                        if cached is None:
+                            missing.append(i)
+                        else:
+                            self._tweet_cache.move_to_end(tweet['doc_id'])
+                            results[i] = cached
+                self._tweet_cache_hits += len(tweets) - len(missing)
+                self._tweet_cache_misses += len(missing)
+        if not missing:
+            return results
+        
+        missed = [tweets[i] for i in missing]
+        media_map = self.db.get_media([tweet['doc_id'] for tweet in missed])
+        # 从用户表取作者的最新头像（一次索引查询），旧推文中保存的头像地址可能已失效
+        user_ids = {extract_user_id(tweet) for tweet in missed}
+        users = {user['user_id']: user for user in self.db.get_users([user_id for user_id in user_ids if user_id])}
+        for i, tweet in zip(missing, missed):
+            results[i] = self._process_tweet(tweet, media_map.get(tweet['doc_id'], []), users.get(extract_user_id(tweet)))
+        
+        if version is not None:
+            with self._tweet_cache_lock:
+                if version == self._tweet_cache_version:
+                    for i in missing:
+                        self._tweet_cache[tweets[i]['doc_id']] = results[i]
+                    while len(self._tweet_cache) > self.TWEET_CACHE_SIZE:
+                        self._tweet_cache.popitem(last=False)
+        return results
+    
+    def _process_tweet(self, tweet: dict, media_rows: list, user: dict = None) -> dict:
         """
         处理推文数据，提取关键信息
         
         Args:
             tweet: 原始推文数据
+            media_rows: 推文的媒体记录（来自 tweet_media 表）
+            user: 作者在用户表中的记录
             
         Returns:
             处理后的推文数据
         """
         # 提取媒体信息
-        media_list = tweet.get('media', [])
-        photos = []
-        videos = []
-        media_paths = []  # 媒体文件完整路径列表
-        
-        for media in media_list:
-            media_type = media.get('type')
-            if media_type == 'photo':
-                url = media.get('original', '')
-                # 提取图片标识符
-                match = re.search(r"media/([A-Za-z0-9_-]+)\?format=", url)
-                if match:
-                    identifier = match.group(1)
-                    photos.append({
-                        'id': identifier,
-                        'original_url': url,
-                        'local_url': f'/media/{identifier}'
-                    })
-                    # 获取媒体文件完整路径
-                    if self._media_cache and identifier in self._media_cache:
-                        media_paths.append(self._media_cache[identifier])
-            elif media_type == 'video':
-                url = media.get('original', '')
-                # 提取视频标识符
-                match = re.search(r"vid/[a-zA-Z0-9_/-]+/([A-Za-z0-9_-]+)\.mp4", url)
-                if match:
-                    identifier = match.group(1)
-                    videos.append({
-                        'id': identifier,
-                        'original_url': url,
-                        'local_url': f'/media/{identifier}.mp4'
-                    })
-                    # 获取媒体文件完整路径
-                    if self._media_cache and identifier in self._media_cache:
-                        media_paths.append(self._media_cache[identifier])
+        photos, videos, media_paths = self._build_media_entries(
+            [media for media in media_rows if not media['from_quote']]
+        )
         
         # 提取引用推文信息
-        quoted_tweet = self._extract_quoted_tweet(tweet)
+        quoted_tweet = self._extract_quoted_tweet(
+            tweet, [media for media in media_rows if media['from_quote']]
+        )
         
         # 如果有引用推文，将其媒体路径也加入到 media_paths 中
         if quoted_tweet and quoted_tweet.get('has_full_data'):
             media_paths.extend(quoted_tweet.get('media_paths', []))
         
         # 获取用户 ID（用于本地头像）
-        user_id = tweet.get('user_id', '')
-        if not user_id:
-            # 尝试从 metadata 中获取
-            metadata = tweet.get('metadata', {})
-            user_result = metadata.get('user_results', {}).get('result', {})
-            user_id = user_result.get('rest_id', '')
+        user_id = extract_user_id(tweet)
+        profile_image_url = (user and user['profile_image_url']) or tweet.get('profile_image_url', '')
         
         result = {
             'id': tweet.get('id', ''),
             'doc_id': tweet.get('doc_id', ''),
-            'created_at_ts': self._parse_twitter_date(tweet.get('created_at', '')),
+            'created_at_ts': tweet['_created_at_ts'] if '_created_at_ts' in tweet
+                             else parse_twitter_date(tweet.get('created_at', '')),
             'full_text': tweet.get('full_text', ''),
             'name': tweet.get('name', ''),
             'screen_name': tweet.get('screen_name', ''),
             'user_id': user_id,
-            'profile_image_url': self._get_full_profile_image_url(tweet.get('profile_image_url', '')),
+            'profile_image_url': self._get_full_profile_image_url(profile_image_url),
             'views_count': tweet.get('views_count', 0),
             'favorite_count': tweet.get('favorite_count', 0),
             'retweet_count': tweet.get('retweet_count', 0),
@@ -890,8 +1250,7 @@ class WebServer:
             'photos': photos,
             'videos': videos,
             'media_count': len(photos) + len(videos),
-            'media_paths': media_paths,
-            'raw': json.dumps(tweet, ensure_ascii=False, indent=2)
+            'media_paths': media_paths
         }
         
         # 添加引用推文信息
@@ -955,10 +1314,11 @@ class WebServer:
         """启动服务器"""
         global _http_server
         
-        # 禁用 Flask 的日志输出
+        # 禁用 Flask 和 waitress 的日志输出
         import logging
         log = logging.getLogger('werkzeug')
         log.setLevel(logging.ERROR)
+        logging.getLogger('waitress').setLevel(logging.ERROR)
         
         # 修复 Windows 上 socket.getfqdn() 导致的启动慢问题
         # werkzeug 的 make_server 内部会调用 getfqdn() 进行 DNS 反向解析，
@@ -968,16 +1328,16 @@ class WebServer:
         socket.getfqdn = lambda name='': socket.gethostname()
         
         try:
-            # 在启动 Flask 前，用另一个线程异步构建媒体缓存
-            cache_thread = threading.Thread(target=self._build_media_cache, daemon=True)
+            # 在启动 Flask 前，用另一个线程异步扫描媒体目录（只读取有变化的目录）
+            cache_thread = threading.Thread(target=self.refresh_media_index, daemon=True)
             cache_thread.start()
             
             # 同时构建头像缓存
             profile_cache_thread = threading.Thread(target=self._build_profile_cache, daemon=True)
             profile_cache_thread.start()
             
-            # 使用 make_server 创建可关闭的服务器
-            _http_server = make_server(self.host, self.port, self.app, threaded=True)
+            # 按配置创建可关闭的服务后端
+            _http_server = create_server_backend(self.app, self.host, self.port, self.backend, self.threads)
         finally:
             # 恢复原始函数
             socket.getfqdn = _original_getfqdn
@@ -989,9 +1349,12 @@ class WebServer:
         global _http_server
         if _http_server:
             _http_server.shutdown()
+        if self.deleted_db:
+            self.db.attach_deleted_db(None)
 
 
-def start_web_server(db: TweetDatabase, media_path: str, port: int = 5001, deleted_db: TweetDatabase = None, allow_delete: bool = False) -> tuple:
+def start_web_server(db: TweetDatabase, media_path: str, port: int = 5001, deleted_db: TweetDatabase = None, allow_delete: bool = False,
+                     backend: str = 'auto', threads: int = 8) -> tuple:
     """
     启动 Web 服务器
     
@@ -1001,6 +1364,8 @@ def start_web_server(db: TweetDatabase, media_path: str, port: int = 5001, delet
         port: 监听端口
         deleted_db: 删除库实例，用于过滤已删除的推文
         allow_delete: 是否允许远程删除推文
+        backend: 服务后端（auto、waitress 或 werkzeug，见 [webserver] backend 配置）
+        threads: 工作线程数（见 [webserver] threads 配置）
         
     Returns:
         (成功, 错误信息或访问URL)
@@ -1011,7 +1376,8 @@ def start_web_server(db: TweetDatabase, media_path: str, port: int = 5001, delet
         return False, "服务器已在运行"
     
     try:
-        _web_server = WebServer(db, media_path, port=port, deleted_db=deleted_db, allow_delete=allow_delete)
+        _web_server = WebServer(db, media_path, port=port, deleted_db=deleted_db, allow_delete=allow_delete,
+                                backend=backend, threads=threads)
         local_ip = _web_server.get_local_ip()
         
         _server_thread = threading.Thread(target=_web_server.run, daemon=True)
@@ -1030,12 +1396,11 @@ def stop_web_server():
     if not _is_running:
         return
     
-    # 关闭 HTTP 服务器
+    # 关闭 HTTP 服务器，并等待服务线程退出（端口释放后才能立即重新启动）
     if _web_server:
         _web_server.shutdown()
-        # 清理媒体缓存，确保下次启动时重新构建
-        if hasattr(_web_server, '_media_cache'):
-            _web_server._media_cache = None
+    if _server_thread:
+        _server_thread.join(timeout=5)
     
     # 重置状态
     _is_running = False
@@ -1068,10 +1433,10 @@ def set_allow_delete(allow: bool):
 
 
 def is_cache_ready() -> bool:
-    """检查媒体缓存是否已构建完成"""
+    """检查媒体索引是否已扫描完成"""
     return _cache_ready
 
 
 def is_cache_building() -> bool:
-    """检查媒体缓存是否正在构建"""
+    """检查媒体索引是否正在扫描"""
     return _cache_building
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+pytest 公共配置与 fixture
+
+在仓库根目录运行：python -m pytest tests
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# 程序以 src 为工作目录运行，模块之间直接按文件名导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from fake_aria2 import FakeAria2  # noqa: E402
+
+
+def wait_until(predicate, timeout: float = 5.0, interval: float = 0.01) -> bool:
+    """轮询直到 predicate() 为真或超时，返回最后一次的结果"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return bool(predicate())
+
+
+@pytest.fixture
+def fake_aria2():
+    """接受 WebSocket 连接的模拟 aria2 RPC 服务"""
+    server = FakeAria2()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_aria2_without_websocket():
+    """拒绝 WebSocket 连接的模拟 aria2 RPC 服务（通知不可用）"""
+    server = FakeAria2(websocket_enabled=False)
+    yield server
+    server.stop()
+
+
+def connect_manager(server: FakeAria2):
+    """创建连接到模拟服务的 Aria2Manager（不启动 aria2c 进程），并启动通知监听"""
+    import aria2p
+    from downloader import Aria2Manager
+
+    manager = Aria2Manager()
+    manager.port = server.port
+    manager.api = aria2p.API(aria2p.Client(host='http://127.0.0.1', port=server.port))
+    manager.start_notification_listener()
+    return manager
+
+
+@pytest.fixture
+def aria2_manager(fake_aria2, tmp_path, monkeypatch):
+    """连接到 fake_aria2 的 Aria2Manager"""
+    # 配置文件从工作目录读取，避免读到开发者本地的配置
+    monkeypatch.chdir(tmp_path)
+    manager = connect_manager(fake_aria2)
+    yield manager
+    manager.stop()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+测试用的 aria2 RPC 服务
+
+在本地端口上模拟 aria2c 的 /jsonrpc：
+- HTTP POST：JSON-RPC 调用（addUri、tellStatus、tellActive、tellWaiting、tellStopped、system.multicall 等）
+- WebSocket：连接后由测试调用 complete / fail 等方法推送 aria2.onDownloadXxx 通知
+
+任务状态只在测试调用相应方法时变化，不会自动开始或完成
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class FakeAria2:
+    """模拟 aria2c RPC 服务，port 为监听端口（stop 后不再可用）"""
+
+    def __init__(self, websocket_enabled: bool = True):
+        """
+        Args:
+            websocket_enabled: 是否接受 WebSocket 连接（为 False 时握手返回 404，模拟通知不可用）
+        """
+        self.websocket_enabled = websocket_enabled
+        self.tasks = {}  # gid -> 状态字典（aria2 字段名，数值为字符串）
+        self.calls = []  # 收到的 RPC 方法名（system.multicall 展开为其中的各个方法）
+        self.websocket_connections = 0  # 累计接受的 WebSocket 连接数
+        self._websockets = []  # 当前连接的 WebSocket 处理器
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """断开所有连接并停止服务"""
+        self.drop_websockets()
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ---- 测试用的控制方法 ----
+
+    def add_task(self, file_name: str = '') -> str:
+        """直接添加一个等待中的任务，返回 gid"""
+        with self._lock:
+            return self._add_task(file_name)
+
+    def start(self, gid: str, notify: bool = True):
+        """任务开始下载"""
+        self._set_status(gid, 'active', 'aria2.onDownloadStart' if notify else None)
+
+    def complete(self, gid: str, notify: bool = True):
+        """任务下载完成"""
+        self._set_status(gid, 'complete', 'aria2.onDownloadComplete' if notify else None)
+
+    def fail(self, gid: str, message: str = 'download failed', notify: bool = True):
+        """任务下载失败"""
+        self._set_status(gid, 'error', 'aria2.onDownloadError' if notify else None, message)
+
+    def connected_websockets(self) -> int:
+        """当前连接的 WebSocket 数"""
+        with self._lock:
+            return len(self._websockets)
+
+    def drop_websockets(self):
+        """直接关闭所有 WebSocket 连接的套接字（模拟连接意外断开）"""
+        with self._lock:
+            handlers, self._websockets = self._websockets, []
+        for handler in handlers:
+            handler.drop()
+
+    def reset_calls(self):
+        """清空已记录的 RPC 调用"""
+        with self._lock:
+            self.calls = []
+
+    # ---- RPC ----
+
+    def _add_task(self, file_name: str) -> str:
+        gid = '%016x' % next(self._ids)
+        self.tasks[gid] = {
+            'gid': gid,
+            'status': 'waiting',
+            'totalLength': '1000',
+            'completedLength': '0',
+            'downloadSpeed': '0',
+            'errorMessage': '',
+            'errorCode': '0',
+            'files': [{'index': '1', 'path': file_name, 'length': '1000', 'completedLength': '0',
+                       'selected': 'true', 'uris': []}],
+        }
+        return gid
+
+    def _set_status(self, gid: str, status: str, event: Optional[str], message: str = ''):
+        with self._lock:
+            task = self.tasks[gid]
+            task['status'] = status
+            if status == 'complete':
+                task['completedLength'] = task['totalLength']
+            elif status == 'error':
+                task['errorMessage'] = message
+                task['errorCode'] = '1'
+            handlers = list(self._websockets)
+        if event:
+            notification = json.dumps({'jsonrpc': '2.0', 'method': event, 'params': [{'gid': gid}]})
+            for handler in handlers:
+                handler.send_text(notification)
+
+    @staticmethod
+    def _project(task: Dict, keys: Optional[List[str]]) -> Dict:
+        return {k: v for k, v in task.items() if not keys or k in keys}
+
+    def _call(self, method: str, params: list):
+        # 去掉 aria2p 附带的 token 参数
+        params = [p for p in params if not (isinstance(p, str) and p.startswith('token:'))]
+        if method == 'system.multicall':
+            results = []
+            for call in params[0]:
+                try:
+                    results.append([self._call(call['methodName'], call.get('params', []))])
+                except Exception as e:
+                    results.append({'code': 1, 'message': str(e)})
+            return results
+
+        with self._lock:
+            self.calls.append(method)
+            if method == 'aria2.addUri':
+                options = params[1] if len(params) > 1 else {}
+                return self._add_task(options.get('out', ''))
+            if method == 'aria2.tellStatus':
+                if params[0] not in self.tasks:
+                    raise KeyError(f'GID {params[0]} is not found')
+                return self._project(self.tasks[params[0]], params[1] if len(params) > 1 else None)
+            if method == 'aria2.tellActive':
+                keys = params[0] if params else None
+                return [self._project(t, keys) for t in self.tasks.values() if t['status'] == 'active']
+            if method in ('aria2.tellWaiting', 'aria2.tellStopped'):
+                wanted = ('waiting', 'paused') if method == 'aria2.tellWaiting' else ('complete', 'error', 'removed')
+                offset, num = params[0], params[1]
+                keys = params[2] if len(params) > 2 else None
+                tasks = [t for t in self.tasks.values() if t['status'] in wanted][offset:offset + num]
+                return [self._project(t, keys) for t in tasks]
+            if method in ('aria2.getGlobalOption', 'aria2.changeGlobalOption'):
+                return {} if method == 'aria2.getGlobalOption' else 'OK'
+            if method == 'aria2.getVersion':
+                return {'version': '1.37.0', 'enabledFeatures': []}
+        raise ValueError(f'No such method: {method}')
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                response = {'jsonrpc': '2.0', 'id': request.get('id')}
+                try:
+                    response['result'] = fake._call(request['method'], request.get('params', []))
+                except Exception as e:
+                    response['error'] = {'code': 1, 'message': str(e)}
+                body = json.dumps(response).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                key = self.headers.get('Sec-WebSocket-Key')
+                if not fake.websocket_enabled or not key:
+                    self.send_error(404)
+                    return
+                accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+                self.send_response(101)
+                self.send_header('Upgrade', 'websocket')
+                self.send_header('Connection', 'Upgrade')
+                self.send_header('Sec-WebSocket-Accept', accept)
+                self.end_headers()
+                self.wfile.flush()
+
+                self._send_lock = threading.Lock()
+                with fake._lock:
+                    fake._websockets.append(self)
+                    fake.websocket_connections += 1
+                # 读到 EOF 或关闭帧为止（客户端发来的其他帧忽略）
+                try:
+                    while True:
+                        header = self.rfile.read(2)
+                        if len(header) < 2 or header[0] & 0x0f == 0x8:
+                            break
+                        length = header[1] & 0x7f
+                        if length == 126:
+                            length = struct.unpack('>H', self.rfile.read(2))[0]
+                        elif length == 127:
+                            length = struct.unpack('>Q', self.rfile.read(8))[0]
+                        self.rfile.read(length + (4 if header[1] & 0x80 else 0))
+                except OSError:
+                    pass
+                with fake._lock:
+                    if self in fake._websockets:
+                        fake._websockets.remove(self)
+                self.close_connection = True
+
+            def send_text(self, text: str):
+                data = text.encode('utf-8')
+                if len(data) < 126:
+                    header = struct.pack('>BB', 0x81, len(data))
+                elif len(data) < 65536:
+                    header = struct.pack('>BBH', 0x81, 126, len(data))
+                else:
+                    header = struct.pack('>BBQ', 0x81, 127, len(data))
+                try:
+                    with self._send_lock:
+                        self.wfile.write(header + data)
+                        self.wfile.flush()
+                except OSError:
+                    pass
+
+            def drop(self):
+                try:
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        return Handler
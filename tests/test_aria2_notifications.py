@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""aria2 WebSocket 通知监听（Aria2Manager）与状态跟踪（Aria2StatusTracker）"""
+
+import queue
+
+from conftest import connect_manager, wait_until
+from downloader import Aria2StatusTracker
+
+FULL_POLL_METHODS = {'aria2.tellWaiting', 'aria2.tellStopped'}
+
+
+def collect_notifications(manager) -> queue.Queue:
+    """注册一个把 (事件名, gid) 放入队列的通知回调"""
+    events = queue.Queue()
+    manager.add_notification_callback(lambda event, gid: events.put((event, gid)))
+    return events
+
+
+def next_event(events: queue.Queue, event: str):
+    """取出下一个指定事件名的通知（跳过其他事件），5 秒内没有收到时抛出 queue.Empty"""
+    while True:
+        received = events.get(timeout=5)
+        if received[0] == event:
+            return received
+
+
+def test_complete_and_error_notifications_reach_callbacks(fake_aria2, aria2_manager):
+    events = collect_notifications(aria2_manager)
+    assert wait_until(lambda: aria2_manager.notifications_connected)
+
+    done, failed = aria2_manager.add_downloads([('http://example.invalid/a.jpg', '/tmp', 'a.jpg'),
+                                                ('http://example.invalid/b.jpg', '/tmp', 'b.jpg')])
+    fake_aria2.start(done)
+    fake_aria2.complete(done)
+    fake_aria2.fail(failed, 'not found')
+
+    assert next_event(events, 'aria2.onDownloadStart') == ('aria2.onDownloadStart', done)
+    assert next_event(events, 'aria2.onDownloadComplete') == ('aria2.onDownloadComplete', done)
+    assert next_event(events, 'aria2.onDownloadError') == ('aria2.onDownloadError', failed)
+
+
+def test_removed_callback_is_not_called(fake_aria2, aria2_manager):
+    removed = queue.Queue()
+    callback = lambda event, gid: removed.put((event, gid))  # noqa: E731
+    aria2_manager.add_notification_callback(callback)
+    aria2_manager.remove_notification_callback(callback)
+    kept = collect_notifications(aria2_manager)
+    assert wait_until(lambda: aria2_manager.notifications_connected)
+
+    gid = fake_aria2.add_task()
+    fake_aria2.complete(gid)
+
+    assert next_event(kept, 'aria2.onDownloadComplete') == ('aria2.onDownloadComplete', gid)
+    assert removed.empty()
+
+
+def test_listener_reconnects_after_socket_drop(fake_aria2, aria2_manager):
+    events = collect_notifications(aria2_manager)
+    assert wait_until(lambda: fake_aria2.connected_websockets() == 1 and aria2_manager.notifications_connected)
+
+    fake_aria2.drop_websockets()
+    assert wait_until(lambda: fake_aria2.websocket_connections == 2 and fake_aria2.connected_websockets() == 1)
+    assert wait_until(lambda: aria2_manager.notifications_connected)
+
+    gid = fake_aria2.add_task()
+    fake_aria2.complete(gid)
+    assert next_event(events, 'aria2.onDownloadComplete') == ('aria2.onDownloadComplete', gid)
+
+
+def test_tracker_queries_only_notified_tasks_while_connected(fake_aria2, aria2_manager):
+    tracker = Aria2StatusTracker(aria2_manager, interval=0.05, reconcile_interval=60)
+    try:
+        assert wait_until(lambda: aria2_manager.notifications_connected)
+        gids = aria2_manager.add_downloads([('http://example.invalid/a.jpg', '/tmp', 'a.jpg'),
+                                            ('http://example.invalid/b.jpg', '/tmp', 'b.jpg')])
+        tracker.track(gids)
+        # 开始跟踪后的第一次查询是完整核对
+        assert set(tracker.poll()) == set(gids)
+
+        fake_aria2.reset_calls()
+        fake_aria2.complete(gids[0])
+        assert wait_until(lambda: gids[0] in tracker._notified)
+        changed = tracker.poll()
+
+        assert set(changed) == {gids[0]}
+        assert changed[gids[0]]['status'] == 'complete'
+        assert not FULL_POLL_METHODS & set(fake_aria2.calls)
+    finally:
+        tracker.close()
+
+
+def test_tracker_uses_full_poll_when_notifications_unavailable(fake_aria2_without_websocket, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fake = fake_aria2_without_websocket
+    manager = connect_manager(fake)
+    tracker = Aria2StatusTracker(manager, interval=0.05, reconcile_interval=60)
+    try:
+        gids = manager.add_downloads([('http://example.invalid/a.jpg', '/tmp', 'a.jpg')])
+        tracker.track(gids)
+        tracker.poll()
+        assert not manager.notifications_connected
+
+        # 没有通知时，每次查询都是完整查询，仍能发现任务结束
+        fake.reset_calls()
+        fake.complete(gids[0], notify=False)
+        changed = tracker.poll()
+
+        assert changed[gids[0]]['status'] == 'complete'
+        assert FULL_POLL_METHODS <= set(fake.calls)
+    finally:
+        tracker.close()
+        manager.stop()
+
+
+def test_tracker_falls_back_to_full_poll_after_socket_drop(fake_aria2, aria2_manager):
+    tracker = Aria2StatusTracker(aria2_manager, interval=0.05, reconcile_interval=60)
+    try:
+        assert wait_until(lambda: aria2_manager.notifications_connected)
+        gids = aria2_manager.add_downloads([('http://example.invalid/a.jpg', '/tmp', 'a.jpg')])
+        tracker.track(gids)
+        tracker.poll()
+
+        # 通知断开且无法重连期间结束的任务收不到通知，只能由完整查询发现
+        fake_aria2.websocket_enabled = False
+        fake_aria2.drop_websockets()
+        assert wait_until(lambda: not aria2_manager.notifications_connected)
+        fake_aria2.reset_calls()
+        fake_aria2.complete(gids[0])
+        changed = tracker.poll()
+
+        assert changed[gids[0]]['status'] == 'complete'
+        assert FULL_POLL_METHODS <= set(fake_aria2.calls)
+    finally:
+        tracker.close()
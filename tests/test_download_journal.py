@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""下载日志（DownloadJournal）与分批添加线程（Aria2AddThread）"""
+
+import pytest
+
+from download_journal import DownloadJournal
+from downloader import Aria2AddThread
+
+
+def make_task(file_name: str, download_dir: str = '/downloads') -> dict:
+    return {'url': f'http://example.invalid/{file_name}', 'dir': download_dir, 'file_name': file_name,
+            'file_type': 'images', 'batch': '1'}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = DownloadJournal(str(tmp_path / 'download_journal.sqlite'))
+    yield journal
+    journal.close()
+
+
+def test_add_tasks_keeps_queued_rows(journal):
+    journal.add_tasks([make_task('a.jpg')])
+    journal.mark_queued([('/downloads', 'a.jpg', 'gid-a')])
+
+    # 另一个窗口再次添加同一文件：记录保持 queued，返回原来的 gid
+    assert journal.add_tasks([make_task('a.jpg'), make_task('b.jpg')]) == {('/downloads', 'a.jpg'): 'gid-a'}
+    assert [task['file_name'] for task in journal.get_tasks(DownloadJournal.STATE_QUEUED)] == ['a.jpg']
+    assert [task['file_name'] for task in journal.get_tasks(DownloadJournal.STATE_PENDING)] == ['b.jpg']
+
+    # 第一个窗口按 gid 记录的完成状态不会丢失
+    journal.finish([('gid-a', DownloadJournal.STATE_COMPLETE, None)])
+    assert [task['file_name'] for task in journal.get_tasks(DownloadJournal.STATE_COMPLETE)] == ['a.jpg']
+
+
+@pytest.mark.parametrize('state', [DownloadJournal.STATE_COMPLETE, DownloadJournal.STATE_ERROR,
+                                   DownloadJournal.STATE_CANCELLED])
+def test_add_tasks_resets_finished_rows(journal, state):
+    journal.add_tasks([make_task('a.jpg')])
+    journal.mark_queued([('/downloads', 'a.jpg', 'gid-a')])
+    journal.finish([('gid-a', state, 'boom' if state == DownloadJournal.STATE_ERROR else None)])
+
+    assert journal.add_tasks([make_task('a.jpg')]) == {}
+    pending = journal.get_tasks(DownloadJournal.STATE_PENDING)
+    assert [(task['file_name'], task['gid'], task['last_error'], task['attempts']) for task in pending] == \
+        [('a.jpg', None, None, 1)]
+
+
+def test_add_thread_tracks_queued_rows_without_adding_again(fake_aria2, aria2_manager, journal):
+    first = Aria2AddThread(aria2_manager, [0], [make_task('a.jpg')], journal=journal)
+    first.run()
+    (queued_gid,) = [task['gid'] for task in journal.get_tasks(DownloadJournal.STATE_QUEUED)]
+
+    emitted = []
+    second = Aria2AddThread(aria2_manager, [0, 1], [make_task('a.jpg'), make_task('b.jpg')], journal=journal)
+    second.chunk_added.connect(lambda rows, gids: emitted.append((rows, gids)))
+    fake_aria2.reset_calls()
+    second.run()
+
+    # 只有 b.jpg 被添加到 aria2，a.jpg 沿用第一个窗口的 gid
+    assert fake_aria2.calls == ['aria2.addUri']
+    (rows, gids), = emitted
+    assert rows == [0, 1] and gids[0] == queued_gid and gids[1] and gids[1] != queued_gid
+    assert {task['file_name']: task['gid'] for task in journal.get_tasks(DownloadJournal.STATE_QUEUED)} == \
+        {'a.jpg': queued_gid, 'b.jpg': gids[1]}